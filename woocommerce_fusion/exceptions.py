@@ -3,3 +3,11 @@ from frappe.exceptions import ValidationError
 
 class SyncDisabledError(ValidationError):
 	pass
+
+
+class SyncLockTimeoutError(ValidationError):
+	pass
+
+
+class SyncLockLostError(ValidationError):
+	pass
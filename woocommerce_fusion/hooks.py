@@ -62,7 +62,7 @@ doctype_list_js = {"Sales Order": "public/js/selling/sales_order_list.js"}
 # ------------
 
 # before_install = "woocommerce_fusion.install.before_install"
-# after_install = "woocommerce_fusion.install.after_install"
+after_install = "woocommerce_fusion.install.after_install"
 
 # Uninstallation
 # ------------
@@ -152,13 +152,19 @@ scheduler_events = {
 	# 	"weekly": [
 	# 		"woocommerce_fusion.tasks.daily"
 	# 	],
+	"all": [
+		"woocommerce_fusion.tasks.sync_sales_orders.flush_woocommerce_order_statuses",
+	],
 	"hourly_long": [
 		"woocommerce_fusion.tasks.sync_sales_orders.sync_woocommerce_orders_modified_since",
+		"woocommerce_fusion.tasks.sync_sales_orders.reconcile_pending_payments",
 		"woocommerce_fusion.tasks.sync_items.sync_woocommerce_products_modified_since",
+		"woocommerce_fusion.wordpress.media.refresh_media_indexes",
 	],
 	"daily_long": [
 		"woocommerce_fusion.tasks.stock_update.update_stock_levels_for_all_enabled_items_in_background",
 		"woocommerce_fusion.tasks.sync_item_prices.run_item_price_sync_in_background",
+		"woocommerce_fusion.wordpress.media.rebuild_media_indexes",
 	],
 	# 	"monthly": [
 	# 		"woocommerce_fusion.tasks.monthly"
@@ -255,7 +261,9 @@ fixtures = [
 					"Sales Order-woocommerce_payment_entry",
 					"Sales Order-custom_attempted_woocommerce_auto_payment_entry",
 					"Sales Order-custom_woocommerce_last_sync_hash",
+					"Sales Order-custom_woocommerce_status_push_pending",
 					"Address-woocommerce_identifier",
+					"Address-custom_woocommerce_address_hash",
 					"Item-woocommerce_servers",
 					"Item-custom_woocommerce_tab",
 				),
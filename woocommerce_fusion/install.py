@@ -0,0 +1,36 @@
+import frappe
+from frappe.utils.fixtures import sync_fixtures
+
+# Composite DB indexes for looking up documents by their WooCommerce linkage fields, as
+# (doctype, fields, index name)
+WOOCOMMERCE_LINKAGE_INDEXES = (
+	(
+		"Sales Order",
+		["woocommerce_server", "woocommerce_id"],
+		"woocommerce_server_woocommerce_id_index",
+	),
+	(
+		"Item WooCommerce Server",
+		["woocommerce_server", "woocommerce_id"],
+		"woocommerce_server_woocommerce_id_index",
+	),
+)
+
+
+def after_install():
+	# after_install runs before fixtures are synced, and the Sales Order linkage fields are
+	# Custom Fields from the fixtures
+	sync_fixtures("woocommerce_fusion")
+	add_woocommerce_linkage_indexes()
+
+
+def add_woocommerce_linkage_indexes():
+	"""
+	Add composite DB indexes for the WooCommerce linkage fields that orders and items are looked up by.
+
+	These are not unique: cancelled and amended Sales Orders share their WooCommerce ID, and
+	Item WooCommerce Server rows can have an empty WooCommerce ID until their product is created.
+	Customer.woocommerce_identifier has a unique index through its Custom Field.
+	"""
+	for doctype, fields, index_name in WOOCOMMERCE_LINKAGE_INDEXES:
+		frappe.db.add_index(doctype, fields, index_name=index_name)
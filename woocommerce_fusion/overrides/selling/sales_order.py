@@ -5,7 +5,7 @@ from erpnext.selling.doctype.sales_order.sales_order import SalesOrder
 from frappe import _
 from frappe.model.naming import get_default_naming_series, make_autoname
 
-from woocommerce_fusion.tasks.sync_sales_orders import run_sales_order_sync
+from woocommerce_fusion.tasks.sync_sales_orders import queue_woocommerce_order_status
 from woocommerce_fusion.woocommerce.woocommerce_api import (
 	generate_woocommerce_record_name_from_domain_and_id,
 )
@@ -61,10 +61,8 @@ class CustomSalesOrder(SalesOrder):
 				)
 				if mapping:
 					if self.woocommerce_status != mapping.woocommerce_sales_order_status:
-						frappe.db.set_value(
-							"Sales Order", self.name, "woocommerce_status", mapping.woocommerce_sales_order_status
-						)
-						frappe.enqueue(run_sales_order_sync, queue="long", sales_order_name=self.name)
+						# Push the status in bulk with other status changes instead of a full sync per order
+						queue_woocommerce_order_status(self.name, mapping.woocommerce_sales_order_status)
 
 
 @frappe.whitelist()
@@ -0,0 +1,18 @@
+from __future__ import unicode_literals
+
+import frappe
+from frappe.utils.fixtures import sync_fixtures
+
+from woocommerce_fusion.install import add_woocommerce_linkage_indexes
+
+
+def execute():
+	"""
+	Add composite DB indexes for looking up Sales Orders and Item WooCommerce Servers by their
+	WooCommerce server and ID
+	"""
+	sync_fixtures("woocommerce_fusion")
+	frappe.reload_doc("woocommerce", "doctype", "item_woocommerce_server")
+
+	add_woocommerce_linkage_indexes()
+	frappe.db.commit()
@@ -0,0 +1,49 @@
+from __future__ import unicode_literals
+
+import frappe
+
+
+def execute():
+	"""
+	Prepare the woocommerce_identifier field on Customer for a unique index, by clearing empty
+	and duplicate identifiers. For duplicates, the identifier is kept on the most recently
+	modified Customer, which is the one that orders were being linked to.
+
+	This runs before the patches that sync fixtures, as syncing the fixture adds the unique index
+	"""
+	if not frappe.db.has_column("Customer", "woocommerce_identifier"):
+		return
+
+	frappe.db.sql(
+		"""
+		UPDATE `tabCustomer`
+		SET woocommerce_identifier = NULL
+		WHERE woocommerce_identifier = ''
+		"""
+	)
+
+	duplicate_identifiers = frappe.db.sql(
+		"""
+		SELECT woocommerce_identifier
+		FROM `tabCustomer`
+		WHERE woocommerce_identifier IS NOT NULL
+		GROUP BY woocommerce_identifier
+		HAVING COUNT(*) > 1
+		""",
+		pluck=True,
+	)
+
+	for identifier in duplicate_identifiers:
+		customers = frappe.get_all(
+			"Customer",
+			filters={"woocommerce_identifier": identifier},
+			order_by="modified desc",
+			pluck="name",
+		)
+		for customer in customers[1:]:
+			print(f"Clearing duplicate woocommerce_identifier {identifier} on Customer {customer}")
+			frappe.db.set_value(
+				"Customer", customer, "woocommerce_identifier", None, update_modified=False
+			)
+
+	frappe.db.commit()
@@ -1,15 +1,25 @@
 import base64
 import hashlib
 import hmac
-from typing import List
+import time
+from typing import Dict, List, Optional
 
 import frappe
 from frappe import _, _dict
+from frappe.utils import get_datetime
+from redis.exceptions import LockError
 
+from woocommerce_fusion.exceptions import SyncLockLostError, SyncLockTimeoutError
 from woocommerce_fusion.woocommerce.doctype.woocommerce_server.woocommerce_server import (
 	WooCommerceServer,
 )
 
+# Seconds after which a sync lock expires, in case the worker holding it dies
+SYNC_LOCK_TIMEOUT = 600
+# Seconds to wait for a sync lock that is held by another worker
+SYNC_LOCK_BLOCKING_TIMEOUT = 120
+SYNC_LOCK_METRICS = ("acquired", "contended", "timed_out", "lost", "wait_ms")
+
 
 class SynchroniseWooCommerce:
 	"""
@@ -27,6 +37,136 @@ class SynchroniseWooCommerce:
 		return [frappe.get_doc("WooCommerce Server", server.name) for server in wc_servers]
 
 
+class SyncLock:
+	"""
+	Redis lock around the synchronisation of a single WooCommerce record, keyed by resource,
+	server and WooCommerce ID, so that sync jobs for the same record never run concurrently.
+
+	Every acquisition gets a fencing token. If the lock expires while held and is taken over by
+	another worker, check_fencing_token raises SyncLockLostError before any further writes.
+	"""
+
+	def __init__(
+		self,
+		resource: str,
+		woocommerce_server: str,
+		woocommerce_id,
+		timeout: int = SYNC_LOCK_TIMEOUT,
+		blocking_timeout: int = SYNC_LOCK_BLOCKING_TIMEOUT,
+	) -> None:
+		self.name = f"woocommerce_sync_lock|{resource}|{woocommerce_server}|{woocommerce_id}"
+		self.key = frappe.cache().make_key(self.name)
+		self.fencing_key = frappe.cache().make_key(f"{self.name}|fencing_token")
+		self.lock = frappe.cache().lock(self.key, timeout=timeout, blocking_timeout=blocking_timeout)
+		self.fencing_token: Optional[int] = None
+		self.contended = False
+
+	def acquire(self):
+		start = time.monotonic()
+		self.contended = not self.lock.acquire(blocking=False)
+		if self.contended:
+			increment_sync_lock_metric("contended")
+			acquired = self.lock.acquire()
+			increment_sync_lock_metric("wait_ms", int((time.monotonic() - start) * 1000))
+			if not acquired:
+				increment_sync_lock_metric("timed_out")
+				raise SyncLockTimeoutError(_("Timed out waiting for {0}").format(self.name))
+
+		increment_sync_lock_metric("acquired")
+		self.fencing_token = frappe.cache().incr(self.fencing_key)
+		frappe.cache().expire(self.fencing_key, SYNC_LOCK_TIMEOUT * 2)
+
+	def release(self):
+		try:
+			self.lock.release()
+		except LockError:
+			# The lock expired while it was held
+			increment_sync_lock_metric("lost")
+
+	def check_fencing_token(self):
+		"""
+		Raise an error if the lock has been acquired by another worker since we acquired it
+		"""
+		current_token = frappe.cache().get(self.fencing_key)
+		if current_token is None or int(current_token) != self.fencing_token:
+			increment_sync_lock_metric("lost")
+			raise SyncLockLostError(_("Lost {0}").format(self.name))
+
+	def __enter__(self):
+		self.acquire()
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.release()
+
+
+def increment_sync_lock_metric(metric: str, amount: int = 1):
+	frappe.cache().incrby(frappe.cache().make_key(f"woocommerce_sync_lock_metrics|{metric}"), amount)
+
+
+@frappe.whitelist()
+def get_sync_lock_metrics() -> Dict[str, int]:
+	"""
+	Return the sync lock contention counters of this site
+	"""
+	frappe.only_for("System Manager")
+	return {
+		metric: int(
+			frappe.cache().get(frappe.cache().make_key(f"woocommerce_sync_lock_metrics|{metric}")) or 0
+		)
+		for metric in SYNC_LOCK_METRICS
+	}
+
+
+def get_modified_after_params(
+	woocommerce_server: str,
+	watermark_fieldname: str,
+	date_time_from=None,
+	default_date_time_from=None,
+) -> Optional[Dict]:
+	"""
+	Return the WooCommerce list parameters for a scan of records modified since date_time_from if
+	given, else since the server's watermark, else since default_date_time_from.
+
+	Records are ordered by modification date, so that the watermark can be moved forward page by page
+	"""
+	params = {"orderby": "modified", "order": "asc"}
+	if date_time_from:
+		return {**params, "modified_after": date_time_from}
+
+	watermark = frappe.db.get_value("WooCommerce Server", woocommerce_server, watermark_fieldname)
+	if watermark:
+		return {**params, "modified_after": get_datetime(watermark).isoformat(), "dates_are_gmt": True}
+
+	if default_date_time_from:
+		return {**params, "modified_after": default_date_time_from}
+
+	return None
+
+
+def set_sync_watermark(woocommerce_server: str, watermark_fieldname: str, records: List):
+	"""
+	Move the server's watermark forward to the latest GMT modification date of the given records
+	"""
+	modification_dates = [
+		get_datetime(record.woocommerce_date_modified_gmt)
+		for record in records
+		if record.get("woocommerce_date_modified_gmt")
+	]
+	if not modification_dates:
+		return
+
+	watermark = frappe.db.get_value("WooCommerce Server", woocommerce_server, watermark_fieldname)
+	if not watermark or max(modification_dates) > get_datetime(watermark):
+		frappe.db.set_value(
+			"WooCommerce Server",
+			woocommerce_server,
+			watermark_fieldname,
+			max(modification_dates),
+			update_modified=False,
+		)
+
+
 def log_and_raise_error(err):
 	"""
 	Create an "Error Log" and raise error
@@ -1,4 +1,6 @@
+import hashlib
 import json
+import time
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
@@ -6,22 +8,45 @@ from typing import Dict, List, Optional, Tuple
 import frappe
 from erpnext.stock.doctype.item.item import Item
 from frappe import _, _dict
-from frappe.query_builder import Criterion
-from frappe.utils import get_datetime, now
+from frappe.query_builder import Case, Criterion
+from frappe.query_builder.functions import IfNull
+from frappe.utils import cint, cstr, get_datetime, getdate, now
 
 from woocommerce import API
-from woocommerce_fusion.exceptions import SyncDisabledError
-from woocommerce_fusion.tasks.sync import SynchroniseWooCommerce
+from woocommerce_fusion.exceptions import (
+	SyncDisabledError,
+	SyncLockLostError,
+	SyncLockTimeoutError,
+)
+from woocommerce_fusion.tasks.sync import (
+	SynchroniseWooCommerce,
+	SyncLock,
+	get_modified_after_params,
+	set_sync_watermark,
+)
 from woocommerce_fusion.woocommerce.doctype.woocommerce_product.woocommerce_product import (
 	WooCommerceProduct,
 )
 from woocommerce_fusion.woocommerce.doctype.woocommerce_server.woocommerce_server import (
 	WooCommerceServer,
+	get_item_field_map,
 )
 from woocommerce_fusion.woocommerce.woocommerce_api import (
 	generate_woocommerce_record_name_from_domain_and_id,
+	log_and_raise_error,
+	woocommerce_identity_map,
 )
 
+ITEM_FINGERPRINTS = "woocommerce_item_fingerprints"
+# Maximum number of products per request to the products/batch endpoint of WooCommerce
+WC_PRODUCT_BATCH_SIZE = 100
+CATALOGUE_PUSH_TIMEOUT = 4 * 60 * 60
+VARIATIONS_SYNC_JOB = "woocommerce_variations_sync"
+
+# In-process registry of Item Attribute values, keyed by Item Attribute name and modified timestamp
+_item_attribute_cache: Dict[Tuple[str, str], List[str]] = {}
+
+
 def safe_log_error(message: str, title: str = "WooCommerce Error", max_len: int = 140):
 	"""
     Truncates the log message if necessary to avoid error
@@ -41,13 +66,152 @@ def run_item_sync_from_hook(doc, method):
 			doc.doctype == "Item"
 			and not doc.flags.get("created_by_sync", None)
 			and len(doc.woocommerce_servers) > 0
+			and item_has_changes_for_woocommerce(doc)
 	):
 		frappe.msgprint(
 			_("Background sync to WooCommerce triggered for {}").format(frappe.bold(doc.name)),
 			indicator="blue",
 			alert=True,
 		)
-		frappe.enqueue(clear_sync_hash_and_run_item_sync, item_code=doc.name)
+		if doc.variant_of:
+			# Variants are synchronised together with the other variants of their template
+			for row in doc.woocommerce_servers:
+				if row.enabled:
+					queue_woocommerce_variations_sync(doc.variant_of, row.woocommerce_server)
+		else:
+			frappe.enqueue(clear_sync_hash_and_run_item_sync, item_code=doc.name)
+
+
+def item_has_changes_for_woocommerce(item: Item) -> bool:
+	"""
+    Check if an Item has to be synchronised to any of its enabled WooCommerce Servers, i.e. if
+    it is not linked to a WooCommerce Product yet, if sync was just enabled, or if any of the
+    fields that are synchronised to WooCommerce changed since the last sync
+    """
+	item_before_save = item.get_doc_before_save()
+	previously_enabled_rows = (
+		{row.name for row in item_before_save.woocommerce_servers if row.enabled}
+		if item_before_save
+		else set()
+	)
+	for row in item.woocommerce_servers:
+		if not row.enabled:
+			continue
+		if not row.woocommerce_id or row.name not in previously_enabled_rows:
+			return True
+		if get_item_fingerprint(item, row.woocommerce_server) != frappe.cache().hget(
+				ITEM_FINGERPRINTS, f"{item.name}|{row.woocommerce_server}"
+		):
+			return True
+	return False
+
+
+def get_item_fingerprint(item: Item, woocommerce_server: str) -> str:
+	"""
+    Return a hash of the Item fields that are synchronised to the given WooCommerce Server
+    """
+	synchronised_values = {
+		"item_name": cstr(item.item_name),
+		"image": cstr(item.image),
+		"is_stock_item": int(item.is_stock_item or 0),
+		"has_variants": int(item.has_variants or 0),
+		"variant_of": cstr(item.variant_of),
+		"attributes": [
+			[cstr(row.attribute), cstr(row.attribute_value)]
+			for row in item.get("attributes") or []
+		],
+		"item_field_map": {
+			map.item_fieldname: cstr(item.get(map.item_fieldname))
+			for map in get_item_field_map(woocommerce_server).fields
+		},
+	}
+	return hashlib.sha256(
+		json.dumps(synchronised_values, sort_keys=True).encode("utf8")
+	).hexdigest()
+
+
+def set_item_fingerprint(item: Item, woocommerce_server: str):
+	"""
+    Remember the fingerprint of the Item fields that were synchronised to a WooCommerce Server
+    """
+	frappe.cache().hset(
+		ITEM_FINGERPRINTS,
+		f"{item.name}|{woocommerce_server}",
+		get_item_fingerprint(item, woocommerce_server),
+	)
+
+
+def get_item_attribute_values(attribute_name: str) -> Optional[List[str]]:
+	"""
+    Return the values of an Item Attribute, or None if it does not exist. The values are read once
+    and reused until the Item Attribute is modified
+    """
+	modified = frappe.get_cached_value("Item Attribute", attribute_name, "modified")
+	if not modified:
+		return None
+
+	cache_key = (attribute_name, cstr(modified))
+	if cache_key not in _item_attribute_cache:
+		clear_item_attribute_cache(attribute_name)
+		item_attribute = frappe.get_cached_doc("Item Attribute", attribute_name)
+		_item_attribute_cache[cache_key] = [
+			row.attribute_value for row in item_attribute.item_attribute_values
+		]
+	return _item_attribute_cache[cache_key]
+
+
+def clear_item_attribute_cache(attribute_name: str):
+	for cache_key in [key for key in _item_attribute_cache if key[0] == attribute_name]:
+		_item_attribute_cache.pop(cache_key)
+
+
+def merge_item_attribute_values(attribute_name: str, values: List[str]):
+	"""
+    Create an Item Attribute, or add the values that it does not have yet. Existing values are
+    kept, and the Item Attribute is only written if a value is new
+    """
+	values = list(dict.fromkeys(values))
+	existing_values = get_item_attribute_values(attribute_name)
+	if existing_values is not None and all(value in existing_values for value in values):
+		return
+
+	if existing_values is None:
+		item_attribute = frappe.get_doc(
+			{"doctype": "Item Attribute", "attribute_name": attribute_name}
+		)
+	else:
+		item_attribute = frappe.get_doc("Item Attribute", attribute_name)
+
+	# Check against the stored values, in case the registry is behind another worker
+	stored_values = {row.attribute_value for row in item_attribute.item_attribute_values}
+	new_values = [value for value in values if value not in stored_values]
+	if item_attribute.name and not new_values:
+		return
+
+	for value in new_values:
+		row = item_attribute.append("item_attribute_values")
+		row.attribute_value = value
+		row.abbr = value.replace(" ", "")
+
+	item_attribute.flags.ignore_mandatory = True
+	if not item_attribute.name:
+		item_attribute.insert()
+	else:
+		item_attribute.save()
+	clear_item_attribute_cache(attribute_name)
+
+
+def merge_item_attributes_of_wc_product(wc_product: WooCommerceProduct):
+	"""
+    Merge the options of a WooCommerce Product's attributes into their Item Attributes
+    """
+	for wc_attribute in json.loads(wc_product.attributes or "[]"):
+		# In a variable product => "options" (list)
+		# In a "variation" product => "option" (unique)
+		merge_item_attribute_values(
+			wc_attribute["name"],
+			wc_attribute["options"] if wc_product.type == "variable" else [wc_attribute["option"]],
+		)
 
 
 @frappe.whitelist()
@@ -108,32 +272,52 @@ def run_item_sync(
 
 def sync_woocommerce_products_modified_since(date_time_from=None):
 	"""
-    Get list of WooCommerce products modified since date_time_from
+    Get list of WooCommerce products modified since date_time_from, or else since each server's
+    watermark, and synchronise them.
+
+    The products of each page, and their variations, are synchronised before the server's
+    watermark is moved past the page and committed, so that an interrupted scan resumes from the
+    last synchronised page. Once a product fails, the watermark is not moved any further in this
+    scan, so that the next scan retries it
     """
 	wc_settings = frappe.get_doc("WooCommerce Integration Settings")
 
-	if not date_time_from:
-		date_time_from = wc_settings.wc_last_sync_date_items
-
-	# Validate
-	if not date_time_from:
-		error_text = _(
-			"'Last Items Synchronisation Date' field on 'WooCommerce Integration Settings' is missing"
+	for wc_api in WooCommerceProduct._init_api():
+		params = get_modified_after_params(
+			wc_api.woocommerce_server,
+			"last_product_sync_watermark",
+			date_time_from=date_time_from,
+			default_date_time_from=wc_settings.wc_last_sync_date_items,
 		)
-		frappe.log_error("WooCommerce Items Sync Task Error", error_text)
-		raise ValueError(error_text)
 
-	wc_products = get_list_of_wc_products(date_time_from=date_time_from)
-	for wc_product in wc_products:
-		try:
-			run_item_sync(woocommerce_product=wc_product, enqueue=True)
-		except Exception:
-			pass
-
-	wc_settings.reload()
-	wc_settings.wc_last_sync_date_items = now()
-	wc_settings.flags.ignore_mandatory = True
-	wc_settings.save()
+		# Validate
+		if not params:
+			error_text = _(
+				"'Last Items Synchronisation Date' field on 'WooCommerce Integration Settings' is missing"
+			)
+			frappe.log_error("WooCommerce Items Sync Task Error", error_text)
+			continue
+
+		sync_failed = False
+		for wc_products in WooCommerceProduct.get_pages_of_records(wc_api, params, keyset=True):
+			# Extend the page with product variants
+			variations = WooCommerceProduct.get_variations(
+				wc_products,
+				{"servers": [wc_api.woocommerce_server], "as_doc": True},
+				all_pages=True,
+			)
+			for wc_product in filter_unchanged_wc_products(wc_products + variations):
+				try:
+					run_item_sync(woocommerce_product=wc_product)
+				# Skip products with errors, as these exceptions will be logged
+				except Exception:
+					sync_failed = True
+
+			if not sync_failed:
+				set_sync_watermark(
+					wc_api.woocommerce_server, "last_product_sync_watermark", wc_products
+				)
+			frappe.db.commit()
 
 
 def format_erpnext_img_url(image_details):
@@ -220,6 +404,9 @@ class SynchroniseItem(SynchroniseWooCommerce):
     Class for managing synchronisation of WooCommerce Product with ERPNext Item
     """
 
+	# Queue the sync of a template Item's variants after its WooCommerce Product is created
+	sync_variations: bool = True
+
 	def __init__(
 			self,
 			servers: List[WooCommerceServer | _dict] = None,
@@ -230,6 +417,7 @@ class SynchroniseItem(SynchroniseWooCommerce):
 		self.item = item
 		self.woocommerce_product = woocommerce_product
 		self.settings = frappe.get_cached_doc("WooCommerce Integration Settings")
+		self.sync_lock = None
 
 		# Initialize WooCommerce API for the given server
 		if woocommerce_product and woocommerce_product.woocommerce_server:
@@ -253,8 +441,18 @@ class SynchroniseItem(SynchroniseWooCommerce):
         Run synchronisation
         """
 		try:
-			self.get_corresponding_item_or_product()
-			self.sync_wc_product_with_erpnext_item()
+			with woocommerce_identity_map():
+				if isinstance(self.woocommerce_product, WooCommerceProduct):
+					WooCommerceProduct.add_record_to_identity_map(
+						self.woocommerce_product.as_dict()
+					)
+				self.sync_lock = self.get_sync_lock()
+				with self.sync_lock:
+					# Another worker may have updated the Item while we were waiting
+					if self.sync_lock.contended and self.item:
+						self.item.item.reload()
+					self.get_corresponding_item_or_product()
+					self.sync_wc_product_with_erpnext_item()
 		except Exception as err:
 			# Truncate the message if too long
 			err_msg = (
@@ -265,6 +463,31 @@ class SynchroniseItem(SynchroniseWooCommerce):
 			safe_log_error(err_msg, "WooCommerce Error", max_len=1000)  # truncated to 1000
 			raise err
 
+	def get_sync_lock(self) -> SyncLock:
+		"""
+        Get a lock keyed by the server and Item of the link, so that syncs started from either
+        side of the link exclude each other. A WooCommerce Product that is not linked to an Item
+        yet is locked by its server and ID
+        """
+		if self.woocommerce_product and not self.item:
+			self.get_erpnext_item()
+		if self.item:
+			return get_item_sync_lock(
+				self.item.item_woocommerce_server.woocommerce_server, self.item.item.name
+			)
+		return SyncLock(
+			"products",
+			self.woocommerce_product.woocommerce_server,
+			self.woocommerce_product.woocommerce_id,
+		)
+
+	def check_sync_lock(self):
+		"""
+        Verify that we still hold the sync lock before writing
+        """
+		if self.sync_lock:
+			self.sync_lock.check_fencing_token()
+
 	def get_corresponding_item_or_product(self):
 		"""
         If we have an ERPNext Item, get the corresponding WooCommerce Product
@@ -282,13 +505,12 @@ class SynchroniseItem(SynchroniseWooCommerce):
 			if not wc_server.enable_sync:
 				raise SyncDisabledError(wc_server)
 
-			wc_products = get_list_of_wc_products(item=self.item)
-			if len(wc_products) == 0:
+			self.woocommerce_product = get_wc_product(item=self.item)
+			if not self.woocommerce_product:
 				raise ValueError(
 					f"No WooCommerce Product found with ID {self.item.item_woocommerce_server.woocommerce_id} "
 					f"on {self.item.item_woocommerce_server.woocommerce_server}"
 				)
-			self.woocommerce_product = wc_products[0]
 
 		if self.woocommerce_product and not self.item:
 			self.get_erpnext_item()
@@ -358,6 +580,7 @@ class SynchroniseItem(SynchroniseWooCommerce):
 		"""
         Update the ERPNext Item with fields from its corresponding WooCommerce Product
         """
+		self.check_sync_lock()
 		if item.item.item_name != woocommerce_product.woocommerce_name:
 			item.item.item_name = woocommerce_product.woocommerce_name
 			item.item.flags.created_by_sync = True
@@ -366,22 +589,59 @@ class SynchroniseItem(SynchroniseWooCommerce):
 
 		self.set_sync_hash()
 
-	def check_wc_image_exists(self, image_url: str):
+	def check_wc_image_exists(self, image_url: str, content_hash: Optional[str] = None):
 		"""
-		Check if image already exists in WordPress media library
+		Check if image already exists in WordPress media library, using the local index of the
+		media library, and searching the media library itself if the index has no match
 
 		Args:
 			image_url: URL of image to check
+			content_hash: Content hash of the image's ERPNext File
 
 		Returns:
 			Media ID if found, None otherwise
 		"""
-		from woocommerce_fusion.wordpress.media import get_img_id
-		
+		from woocommerce_fusion.wordpress.media import (
+			add_media_to_index,
+			get_img_id,
+			get_media_id,
+			is_media_index_built,
+			refresh_media_indexes,
+		)
+
 		# Extract file name from URL
 		filename = image_url.split("/")[-1]
-		
-		# Get WooCommerce server
+
+		wc_server = self.get_wc_server_for_images()
+		if not wc_server:
+			return None
+
+		# Search for image in media library index
+		media_id = get_media_id(wc_server.name, filename=filename, content_hash=content_hash)
+		if media_id:
+			return media_id
+
+		# The index may be missing (evicted or cleared from the cache) or behind the media
+		# library, so search the media library before a duplicate image is created
+		if not is_media_index_built(wc_server.name):
+			frappe.enqueue(
+				refresh_media_indexes,
+				queue="long",
+				job_id="wordpress_media_indexes",
+				deduplicate=True,
+			)
+		media = get_img_id(filename, server=wc_server)
+		if not media:
+			return None
+		add_media_to_index(
+			wc_server.name, media["id"], filename=filename, content_hash=content_hash
+		)
+		return media["id"]
+
+	def get_wc_server_for_images(self):
+		"""
+		Get the WooCommerce Server of this sync if it syncs images with WordPress
+		"""
 		wc_server = None
 		if self.woocommerce_product:
 			wc_server = frappe.get_cached_doc(
@@ -391,13 +651,8 @@ class SynchroniseItem(SynchroniseWooCommerce):
 			wc_server = frappe.get_cached_doc(
 				"WooCommerce Server", self.item.item_woocommerce_server.woocommerce_server
 			)
-			
-		if not wc_server or not wc_server.enable_sync_wp:
-			return None
-			
-		# Search for image in media library
-		media = get_img_id(filename, server=wc_server)
-		return media.get("id") if media else None
+
+		return wc_server if wc_server and wc_server.enable_sync_wp else None
 
 	def get_image_details(self, item, file_url):
 		"""
@@ -419,6 +674,8 @@ class SynchroniseItem(SynchroniseWooCommerce):
         Compare and update images avoiding duplications
         and managing both main image and gallery
         """
+		from woocommerce_fusion.wordpress.media import add_media_to_index, get_media_id
+
 		try:
 			current_images = json.loads(wc_product.images) if wc_product.images else []
 			new_images = []
@@ -433,7 +690,7 @@ class SynchroniseItem(SynchroniseWooCommerce):
 					"attached_to_name": item.item.name,
 					"is_private": 0,
 				},
-				fields=["file_name", "file_url", "is_private", "modified"],
+				fields=["file_name", "file_url", "is_private", "modified", "content_hash"],
 				order_by="creation",
 			)
 
@@ -445,6 +702,21 @@ class SynchroniseItem(SynchroniseWooCommerce):
 				if any(f.file_url.lower().endswith(ext) for ext in valid_extensions)
 			]
 
+			wc_server = self.get_wc_server_for_images()
+
+			def remember_media(media_id, file_details):
+				# Index the media by content hash, so that a renamed File resolves to it too
+				if (
+						wc_server
+						and media_id
+						and file_details.content_hash
+						and get_media_id(wc_server.name, content_hash=file_details.content_hash)
+						!= media_id
+				):
+					add_media_to_index(
+						wc_server.name, media_id, content_hash=file_details.content_hash
+					)
+
 			def process_image(file_details):
 				image_url = format_erpnext_img_url(
 					[file_details.file_name, file_details.file_url, file_details.is_private]
@@ -457,11 +729,13 @@ class SynchroniseItem(SynchroniseWooCommerce):
 				# 1. Check in current product images
 				existing_image = next((img for img in current_images if img["src"] == image_url), None)
 				if existing_image:
+					remember_media(existing_image.get("id"), file_details)
 					return existing_image
 
 				# 2. Check in WordPress media library
-				media_id = self.check_wc_image_exists(image_url)
+				media_id = self.check_wc_image_exists(image_url, file_details.content_hash)
 				if media_id:
+					remember_media(media_id, file_details)
 					return {
 						"id": media_id,
 						"src": image_url,
@@ -528,7 +802,8 @@ class SynchroniseItem(SynchroniseWooCommerce):
         Update WooCommerce product with optimized image management
         """
 		try:
-			# Reload document to avoid version conflicts
+			# Reload document to avoid version conflicts. The product was already loaded by the
+			# scan or lookup, so this is served from the identity map of the sync job
 			wc_product.reload()
 			wc_product_dirty = False
 
@@ -554,6 +829,7 @@ class SynchroniseItem(SynchroniseWooCommerce):
 
 			# Save if necessary
 			if wc_product_dirty:
+				self.check_sync_lock()
 				wc_product.flags.ignore_version = True
 				wc_product.save()
 
@@ -575,77 +851,9 @@ class SynchroniseItem(SynchroniseWooCommerce):
 				and item.item_woocommerce_server.enabled
 				and not item.item_woocommerce_server.woocommerce_id
 		):
-			# Create a new WooCommerce Product doc
-			wc_product = frappe.get_doc({"doctype": "WooCommerce Product"})
-			wc_product.type = "simple"
-			
-			# Get default status from WooCommerce Server settings
-			wc_server = frappe.get_doc("WooCommerce Server", item.item_woocommerce_server.woocommerce_server)
-			wc_product.status = wc_server.default_product_status or "draft"
-
-			# Set manage_stock based on is_stock_item
-			wc_product.manage_stock = True if item.item.is_stock_item else False
-
-			# Handle variants
-			if item.item.has_variants:
-				wc_product.type = "variable"
-				wc_product_attributes = []
-				for row in item.item.attributes:
-					item_attribute = frappe.get_doc("Item Attribute", row.attribute)
-					wc_product_attributes.append(
-						{
-							"name": row.attribute,
-							"slug": row.attribute.lower().replace(" ", "_"),
-							"visible": True,
-							"variation": True,
-							"options": [opt.attribute_value for opt in item_attribute.item_attribute_values],
-						}
-					)
-				wc_product.attributes = json.dumps(wc_product_attributes)
-
-			if item.item.variant_of:
-				# Check if parent exists
-				parent_item = frappe.get_doc("Item", item.item.variant_of)
-				parent_item, parent_wc_product = run_item_sync(item_code=parent_item.item_code)
-				wc_product.parent_id = parent_wc_product.woocommerce_id
-				wc_product.type = "variation"
-				# Handle attributes
-				wc_product_attributes = [
-					{
-						"name": row.attribute,
-						"slug": row.attribute.lower().replace(" ", "_"),
-						"option": row.attribute_value,
-					}
-					for row in item.item.attributes
-				]
-				wc_product.attributes = json.dumps(wc_product_attributes)
-
-			# Main image
-			if item.item.image:
-				image_details = frappe.db.get_value(
-					"File",
-					{"file_url": item.item.image},
-					["file_name", "file_url", "is_private", "content_hash", "creation"],
-				)
-				if image_details:
-					image_url = format_erpnext_img_url(image_details)
-					if image_url:
-						date_created_str = (
-							image_details[4].isoformat()
-							if image_details[4]
-							else datetime.now().isoformat()
-						)
-						wc_product.images = json.dumps(
-							[{"src": image_url, "date_created": date_created_str}]
-						)
-
-			# Set properties
-			wc_product.woocommerce_server = item.item_woocommerce_server.woocommerce_server
-			wc_product.woocommerce_name = item.item.item_name
-			wc_product.regular_price = get_item_price_rate(item) or "0"
-
-			self.set_product_fields(wc_product, item)
+			wc_product = self.build_woocommerce_product(item)
 
+			self.check_sync_lock()
 			wc_product.insert()
 			self.woocommerce_product = wc_product
 
@@ -657,6 +865,102 @@ class SynchroniseItem(SynchroniseWooCommerce):
 
 			self.set_sync_hash()
 
+			if item.item.has_variants and self.sync_variations:
+				queue_woocommerce_variations_sync(
+					item.item.name, item.item_woocommerce_server.woocommerce_server
+				)
+
+	def build_woocommerce_product(
+			self,
+			item: ERPNextItemToSync,
+			regular_price: Optional[str] = None,
+			parent_id: Optional[int] = None,
+	) -> WooCommerceProduct:
+		"""
+        Build a new WooCommerce Product with fields from its corresponding ERPNext Item, without
+        creating it in WooCommerce.
+
+        The price and, for variants, the parent product's ID are looked up (and the parent product
+        is synchronised) unless they are given
+        """
+		# Create a new WooCommerce Product doc
+		wc_product = frappe.get_doc({"doctype": "WooCommerce Product"})
+		wc_product.type = "simple"
+
+		# Get default status from WooCommerce Server settings
+		wc_server = frappe.get_cached_doc(
+			"WooCommerce Server", item.item_woocommerce_server.woocommerce_server
+		)
+		wc_product.status = wc_server.default_product_status or "draft"
+
+		# Set manage_stock based on is_stock_item
+		wc_product.manage_stock = True if item.item.is_stock_item else False
+
+		# Handle variants
+		if item.item.has_variants:
+			wc_product.type = "variable"
+			wc_product_attributes = []
+			for row in item.item.attributes:
+				wc_product_attributes.append(
+					{
+						"name": row.attribute,
+						"slug": row.attribute.lower().replace(" ", "_"),
+						"visible": True,
+						"variation": True,
+						"options": get_item_attribute_values(row.attribute) or [],
+					}
+				)
+			wc_product.attributes = json.dumps(wc_product_attributes)
+
+		if item.item.variant_of:
+			if not parent_id:
+				# Check if parent exists
+				parent_item = frappe.get_doc("Item", item.item.variant_of)
+				parent_item, parent_wc_product = run_item_sync(item_code=parent_item.item_code)
+				parent_id = parent_wc_product.woocommerce_id
+			wc_product.parent_id = parent_id
+			wc_product.type = "variation"
+			# Handle attributes
+			wc_product_attributes = [
+				{
+					"name": row.attribute,
+					"slug": row.attribute.lower().replace(" ", "_"),
+					"option": row.attribute_value,
+				}
+				for row in item.item.attributes
+			]
+			wc_product.attributes = json.dumps(wc_product_attributes)
+
+		# Main image
+		if item.item.image:
+			image_details = frappe.db.get_value(
+				"File",
+				{"file_url": item.item.image},
+				["file_name", "file_url", "is_private", "content_hash", "creation"],
+			)
+			if image_details:
+				image_url = format_erpnext_img_url(image_details)
+				if image_url:
+					date_created_str = (
+						image_details[4].isoformat()
+						if image_details[4]
+						else datetime.now().isoformat()
+					)
+					wc_product.images = json.dumps(
+						[{"src": image_url, "date_created": date_created_str}]
+					)
+
+		# Set properties
+		wc_product.woocommerce_server = item.item_woocommerce_server.woocommerce_server
+		wc_product.woocommerce_name = item.item.item_name
+		wc_product.regular_price = (
+			regular_price if regular_price is not None else get_item_price_rate(item)
+		) or "0"
+
+		self.set_product_fields(wc_product, item)
+
+		return wc_product
+
 	def create_item(self, wc_product: WooCommerceProduct) -> None:
 		"""
         Create an ERPNext Item from the given WooCommerce Product
@@ -706,6 +1010,7 @@ class SynchroniseItem(SynchroniseWooCommerce):
 
 		item.flags.ignore_mandatory = True
 		item.flags.created_by_sync = True
+		self.check_sync_lock()
 		item.insert()
 
 		self.item = ERPNextItemToSync(
@@ -724,62 +1029,21 @@ class SynchroniseItem(SynchroniseWooCommerce):
 		"""
         Create or update an Item Attribute
         """
-		if wc_product.attributes:
-			wc_attributes = json.loads(wc_product.attributes)
-			for wc_attribute in wc_attributes:
-				if frappe.db.exists("Item Attribute", wc_attribute["name"]):
-					# Get existing Item Attribute
-					item_attribute = frappe.get_doc("Item Attribute", wc_attribute["name"])
-				else:
-					# Create a new Item Attribute
-					item_attribute = frappe.get_doc(
-						{"doctype": "Item Attribute", "attribute_name": wc_attribute["name"]}
-					)
-
-				# In a variable product => "options" (list)
-				# In a "variation" product => "option" (unique)
-				options = (
-					wc_attribute["options"]
-					if wc_product.type == "variable"
-					else [wc_attribute["option"]]
-				)
-
-				# Replace or update values if there is a difference
-				existing_values = {val.attribute_value for val in item_attribute.item_attribute_values}
-				if existing_values != set(options):
-					item_attribute.item_attribute_values = []
-					for option in options:
-						row = item_attribute.append("item_attribute_values")
-						row.attribute_value = option
-						row.abbr = option.replace(" ", "")
-
-				item_attribute.flags.ignore_mandatory = True
-				if not item_attribute.name:
-					item_attribute.insert()
-				else:
-					item_attribute.save()
+		merge_item_attributes_of_wc_product(wc_product)
 
 	def set_item_fields(self):
 		"""
         If "Field Mappings" exist on `WooCommerce Server`, synchronize
-        their values from WooCommerce => ERPNext
+        their values from WooCommerce => ERPNext, with a single update of the Item
         """
 		if self.item and self.woocommerce_product:
-			wc_server = frappe.get_cached_doc(
-				"WooCommerce Server", self.woocommerce_product.woocommerce_server
-			)
-			if wc_server.item_field_map:
-				for map in wc_server.item_field_map:
-					erpnext_item_field_name = map.erpnext_field_name.split(" | ")
-					woocommerce_product_field_value = self.woocommerce_product.get(map.woocommerce_field_name)
-
-					frappe.db.set_value(
-						"Item",
-						self.item.item.name,
-						erpnext_item_field_name[0],
-						woocommerce_product_field_value,
-						update_modified=False,
-					)
+			item_field_map = get_item_field_map(self.woocommerce_product.woocommerce_server)
+			if item_field_map.fields:
+				item_values = item_field_map.get_item_values(self.woocommerce_product)
+				frappe.db.set_value(
+					"Item", self.item.item.name, item_values, update_modified=False
+				)
+				self.item.item.update(item_values)
 
 	def set_product_fields(
 			self, woocommerce_product: WooCommerceProduct, item: ERPNextItemToSync
@@ -790,21 +1054,11 @@ class SynchroniseItem(SynchroniseWooCommerce):
 
         Returns True if the doc has been modified
         """
-		wc_product_dirty = False
 		if item and woocommerce_product:
-			wc_server = frappe.get_cached_doc("WooCommerce Server", woocommerce_product.woocommerce_server)
-			if wc_server.item_field_map:
-				for map in wc_server.item_field_map:
-					erpnext_item_field_name = map.erpnext_field_name.split(" | ")
-					erpnext_item_field_value = getattr(item.item, erpnext_item_field_name[0])
-
-					if erpnext_item_field_value != getattr(woocommerce_product, map.woocommerce_field_name):
-						setattr(
-							woocommerce_product, map.woocommerce_field_name, erpnext_item_field_value
-						)
-						wc_product_dirty = True
+			item_field_map = get_item_field_map(woocommerce_product.woocommerce_server)
+			return item_field_map.set_product_values(woocommerce_product, item.item)
 
-		return wc_product_dirty
+		return False
 
 	def set_sync_hash(self):
 		"""
@@ -830,6 +1084,46 @@ class SynchroniseItem(SynchroniseWooCommerce):
 				update_modified=False,
 			)
 
+			set_item_fingerprint(
+				self.item.item, self.item.item_woocommerce_server.woocommerce_server
+			)
+
+
+def get_wc_product(item: ERPNextItemToSync) -> Optional[WooCommerceProduct]:
+	"""
+    Get the WooCommerce Product linked to an Item with a single request. Variants are requested
+    from the variations endpoint of their parent product, and named after it like in
+    WooCommerceProduct.get_variations. The parent product is only requested if it is not in the
+    identity map of the sync job
+    """
+	woocommerce_server = item.item_woocommerce_server.woocommerce_server
+	parent_id = None
+	args = None
+	if item.item.variant_of:
+		parent_id = frappe.db.get_value(
+			"Item WooCommerce Server",
+			{
+				"parent": item.item.variant_of,
+				"parenttype": "Item",
+				"woocommerce_server": woocommerce_server,
+			},
+			"woocommerce_id",
+		)
+		if parent_id:
+			parent_wc_product = WooCommerceProduct.get_record_from_identity_map(
+				generate_woocommerce_record_name_from_domain_and_id(woocommerce_server, parent_id)
+			) or WooCommerceProduct.get_record(woocommerce_server, parent_id)
+			if parent_wc_product:
+				parent_woocommerce_name = parent_wc_product.get("woocommerce_name")
+				args = {"metadata": {"parent_woocommerce_name": parent_woocommerce_name}}
+
+	return WooCommerceProduct.get_record(
+		woocommerce_server,
+		item.item_woocommerce_server.woocommerce_id,
+		parent_id=parent_id,
+		args=args,
+	)
+
 
 def get_list_of_wc_products(
 		item: Optional[ERPNextItemToSync] = None, date_time_from: Optional[datetime] = None
@@ -876,6 +1170,68 @@ def get_list_of_wc_products(
 	return wc_products
 
 
+def filter_unchanged_wc_products(wc_products: List[WooCommerceProduct]) -> List[WooCommerceProduct]:
+	"""
+    Drop WooCommerce Products whose modification date matches the sync hash of their linked Item,
+    checking each page of products against ERPNext with one query per server
+    """
+	wc_records_per_page_limit = 100
+	changed_wc_products = []
+
+	for i in range(0, len(wc_products), wc_records_per_page_limit):
+		page = wc_products[i : i + wc_records_per_page_limit]
+
+		wc_products_by_server = {}
+		for wc_product in page:
+			wc_products_by_server.setdefault(wc_product.woocommerce_server, []).append(wc_product)
+
+		for woocommerce_server, server_wc_products in wc_products_by_server.items():
+			woocommerce_ids = [cstr(wc_product.woocommerce_id) for wc_product in server_wc_products]
+			item_woocommerce_servers = frappe.get_all(
+				"Item WooCommerce Server",
+				filters={"woocommerce_server": woocommerce_server, "woocommerce_id": ["in", woocommerce_ids]},
+				fields=["woocommerce_id", "woocommerce_last_sync_hash"],
+			)
+			sync_hashes = {
+				cstr(row.woocommerce_id): row.woocommerce_last_sync_hash for row in item_woocommerce_servers
+			}
+			changed_wc_products.extend(
+				wc_product
+				for wc_product in server_wc_products
+				if cstr(wc_product.woocommerce_id) not in sync_hashes
+				or sync_hashes[cstr(wc_product.woocommerce_id)] != wc_product.woocommerce_date_modified
+			)
+
+	return changed_wc_products
+
+
+def get_wc_products_by_id(
+		woocommerce_server: str, woocommerce_ids: List[str]
+) -> List[WooCommerceProduct]:
+	"""
+    Get WooCommerce products from a single server by their IDs, using one "include=" request
+    per page of IDs. The products endpoint does not return variations, so the IDs of
+    variations will be absent from the result.
+    """
+	wc_records_per_page_limit = 100
+	wc_products = []
+
+	for i in range(0, len(woocommerce_ids), wc_records_per_page_limit):
+		ids = [str(woocommerce_id) for woocommerce_id in woocommerce_ids[i : i + wc_records_per_page_limit]]
+		wc_products.extend(
+			WooCommerceProduct.get_list_of_records(
+				{
+					"filters": [["WooCommerce Product", "id", "in", ids]],
+					"page_length": len(ids),
+					"servers": [woocommerce_server],
+					"as_doc": True,
+				}
+			)
+		)
+
+	return wc_products
+
+
 def get_item_price_rate(item: ERPNextItemToSync):
 	"""
     Return the price of the Item if it exists and if price list sync is enabled
@@ -923,3 +1279,676 @@ def clear_sync_hash_and_run_item_sync(item_code: str):
 
 	if len(iwss) > 0:
 		run_item_sync(item_code=item_code, enqueue=True)
+
+
+@frappe.whitelist()
+def push_catalogue_to_woocommerce(woocommerce_server: str):
+	"""
+    Queue the creation of WooCommerce Products for all Items on a WooCommerce Server that are not
+    linked to a WooCommerce Product yet
+    """
+	frappe.only_for("System Manager")
+	frappe.enqueue(
+		create_woocommerce_products_in_batches,
+		queue="long",
+		timeout=CATALOGUE_PUSH_TIMEOUT,
+		woocommerce_server=woocommerce_server,
+		enqueue_after_commit=True,
+	)
+
+
+def create_woocommerce_products_in_batches(
+		woocommerce_server: str,
+		item_codes: Optional[List[str]] = None,
+		batch_size: int = WC_PRODUCT_BATCH_SIZE,
+) -> int:
+	"""
+    Create WooCommerce Products for the Items on a WooCommerce Server that are not linked to a
+    WooCommerce Product yet, with one products/batch request and one update of the Item links per
+    batch of Items. The variants of template Items are queued to be created per template.
+
+    Every batch is committed, so that an interrupted push can be restarted where it stopped.
+    Returns the number of WooCommerce Products that were created
+    """
+	wc_server = frappe.get_cached_doc("WooCommerce Server", woocommerce_server)
+	if not wc_server.enable_sync:
+		raise SyncDisabledError(wc_server)
+
+	wc_api = next(
+		api
+		for api in WooCommerceProduct._init_api()
+		if api.woocommerce_server == woocommerce_server
+	)
+	sync = SynchroniseItem(servers=[wc_server])
+	unlinked_rows = get_unlinked_item_woocommerce_servers(woocommerce_server, item_codes)
+	created = 0
+
+	for start in range(0, len(unlinked_rows), batch_size):
+		# Skip Items that are being synchronised by another worker
+		sync_locks = []
+		for row in unlinked_rows[start : start + batch_size]:
+			sync_lock = get_item_sync_lock(woocommerce_server, row.parent, blocking_timeout=0)
+			try:
+				sync_lock.acquire()
+			except SyncLockTimeoutError:
+				continue
+			sync_locks.append((row, sync_lock))
+
+		try:
+			# Skip Items that were linked since the list of Items was read
+			linked_rows = frappe.get_all(
+				"Item WooCommerce Server",
+				filters={
+					"name": ["in", [row.name for row, _lock in sync_locks]],
+					"woocommerce_id": ["is", "set"],
+				},
+				pluck="name",
+			)
+			rows = [row for row, _lock in sync_locks if row.name not in linked_rows]
+			if not rows:
+				continue
+
+			prices = get_item_price_rates([row.parent for row in rows], wc_server)
+			items = []
+			wc_product_records = []
+			for row in rows:
+				item = ERPNextItemToSync(
+					item=frappe.get_doc("Item", row.parent), item_woocommerce_server_idx=row.idx
+				)
+				wc_product = sync.build_woocommerce_product(
+					item, regular_price=prices.get(row.parent, 0)
+				)
+				items.append(item)
+				wc_product_records.append(get_woocommerce_product_record(wc_product))
+
+			# Skip Items whose lock was taken over by another worker while the batch was built
+			held_rows = get_rows_with_sync_lock(sync_locks)
+			items_and_records = [
+				(item, record)
+				for item, record in zip(items, wc_product_records)
+				if item.item_woocommerce_server.name in held_rows
+			]
+			if not items_and_records:
+				continue
+			items = [item for item, _record in items_and_records]
+			wc_product_records = [record for _item, record in items_and_records]
+
+			try:
+				response = wc_api.api.post("products/batch", data={"create": wc_product_records})
+			except Exception as err:
+				log_and_raise_error(err, error_text="products/batch failed")
+			if response.status_code not in (200, 201):
+				log_and_raise_error(error_text="products/batch failed", response=response)
+
+			# Results are returned in the order of the request
+			links = {}
+			for item, result in zip(items, response.json().get("create", [])):
+				if result.get("error") or not result.get("id"):
+					safe_log_error(
+						f"WooCommerce Product for Item {item.item.name} not created: "
+						f"{result.get('error')}",
+						max_len=1000,
+					)
+					continue
+				links[item.item_woocommerce_server.name] = (
+					result["id"],
+					result.get("date_modified"),
+				)
+				set_item_fingerprint(item.item, woocommerce_server)
+				if item.item.has_variants:
+					queue_woocommerce_variations_sync(item.item.name, woocommerce_server)
+
+			link_item_woocommerce_servers(links)
+			frappe.db.commit()
+			created += len(links)
+		finally:
+			for _row, sync_lock in sync_locks:
+				sync_lock.release()
+
+	return created
+
+
+def queue_woocommerce_variations_sync(template_item_code: str, woocommerce_server: str):
+	"""
+    Queue the sync of all variants of a template Item to a WooCommerce Server, unless it is
+    already queued
+    """
+	frappe.enqueue(
+		sync_woocommerce_variations_in_batches,
+		queue="long",
+		job_id=f"{VARIATIONS_SYNC_JOB}|{woocommerce_server}|{template_item_code}",
+		deduplicate=True,
+		template_item_code=template_item_code,
+		woocommerce_server=woocommerce_server,
+		enqueue_after_commit=True,
+	)
+
+
+def sync_woocommerce_variations_in_batches(
+		template_item_code: str, woocommerce_server: str
+) -> int:
+	"""
+    Synchronise a template Item to a WooCommerce Server once, then create the WooCommerce
+    variations of its unlinked variants, and update those of its variants that changed since their
+    last sync, with one products/{id}/variations/batch request per batch of variants.
+
+    Returns the number of WooCommerce variations that were created or updated
+    """
+	wc_server = frappe.get_cached_doc("WooCommerce Server", woocommerce_server)
+	template = frappe.get_doc("Item", template_item_code)
+	template_row = next(
+		(
+			row
+			for row in template.woocommerce_servers
+			if row.woocommerce_server == woocommerce_server and row.enabled
+		),
+		None,
+	)
+	if not wc_server.enable_sync or not template_row:
+		return 0
+
+	# Synchronise the template once for all of its variants
+	sync = SynchroniseItem(
+		item=ERPNextItemToSync(item=template, item_woocommerce_server_idx=template_row.idx)
+	)
+	sync.sync_variations = False
+	sync.run()
+	parent_id = sync.woocommerce_product.woocommerce_id if sync.woocommerce_product else None
+	if not parent_id:
+		return 0
+
+	wc_api = next(
+		api
+		for api in WooCommerceProduct._init_api()
+		if api.woocommerce_server == woocommerce_server
+	)
+	variant_rows = get_variant_item_woocommerce_servers(template_item_code, woocommerce_server)
+	prices = get_item_price_rates([row.parent for row in variant_rows], wc_server)
+	synchronised = 0
+
+	for start in range(0, len(variant_rows), WC_PRODUCT_BATCH_SIZE):
+		# Skip variants that are being synchronised by another worker
+		sync_locks = []
+		for row in variant_rows[start : start + WC_PRODUCT_BATCH_SIZE]:
+			sync_lock = get_item_sync_lock(woocommerce_server, row.parent, blocking_timeout=0)
+			try:
+				sync_lock.acquire()
+			except SyncLockTimeoutError:
+				continue
+			sync_locks.append((row, sync_lock))
+
+		try:
+			variations_to_create = []
+			variations_to_update = []
+			for row, _lock in sync_locks:
+				item = ERPNextItemToSync(
+					item=frappe.get_doc("Item", row.parent), item_woocommerce_server_idx=row.idx
+				)
+				if row.woocommerce_id and get_item_fingerprint(
+						item.item, woocommerce_server
+				) == frappe.cache().hget(ITEM_FINGERPRINTS, f"{row.parent}|{woocommerce_server}"):
+					continue
+
+				wc_product = sync.build_woocommerce_product(
+					item, regular_price=prices.get(row.parent, 0), parent_id=parent_id
+				)
+				wc_product_record = get_woocommerce_product_record(wc_product)
+				if row.woocommerce_id:
+					variations_to_update.append(
+						(
+							item,
+							get_woocommerce_variation_update_record(
+								wc_product_record,
+								row.woocommerce_id,
+								woocommerce_server,
+								regular_price=prices.get(row.parent),
+							),
+						)
+					)
+				else:
+					variations_to_create.append((item, wc_product_record))
+
+			# Skip variants whose lock was taken over by another worker while the batch was built
+			held_rows = get_rows_with_sync_lock(sync_locks)
+			variations_to_create = [
+				(item, record)
+				for item, record in variations_to_create
+				if item.item_woocommerce_server.name in held_rows
+			]
+			variations_to_update = [
+				(item, record)
+				for item, record in variations_to_update
+				if item.item_woocommerce_server.name in held_rows
+			]
+			if not variations_to_create and not variations_to_update:
+				continue
+
+			endpoint = f"products/{parent_id}/variations/batch"
+			data = {
+				"create": [record for _item, record in variations_to_create],
+				"update": [record for _item, record in variations_to_update],
+			}
+			try:
+				response = wc_api.api.post(endpoint, data=data)
+			except Exception as err:
+				log_and_raise_error(err, error_text="variations/batch failed")
+			if response.status_code not in (200, 201):
+				log_and_raise_error(error_text="variations/batch failed", response=response)
+
+			# Results are returned in the order of the request
+			links = {}
+			for action, variations in (
+				("create", variations_to_create),
+				("update", variations_to_update),
+			):
+				for (item, _record), result in zip(variations, response.json().get(action, [])):
+					if result.get("error") or not result.get("id"):
+						safe_log_error(
+							f"WooCommerce variation for Item {item.item.name} not {action}d: "
+							f"{result.get('error')}",
+							max_len=1000,
+						)
+						continue
+					links[item.item_woocommerce_server.name] = (
+						result["id"],
+						result.get("date_modified"),
+					)
+					set_item_fingerprint(item.item, woocommerce_server)
+
+			link_item_woocommerce_servers(links)
+			frappe.db.commit()
+			synchronised += len(links)
+		finally:
+			for _row, sync_lock in sync_locks:
+				sync_lock.release()
+
+	return synchronised
+
+
+def get_woocommerce_variation_update_record(
+		wc_product_record: Dict,
+		woocommerce_id: str,
+		woocommerce_server: str,
+		regular_price: Optional[float] = None,
+) -> Dict:
+	"""
+    Return the data to post to WooCommerce to update an existing variation: only the fields that
+    an item sync updates (name, manage_stock and mapped fields), and the price if one is synced
+    """
+	fieldnames = ["name", "manage_stock"] + [
+		map.woocommerce_fieldname for map in get_item_field_map(woocommerce_server).fields
+	]
+	update_record = {
+		fieldname: wc_product_record[fieldname]
+		for fieldname in fieldnames
+		if fieldname in wc_product_record
+	}
+	update_record["id"] = cint(woocommerce_id)
+	if regular_price is not None:
+		update_record["regular_price"] = str(regular_price)
+	return update_record
+
+
+def get_woocommerce_product_record(wc_product: WooCommerceProduct) -> Dict:
+	"""
+    Return the data to post to WooCommerce for a new WooCommerce Product, as in db_insert
+    """
+	wc_product_record = wc_product.deserialize_attributes_of_type_dict_or_list(
+		wc_product.to_dict()
+	)
+	return wc_product.before_db_insert(wc_product_record)
+
+
+def get_unlinked_item_woocommerce_servers(
+		woocommerce_server: str, item_codes: Optional[List[str]] = None
+) -> List[_dict]:
+	"""
+    Get the enabled "Item WooCommerce Server" rows of a WooCommerce Server that are not linked to a
+    WooCommerce Product yet, excluding variants
+    """
+	iws = frappe.qb.DocType("Item WooCommerce Server")
+	itm = frappe.qb.DocType("Item")
+
+	query = (
+		frappe.qb.from_(iws)
+		.join(itm)
+		.on(iws.parent == itm.name)
+		.where(iws.parenttype == "Item")
+		.where(iws.woocommerce_server == woocommerce_server)
+		.where(iws.enabled == 1)
+		.where(IfNull(iws.woocommerce_id, "") == "")
+		.where(IfNull(itm.variant_of, "") == "")
+		.select(iws.name, iws.parent, iws.idx)
+		.orderby(iws.parent)
+	)
+	if item_codes:
+		query = query.where(iws.parent.isin(item_codes))
+
+	return query.run(as_dict=True)
+
+
+def get_variant_item_woocommerce_servers(
+		template_item_code: str, woocommerce_server: str
+) -> List[_dict]:
+	"""
+    Get the enabled "Item WooCommerce Server" rows of the variants of a template Item on a
+    WooCommerce Server
+    """
+	iws = frappe.qb.DocType("Item WooCommerce Server")
+	itm = frappe.qb.DocType("Item")
+
+	return (
+		frappe.qb.from_(iws)
+		.join(itm)
+		.on(iws.parent == itm.name)
+		.where(iws.parenttype == "Item")
+		.where(iws.woocommerce_server == woocommerce_server)
+		.where(iws.enabled == 1)
+		.where(itm.variant_of == template_item_code)
+		.select(iws.name, iws.parent, iws.idx, iws.woocommerce_id)
+		.orderby(iws.parent)
+	).run(as_dict=True)
+
+
+def get_item_sync_lock(woocommerce_server: str, item_code: str, **kwargs) -> SyncLock:
+	"""
+    Get the lock for the link between an Item and its WooCommerce Product on a server, which is
+    keyed by the Item whether or not it is linked yet
+    """
+	return SyncLock("items", woocommerce_server, item_code, **kwargs)
+
+
+def get_rows_with_sync_lock(sync_locks: List[Tuple[_dict, SyncLock]]) -> List[str]:
+	"""
+    Return the names of the "Item WooCommerce Server" rows whose sync lock is still held
+    """
+	held_rows = []
+	for row, sync_lock in sync_locks:
+		try:
+			sync_lock.check_fencing_token()
+		except SyncLockLostError:
+			continue
+		held_rows.append(row.name)
+	return held_rows
+
+
+def get_item_price_rates(item_codes: List[str], wc_server: WooCommerceServer) -> Dict[str, float]:
+	"""
+    Return the prices of many Items, by item code, if price list sync is enabled
+    """
+	if not wc_server.enable_price_list_sync or not item_codes:
+		return {}
+
+	item_prices = frappe.get_all(
+		"Item Price",
+		filters={"item_code": ["in", item_codes], "price_list": wc_server.price_list},
+		fields=["item_code", "price_list_rate", "valid_upto"],
+	)
+	price_rates = {}
+	for price in item_prices:
+		if not price.valid_upto or getdate(price.valid_upto) >= getdate():
+			price_rates.setdefault(price.item_code, price.price_list_rate)
+	return price_rates
+
+
+def link_item_woocommerce_servers(links: Dict[str, Tuple]):
+	"""
+    Set the WooCommerce ID and sync hash of many "Item WooCommerce Server" rows with a single
+    update, given a map of row names to (WooCommerce ID, WooCommerce modification date)
+    """
+	if not links:
+		return
+
+	iws = frappe.qb.DocType("Item WooCommerce Server")
+	woocommerce_ids = Case()
+	sync_hashes = Case()
+	for name, (woocommerce_id, date_modified) in links.items():
+		woocommerce_ids = woocommerce_ids.when(iws.name == name, cstr(woocommerce_id))
+		sync_hashes = sync_hashes.when(iws.name == name, date_modified)
+
+	(
+		frappe.qb.update(iws)
+		.set(iws.woocommerce_id, woocommerce_ids)
+		.set(iws.woocommerce_last_sync_hash, sync_hashes)
+		.where(iws.name.isin(list(links)))
+	).run()
+
+
+@frappe.whitelist()
+def import_products_from_woocommerce(woocommerce_server: str):
+	"""
+    Queue the creation of Items for all WooCommerce Products on a WooCommerce Server that are not
+    linked to an Item yet
+    """
+	frappe.only_for("System Manager")
+	frappe.enqueue(
+		import_woocommerce_products,
+		queue="long",
+		timeout=CATALOGUE_PUSH_TIMEOUT,
+		woocommerce_server=woocommerce_server,
+		enqueue_after_commit=True,
+	)
+
+
+def import_woocommerce_products(
+		woocommerce_server: str, page_length: int = WC_PRODUCT_BATCH_SIZE
+) -> Dict:
+	"""
+    Create Items for the WooCommerce Products on a WooCommerce Server that are not linked to an
+    Item yet, streaming the products (and their variations) page by page.
+
+    Every page is committed, so that an interrupted import can be restarted where it stopped.
+    Returns the number of Items that were created and the throughput in Items per second
+    """
+	wc_server = frappe.get_cached_doc("WooCommerce Server", woocommerce_server)
+	if not wc_server.enable_sync:
+		raise SyncDisabledError(wc_server)
+
+	wc_api = next(
+		api
+		for api in WooCommerceProduct._init_api()
+		if api.woocommerce_server == woocommerce_server
+	)
+	product_import = WooCommerceProductImport(wc_server)
+	start = time.perf_counter()
+
+	for wc_products in WooCommerceProduct.get_pages_of_records(
+			wc_api, {}, page_length=page_length, keyset=True
+	):
+		# Variations follow their parent products, so that parents are imported first
+		variations = WooCommerceProduct.get_variations(
+			wc_products, {"servers": [woocommerce_server], "as_doc": True}, all_pages=True
+		)
+		product_import.import_page(wc_products + variations)
+		frappe.db.commit()
+
+	seconds = time.perf_counter() - start
+	result = {
+		"created": product_import.created,
+		"seconds": round(seconds, 1),
+		"items_per_second": round(product_import.created / seconds, 1) if seconds else 0,
+	}
+	frappe.logger("woocommerce_fusion").info(
+		f"Imported WooCommerce Products from {woocommerce_server}: {result}"
+	)
+	return result
+
+
+class WooCommerceProductImport:
+	"""
+    Class for creating Items from pages of WooCommerce Products of one WooCommerce Server.
+
+    The Items of parent products are remembered across pages. Items are
+    inserted without their "Item WooCommerce Server" row, so that the Item hooks do not queue a
+    sync, and the rows of a page are inserted with their sync hash at the end of the page
+    """
+
+	def __init__(self, wc_server: WooCommerceServer | _dict) -> None:
+		self.wc_server = wc_server
+		self.item_field_map = get_item_field_map(wc_server.name)
+		self.parent_item_codes: Dict[str, str] = {}
+		self.created = 0
+
+	def import_page(self, wc_products: List[WooCommerceProduct]) -> None:
+		"""
+        Create Items for the WooCommerce Products of a page that are not linked to an Item yet
+        """
+		linked_item_codes = self.get_linked_item_codes(wc_products)
+		imported = []
+
+		for wc_product in wc_products:
+			woocommerce_id = cstr(wc_product.woocommerce_id)
+			if woocommerce_id in linked_item_codes:
+				if wc_product.type == "variable":
+					self.parent_item_codes[woocommerce_id] = linked_item_codes[woocommerce_id]
+				continue
+
+			frappe.db.savepoint("woocommerce_product_import")
+			try:
+				item = self.create_item(wc_product)
+			except Exception:
+				frappe.db.rollback(save_point="woocommerce_product_import")
+				# Item Attributes that were saved with the Item were rolled back as well
+				for wc_attribute in json.loads(wc_product.attributes or "[]"):
+					frappe.clear_document_cache("Item Attribute", wc_attribute["name"])
+					clear_item_attribute_cache(wc_attribute["name"])
+				safe_log_error(
+					f"Item for WooCommerce Product {wc_product.name} not created:\n"
+					f"{frappe.get_traceback()}",
+					max_len=1000,
+				)
+				continue
+
+			if wc_product.type == "variable":
+				self.parent_item_codes[woocommerce_id] = item.name
+			imported.append((item, wc_product))
+
+		self.link_items(imported)
+		self.created += len(imported)
+
+	def get_linked_item_codes(self, wc_products: List[WooCommerceProduct]) -> Dict[str, str]:
+		"""
+        Get the Items that are linked to the WooCommerce Products of a page, or to the parents of
+        its variations that are not remembered yet, with a single query
+        """
+		woocommerce_ids = {cstr(wc_product.woocommerce_id) for wc_product in wc_products}
+		woocommerce_ids.update(
+			cstr(wc_product.parent_id)
+			for wc_product in wc_products
+			if wc_product.type == "variation"
+			and cstr(wc_product.parent_id) not in self.parent_item_codes
+		)
+		item_woocommerce_servers = frappe.get_all(
+			"Item WooCommerce Server",
+			filters={
+				"parenttype": "Item",
+				"woocommerce_server": self.wc_server.name,
+				"woocommerce_id": ["in", list(woocommerce_ids)],
+			},
+			fields=["woocommerce_id", "parent"],
+		)
+		linked_item_codes = {
+			cstr(row.woocommerce_id): row.parent for row in item_woocommerce_servers
+		}
+
+		# Remember parents of variations that were imported before
+		for wc_product in wc_products:
+			parent_id = cstr(wc_product.parent_id)
+			if wc_product.type == "variation" and parent_id in linked_item_codes:
+				self.parent_item_codes.setdefault(parent_id, linked_item_codes[parent_id])
+
+		return linked_item_codes
+
+	def create_item(self, wc_product: WooCommerceProduct) -> Item:
+		"""
+        Insert an Item for a WooCommerce Product, with the values of the mapped fields
+        """
+		item = frappe.new_doc("Item")
+
+		# Handle variants' attributes
+		if wc_product.type in ["variable", "variation"]:
+			merge_item_attributes_of_wc_product(wc_product)
+			for wc_attribute in json.loads(wc_product.attributes):
+				row = item.append("attributes")
+				row.attribute = wc_attribute["name"]
+				if wc_product.type == "variation":
+					row.attribute_value = wc_attribute["option"]
+
+		# Handle variants
+		if wc_product.type == "variable":
+			item.has_variants = 1
+
+		if wc_product.type == "variation":
+			item.variant_of = self.parent_item_codes.get(cstr(wc_product.parent_id))
+			if not item.variant_of:
+				raise ValueError(
+					f"No Item found for parent WooCommerce Product {wc_product.parent_id}"
+				)
+
+		# Set item_code according to WooCommerce Server config
+		item.item_code = (
+			wc_product.sku
+			if self.wc_server.name_by == "Product SKU" and wc_product.sku
+			else str(wc_product.woocommerce_id)
+		)
+		item.stock_uom = self.wc_server.uom or _("Nos")
+		item.item_group = self.wc_server.item_group
+		item.item_name = wc_product.woocommerce_name
+		if self.item_field_map.fields:
+			item.update(self.item_field_map.get_item_values(wc_product))
+
+		item.flags.ignore_mandatory = True
+		item.flags.created_by_sync = True
+		item.flags.dont_update_variants = True
+		item.insert()
+
+		return item
+
+	def link_items(self, imported: List[Tuple[Item, WooCommerceProduct]]) -> None:
+		"""
+        Insert the "Item WooCommerce Server" rows of the imported Items with a single query, with
+        the WooCommerce modification date as sync hash
+        """
+		if not imported:
+			return
+
+		timestamp = now()
+		fields = [
+			"name",
+			"owner",
+			"creation",
+			"modified",
+			"modified_by",
+			"docstatus",
+			"idx",
+			"parent",
+			"parentfield",
+			"parenttype",
+			"woocommerce_server",
+			"woocommerce_id",
+			"woocommerce_last_sync_hash",
+			"enabled",
+		]
+		values = [
+			(
+				frappe.generate_hash(length=10),
+				frappe.session.user,
+				timestamp,
+				timestamp,
+				frappe.session.user,
+				0,
+				1,
+				item.name,
+				"woocommerce_servers",
+				"Item",
+				self.wc_server.name,
+				cstr(wc_product.woocommerce_id),
+				wc_product.woocommerce_date_modified,
+				1,
+			)
+			for item, wc_product in imported
+		]
+		frappe.db.bulk_insert("Item WooCommerce Server", fields, values)
+
+		for item, _wc_product in imported:
+			set_item_fingerprint(item, self.wc_server.name)
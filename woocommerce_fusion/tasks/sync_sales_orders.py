@@ -1,27 +1,56 @@
+import hashlib
 import json
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, Iterator, List, Optional
 
 import frappe
 from erpnext.selling.doctype.sales_order.sales_order import SalesOrder, make_sales_invoice, make_delivery_note
 from erpnext.accounts.doctype.payment_entry.payment_entry import get_payment_entry
 
 from frappe import _
-from frappe.utils import get_datetime, flt
-from frappe.utils.data import cstr, now
+from frappe.query_builder import Criterion
+from frappe.utils import add_days, flt, get_datetime, today
+from frappe.utils.data import cstr
 
 from woocommerce_fusion.exceptions import SyncDisabledError
-from woocommerce_fusion.tasks.sync import SynchroniseWooCommerce
-from woocommerce_fusion.tasks.sync_items import run_item_sync
+from woocommerce_fusion.tasks.sync import (
+	SynchroniseWooCommerce,
+	SyncLock,
+	get_modified_after_params,
+	set_sync_watermark,
+)
+from woocommerce_fusion.tasks.sync_items import get_wc_products_by_id, run_item_sync
 from woocommerce_fusion.woocommerce.doctype.woocommerce_order.woocommerce_order import (
 	WC_ORDER_STATUS_MAPPING,
 	WC_ORDER_STATUS_MAPPING_REVERSE,
 	WooCommerceOrder,
 )
+from woocommerce_fusion.woocommerce.doctype.woocommerce_server.woocommerce_server import (
+	get_tax_index,
+)
 from woocommerce_fusion.woocommerce.woocommerce_api import (
 	generate_woocommerce_record_name_from_domain_and_id,
 )
 
+# Number of DB writes allowed for inserting and submitting a Sales Order, plus an allowance
+# for every item and tax row
+SALES_ORDER_DB_WRITE_BUDGET = 30
+SALES_ORDER_DB_WRITE_BUDGET_PER_ROW = 5
+
+# Submitted Sales Orders without a Payment Entry are reconciled in batches by a single job
+PAYMENT_RECONCILIATION_JOB = "woocommerce_payment_reconciliation"
+PAYMENT_RECONCILIATION_BATCH_SIZE = 50
+# Sales Orders older than this are no longer picked up for automatic payment reconciliation
+PAYMENT_RECONCILIATION_WINDOW_DAYS = 30
+PAYMENT_RECONCILIATION_SAVEPOINT = "woocommerce_payment_reconciliation"
+
+# Sales Orders whose WooCommerce Status changed are flagged with
+# custom_woocommerce_status_push_pending, and pushed in bulk by a single job. Multiple status
+# changes of an order before a flush are coalesced into the last one
+ORDER_STATUS_FLUSH_JOB = "woocommerce_order_status_flush"
+# Maximum number of objects per request to a WooCommerce batch endpoint
+WC_BATCH_SIZE = 100
+
 
 def run_sales_order_sync_from_hook(doc, method):
 	if (
@@ -84,37 +113,44 @@ def run_sales_order_sync(
 
 def sync_woocommerce_orders_modified_since(date_time_from=None):
 	"""
-	Get list of WooCommerce orders modified since date_time_from
+	Get list of WooCommerce orders modified since date_time_from, or else since each server's
+	watermark, and synchronise them.
+
+	The orders of each page are synchronised before the server's watermark is moved past the page
+	and committed, so that an interrupted scan resumes from the last synchronised page. Once an
+	order fails, the watermark is not moved any further in this scan, so that the next scan
+	retries it
 	"""
 	wc_settings = frappe.get_doc("WooCommerce Integration Settings")
 
-	if not date_time_from:
-		date_time_from = wc_settings.wc_last_sync_date
-
-	# Validate
-	if not date_time_from:
-		error_text = _(
-			"'Last Items Syncronisation Date' field on 'WooCommerce Integration Settings' is missing"
-		)
-		frappe.log_error(
-			"WooCommerce Items Sync Task Error",
-			error_text,
+	for wc_api in WooCommerceOrder._init_api():
+		params = get_modified_after_params(
+			wc_api.woocommerce_server,
+			"last_order_sync_watermark",
+			date_time_from=date_time_from,
+			default_date_time_from=wc_settings.wc_last_sync_date,
 		)
-		raise ValueError(error_text)
-
-	wc_orders = get_list_of_wc_orders(date_time_from=date_time_from)
-	wc_orders += get_list_of_wc_orders(date_time_from=date_time_from, status="trash")
-	for wc_order in wc_orders:
-		try:
-			run_sales_order_sync(woocommerce_order=wc_order, enqueue=True)
-		# Skip orders with errors, as these exceptions will be logged
-		except Exception:
-			pass
 
-	wc_settings.reload()
-	wc_settings.wc_last_sync_date = now()
-	wc_settings.flags.ignore_mandatory = True
-	wc_settings.save()
+		# Validate
+		if not params:
+			error_text = _(
+				"'Last Sales Orders Syncronisation Date' field on 'WooCommerce Integration Settings' is missing"
+			)
+			frappe.log_error("WooCommerce Sales Orders Sync Task Error", error_text)
+			continue
+
+		sync_failed = False
+		for wc_orders in get_pages_of_wc_orders_modified_since(wc_api, params):
+			for wc_order in filter_unchanged_wc_orders(wc_orders):
+				try:
+					run_sales_order_sync(woocommerce_order=wc_order)
+				# Skip orders with errors, as these exceptions will be logged
+				except Exception:
+					sync_failed = True
+
+			if not sync_failed:
+				set_sync_watermark(wc_api.woocommerce_server, "last_order_sync_watermark", wc_orders)
+			frappe.db.commit()
 
 
 class SynchroniseSalesOrder(SynchroniseWooCommerce):
@@ -130,20 +166,50 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 		super().__init__()
 		self.sales_order = sales_order
 		self.woocommerce_order = woocommerce_order
+		# Syncs triggered from ERPNext should not be skipped when the WooCommerce Order is unchanged
+		self.triggered_by_sales_order = bool(sales_order and not woocommerce_order)
 		self.settings = frappe.get_cached_doc("WooCommerce Integration Settings")
+		self.sales_order_db_writes = None
+		self.sync_lock = None
 
 	def run(self):
 		"""
 		Run synchronisation
 		"""
 		try:
-			self.get_corresponding_sales_order_or_woocommerce_order()
-			self.sync_wc_order_with_erpnext_order()
+			self.sync_lock = self.get_sync_lock()
+			if self.sync_lock:
+				with self.sync_lock:
+					# Another worker may have updated the Sales Order while we were waiting
+					if self.sync_lock.contended and self.sales_order:
+						self.sales_order.reload()
+					self.get_corresponding_sales_order_or_woocommerce_order()
+					self.sync_wc_order_with_erpnext_order()
+			else:
+				self.get_corresponding_sales_order_or_woocommerce_order()
+				self.sync_wc_order_with_erpnext_order()
 		except Exception as err:
 			error_message = f"{frappe.get_traceback()}\n\nSales Order Data: \n{str(self.sales_order.as_dict()) if self.sales_order else ''}\n\nWC Product Data \n{str(self.woocommerce_order.as_dict()) if self.woocommerce_order else ''}"
 			frappe.log_error("WooCommerce Error", error_message)
 			raise err
 
+	def get_sync_lock(self) -> Optional[SyncLock]:
+		"""
+		Get a lock keyed by the WooCommerce Order's server and ID, if known
+		"""
+		if self.woocommerce_order:
+			return SyncLock("orders", self.woocommerce_order.woocommerce_server, self.woocommerce_order.id)
+		if self.sales_order and self.sales_order.woocommerce_id:
+			return SyncLock("orders", self.sales_order.woocommerce_server, self.sales_order.woocommerce_id)
+		return None
+
+	def check_sync_lock(self):
+		"""
+		Verify that we still hold the sync lock before writing
+		"""
+		if self.sync_lock:
+			self.sync_lock.check_fencing_token()
+
 	def get_corresponding_sales_order_or_woocommerce_order(self):
 		"""
 		If we have an ERPNext Sales Order, get the corresponding WooCommerce Order
@@ -199,10 +265,9 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 			self.create_sales_order(self.woocommerce_order)
 		elif self.sales_order and self.woocommerce_order:
 			# both exist, check sync hash
-			if (
+			if self.triggered_by_sales_order or get_sync_hash(
 				self.woocommerce_order.woocommerce_date_modified
-				!= self.sales_order.custom_woocommerce_last_sync_hash
-			):
+			) != get_sync_hash(self.sales_order.custom_woocommerce_last_sync_hash):
 				if get_datetime(self.woocommerce_order.woocommerce_date_modified) > get_datetime(
 					self.sales_order.modified
 				):
@@ -211,6 +276,7 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 					self.sales_order.modified
 				):
 					self.update_woocommerce_order(self.woocommerce_order, self.sales_order)
+				self.set_sync_hash()
 
 			# If the Sales Order exists and has been submitted in the mean time, sync Payment Entries
 			if (
@@ -218,9 +284,24 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 				and not self.sales_order.woocommerce_payment_entry
 				and not self.sales_order.custom_attempted_woocommerce_auto_payment_entry
 			):
-				self.sales_order.reload()
-				if self.create_and_link_payment_entry(self.woocommerce_order, self.sales_order):
-					self.sales_order.save()
+				queue_payment_reconciliation(self.sales_order, self.woocommerce_order)
+
+	def set_sync_hash(self):
+		"""
+		Save the WooCommerce Order's modification date in the "custom_woocommerce_last_sync_hash" field
+		without going through Frappe triggers (to avoid touching the "modified" timestamp of the
+		Sales Order)
+		"""
+		if self.sales_order and self.woocommerce_order:
+			sync_hash = get_sync_hash(self.woocommerce_order.woocommerce_date_modified)
+			frappe.db.set_value(
+				"Sales Order",
+				self.sales_order.name,
+				"custom_woocommerce_last_sync_hash",
+				sync_hash,
+				update_modified=False,
+			)
+			self.sales_order.custom_woocommerce_last_sync_hash = sync_hash
 
 	def update_sales_order(self, woocommerce_order: WooCommerceOrder, sales_order: SalesOrder):
 		"""
@@ -228,13 +309,12 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 		"""
 		# Ignore cancelled Sales Orders
 		if sales_order.docstatus != 2:
-			so_dirty = False
+			changed_values = {}
 
 			# Update the woocommerce_status field if necessary
 			wc_order_status = WC_ORDER_STATUS_MAPPING_REVERSE[woocommerce_order.status]
 			if sales_order.woocommerce_status != wc_order_status:
-				sales_order.woocommerce_status = wc_order_status
-				so_dirty = True
+				changed_values["woocommerce_status"] = wc_order_status
 
 			# Update the payment_method_title field if necessary, use the payment method ID
 			# if the title field is too long
@@ -244,21 +324,31 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 				else woocommerce_order.payment_method
 			)
 			if sales_order.woocommerce_payment_method != payment_method:
-				sales_order.woocommerce_payment_method = payment_method
-				so_dirty = True
+				changed_values["woocommerce_payment_method"] = payment_method
 
-			if not sales_order.woocommerce_payment_entry:
-				if self.create_and_link_payment_entry(woocommerce_order, sales_order):
-					so_dirty = True
+			if changed_values:
+				self.check_sync_lock()
+				# Neither field affects totals, so the Sales Order's validations don't need to run
+				update_sales_order_fields(sales_order, changed_values)
 
-			if so_dirty:
-				sales_order.flags.created_by_sync = True
-				sales_order.save()
+			if sales_order.docstatus == 1 and not sales_order.woocommerce_payment_entry:
+				queue_payment_reconciliation(sales_order, woocommerce_order)
 
-	def create_and_link_payment_entry(self, wc_order: WooCommerceOrder, sales_order: SalesOrder) -> bool:
+	def create_and_link_payment_entry(
+		self,
+		wc_order: WooCommerceOrder,
+		sales_order: SalesOrder,
+		payment_account_mappings: Optional[Dict] = None,
+		commit: bool = True,
+	) -> bool:
 		"""
 		Create a Payment Entry for a WooCommerce Order that has been marked as Paid
+
+		When commit is False, the caller is responsible for committing, and the changes for this
+		order are rolled back to a savepoint on failure
 		"""
+		if not commit:
+			frappe.db.savepoint(PAYMENT_RECONCILIATION_SAVEPOINT)
 		try:
 			if not sales_order.grand_total or sales_order.grand_total <= 0:
 				frappe.log_error(f"The order {sales_order.name} does not have a valid amount")
@@ -281,14 +371,15 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 			):
 				return False
 
-			payment_method_bank_account_mapping = json.loads(wc_server.payment_method_bank_account_mapping)
-			company_bank_account = payment_method_bank_account_mapping.get(wc_order.payment_method)
+			if not payment_account_mappings:
+				payment_account_mappings = get_payment_account_mappings(wc_server)
+
+			company_bank_account = payment_account_mappings.bank_accounts.get(wc_order.payment_method)
 
 			if not company_bank_account:
 				raise KeyError(f"WooCommerce payment method {wc_order.payment_method} not found in WooCommerce Server")
 
-			payment_method_gl_account_mapping = json.loads(wc_server.payment_method_gl_account_mapping)
-			paid_to_account = payment_method_gl_account_mapping.get(wc_order.payment_method)
+			paid_to_account = payment_account_mappings.gl_accounts.get(wc_order.payment_method)
 
 			if not paid_to_account:
 				raise KeyError(f"No G/L account mapped for payment method {wc_order.payment_method}")
@@ -304,7 +395,7 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 					if meta.get("key") in ["_stripe_fee", "_stripe_net", "_stripe_charge_captured"]
 				}
 
-				if not stripe_details.get("_stripe_charge_captured") or stripe_details["_stripe_charge_captured"] != "yes":
+				if not is_stripe_charge_captured(wc_order):
 					frappe.log_error(f"Stripe payment not captured for {sales_order.name}")
 					return False
 
@@ -323,7 +414,8 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 				sales_invoice.due_date = sales_invoice.posting_date
 				sales_invoice.save()
 				sales_invoice.submit()
-				frappe.db.commit()
+				if commit:
+					frappe.db.commit()
 
 			# Create payment
 			payment_entry = get_payment_entry(
@@ -338,8 +430,7 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 			payment_entry.paid_to_account_currency = frappe.db.get_value("Account", paid_to_account, "account_currency")
 
 			if wc_order.payment_method == "stripe" and stripe_details.get("_stripe_fee"):
-				payment_method_fee_account_mapping = json.loads(wc_server.payment_method_fee_account_mapping)
-				fee_account = payment_method_fee_account_mapping.get(wc_order.payment_method)
+				fee_account = payment_account_mappings.fee_accounts.get(wc_order.payment_method)
 
 				if fee_account:
 					stripe_fee = float(stripe_details.get("_stripe_fee", 0))
@@ -369,17 +460,24 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 
 			payment_entry.save()
 			payment_entry.submit()
-			frappe.db.commit()
 
-			sales_order.reload()
+			# Link the Payment Entry without saving the whole Sales Order again
 			sales_order.woocommerce_payment_entry = payment_entry.name
 			sales_order.custom_attempted_woocommerce_auto_payment_entry = 1
-			sales_order.save()
-			frappe.db.commit()
+			sales_order.db_set(
+				{
+					"woocommerce_payment_entry": payment_entry.name,
+					"custom_attempted_woocommerce_auto_payment_entry": 1,
+				}
+			)
+			if commit:
+				frappe.db.commit()
 
 			return True
 
 		except Exception as e:
+			if not commit:
+				frappe.db.rollback(save_point=PAYMENT_RECONCILIATION_SAVEPOINT)
 			frappe.log_error(f"Error while creating payment: {str(e)}")
 			return False
 
@@ -401,12 +499,11 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 			wc_order_dirty = True
 
 		# Get the Item WooCommerce ID's
+		woocommerce_ids_by_item_code = get_woocommerce_ids_by_item_code(
+			[so_item.item_code for so_item in sales_order.items], wc_order.woocommerce_server
+		)
 		for so_item in sales_order.items:
-			so_item.woocommerce_id = frappe.get_value(
-				"Item WooCommerce Server",
-				filters={"parent": so_item.item_code, "woocommerce_server": wc_order.woocommerce_server},
-				fieldname="woocommerce_id",
-			)
+			so_item.woocommerce_id = woocommerce_ids_by_item_code.get(so_item.item_code)
 
 		# Update the line_items field if necessary
 		wc_server = frappe.get_cached_doc("WooCommerce Server", wc_order.woocommerce_server)
@@ -418,13 +515,13 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 				sales_order_items_changed = True
 			# Check if any line item properties changed
 			else:
-				for i, so_item in enumerate(sales_order.items):
+				for so_item, line_item in zip(sales_order.items, line_items):
 					if not so_item.woocommerce_id:
 						break
 					elif (
-						int(so_item.woocommerce_id) != line_items[i]["product_id"]
-						or so_item.qty != line_items[i]["quantity"]
-						or so_item.rate != get_tax_inc_price_for_woocommerce_line_item(line_items[i])
+						int(so_item.woocommerce_id) != line_item["product_id"]
+						or so_item.qty != line_item["quantity"]
+						or so_item.rate != get_tax_inc_price_for_woocommerce_line_item(line_item)
 					):
 						sales_order_items_changed = True
 						break
@@ -432,7 +529,7 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 			if sales_order_items_changed:
 				# Set the product_id for existing lines to null, to clear the line items for the WooCommerce order
 				replacement_line_items = [
-					{"id": line_item["id"], "product_id": None} for line_item in json.loads(wc_order.line_items)
+					{"id": line_item["id"], "product_id": None} for line_item in line_items
 				]
 				# Add the correct lines
 				replacement_line_items.extend(
@@ -459,6 +556,9 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 		new_sales_order.po_no = new_sales_order.woocommerce_id = wc_order.id
 
 		new_sales_order.woocommerce_status = WC_ORDER_STATUS_MAPPING_REVERSE[wc_order.status]
+		new_sales_order.custom_woocommerce_last_sync_hash = get_sync_hash(
+			wc_order.woocommerce_date_modified
+		)
 		wc_server = frappe.get_cached_doc("WooCommerce Server", wc_order.woocommerce_server)
 
 		new_sales_order.woocommerce_server = wc_order.woocommerce_server
@@ -511,27 +611,9 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 		self.set_items_in_sales_order(new_sales_order, wc_order)
 
 		# Add taxes on items
+		tax_index = get_tax_index(wc_server.name)
 		for tax in json.loads(wc_order.tax_lines):
-			tax_config = frappe.get_all(
-				"WooCommerce Taxes",
-				filters=[
-					["parent", "=", wc_server.name],
-					["woocommerce_tax_id", "=", tax.get("rate_id")]
-				],
-				fields=["account"]
-			)
-
-			if not tax_config:
-				tax_config = frappe.get_all(
-					"WooCommerce Taxes",
-					filters=[
-						["parent", "=", wc_server.name],
-						["woocommerce_tax_name", "=", tax.get("rate_code")]
-					],
-					fields=["account"]
-				)
-
-			tax_account = tax_config[0].account if tax_config else wc_server.tax_account
+			tax_account = tax_index.get_account(tax.get("rate_id"), tax.get("rate_code"))
 			
 			# Add VAT to items
 			if float(tax.get("tax_total", 0)) > 0:
@@ -575,70 +657,123 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 		new_sales_order.flags.ignore_version_check = True
 
 		try:
-			# Insert order
-			new_sales_order.insert()
+			# Calculate taxes, remove zero taxes and add the rounding difference in memory, so that
+			# the order is written once on insert and once on submit
+			self.calculate_taxes_and_rounding(new_sales_order, wc_order, wc_server)
 
-			# Calculate taxes and totals
-			new_sales_order.calculate_taxes_and_totals()
-			new_sales_order.reload()
+			db_writes_before = frappe.db.transaction_writes
 
-			# Remove tax lines with zero amount
-			taxes_to_remove = []
-			for i, tax in enumerate(new_sales_order.taxes):
-				if flt(tax.tax_amount, 2) == 0:
-					taxes_to_remove.append(tax)
-			
-			for tax in taxes_to_remove:
-				new_sales_order.remove(tax)
+			self.check_sync_lock()
 
-			if taxes_to_remove:
-				new_sales_order.calculate_taxes_and_totals()
-				new_sales_order.save()
-				new_sales_order.reload()
-
-			# Calculate rounding difference after tax calculation
-			total_calculated = flt(new_sales_order.grand_total, 2)
-			rounding_outstanding = flt(wc_order.total, 2) - total_calculated
-			
-			if abs(flt(rounding_outstanding, 2)) > 0:
-				new_sales_order.append("taxes", {
-					"charge_type": "Actual",
-					"account_head": wc_server.rounding_charge,
-					"description": "Rounding difference",
-					"tax_amount": rounding_outstanding,
-					"cost_center": wc_server.cost_center
-				})
-				new_sales_order.calculate_taxes_and_totals()
-				new_sales_order.save()
+			# Insert order
+			new_sales_order.insert()
 
 			if wc_server.submit_sales_orders:
 				# Submit order
 				new_sales_order.submit()
+
+			self.record_db_writes(new_sales_order, frappe.db.transaction_writes - db_writes_before)
+
+			if wc_server.submit_sales_orders:
 				frappe.db.commit()
-				new_sales_order.reload()
 
-				# Create and link payment entry
+				# Queue the creation of a linked payment entry
 				if float(wc_order.total) > 0:
-					self.create_and_link_payment_entry(wc_order, new_sales_order)
-					new_sales_order.save()
+					queue_payment_reconciliation(new_sales_order, wc_order)
 
 		except Exception as e:
 			frappe.log_error(f"Error while creating order: {str(e)}")
 			raise e
 
+	@staticmethod
+	def calculate_taxes_and_rounding(new_sales_order: SalesOrder, wc_order: WooCommerceOrder, wc_server):
+		"""
+		Calculate the taxes and totals of a new Sales Order, remove tax lines with a zero amount and
+		add a tax line for the rounding difference with the WooCommerce Order's total
+		"""
+		new_sales_order.set_missing_values(for_validate=True)
+		new_sales_order.calculate_taxes_and_totals()
+
+		# Remove tax lines with zero amount
+		taxes_to_remove = [tax for tax in new_sales_order.taxes if flt(tax.tax_amount, 2) == 0]
+		for tax in taxes_to_remove:
+			new_sales_order.remove(tax)
+
+		if taxes_to_remove:
+			new_sales_order.calculate_taxes_and_totals()
+
+		# Calculate rounding difference after tax calculation
+		total_calculated = flt(new_sales_order.grand_total, 2)
+		rounding_outstanding = flt(wc_order.total, 2) - total_calculated
+
+		if abs(flt(rounding_outstanding, 2)) > 0:
+			new_sales_order.append("taxes", {
+				"charge_type": "Actual",
+				"account_head": wc_server.rounding_charge,
+				"description": "Rounding difference",
+				"tax_amount": rounding_outstanding,
+				"cost_center": wc_server.cost_center
+			})
+			new_sales_order.calculate_taxes_and_totals()
+
+	def record_db_writes(self, sales_order: SalesOrder, db_writes: int):
+		"""
+		Keep track of the number of DB writes used to create a Sales Order, and log an error if
+		it is over budget
+		"""
+		self.sales_order_db_writes = db_writes
+		db_write_budget = get_sales_order_db_write_budget(sales_order)
+		if db_writes > db_write_budget:
+			frappe.log_error(
+				"WooCommerce Sales Order DB Write Budget Exceeded",
+				f"Sales Order {sales_order.name} used {db_writes} DB writes, the budget is {db_write_budget}",
+			)
+
 	def create_missing_items(self, wc_order, items_list, woocommerce_site):
 		"""
 		Searching for items linked to multiple WooCommerce sites
+
+		Only products that are not linked to an Item yet are fetched from WooCommerce
 		"""
+		item_woo_com_ids = []
 		for item_data in items_list:
 			item_woo_com_id = cstr(item_data.get("variation_id") or item_data.get("product_id"))
 
 			# Deleted items will have a "0" for variation_id/product_id
-			if item_woo_com_id != "0":
-				woocommerce_product_name = generate_woocommerce_record_name_from_domain_and_id(
-					woocommerce_site, item_woo_com_id
-				)
-				run_item_sync(woocommerce_product_name=woocommerce_product_name)
+			if item_woo_com_id != "0" and item_woo_com_id not in item_woo_com_ids:
+				item_woo_com_ids.append(item_woo_com_id)
+
+		if not item_woo_com_ids:
+			return
+
+		# Check which products are already linked to an Item with a single query
+		linked_woo_com_ids = frappe.get_all(
+			"Item WooCommerce Server",
+			filters={"woocommerce_server": woocommerce_site, "woocommerce_id": ["in", item_woo_com_ids]},
+			pluck="woocommerce_id",
+		)
+		missing_woo_com_ids = [
+			item_woo_com_id
+			for item_woo_com_id in item_woo_com_ids
+			if item_woo_com_id not in linked_woo_com_ids
+		]
+		if not missing_woo_com_ids:
+			return
+
+		# Fetch all missing products together and create their Items
+		fetched_woo_com_ids = set()
+		for wc_product in get_wc_products_by_id(woocommerce_site, missing_woo_com_ids):
+			run_item_sync(woocommerce_product=wc_product)
+			fetched_woo_com_ids.add(cstr(wc_product.woocommerce_id))
+
+		# Variations are not returned by the products endpoint, so fetch these individually
+		for item_woo_com_id in missing_woo_com_ids:
+			if item_woo_com_id in fetched_woo_com_ids:
+				continue
+			woocommerce_product_name = generate_woocommerce_record_name_from_domain_and_id(
+				woocommerce_site, item_woo_com_id
+			)
+			run_item_sync(woocommerce_product_name=woocommerce_product_name)
 
 	def set_items_in_sales_order(self, new_sales_order, wc_order):
 		"""
@@ -649,6 +784,10 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 		if not wc_server.warehouse:
 			frappe.throw(_("Please set Warehouse in WooCommerce Server"))
 
+		tax_index = get_tax_index(wc_server.name)
+		tax_lines = json.loads(wc_order.tax_lines)
+		billing_country = json.loads(wc_order.billing).get("country", "")
+
 		for item in json.loads(wc_order.line_items):
 			woocomm_item_id = item.get("variation_id") or item.get("product_id")
 
@@ -689,117 +828,52 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 				},
 			)
 
-			if not wc_server.use_actual_tax_type:
-				new_sales_order.taxes_and_charges = wc_server.sales_taxes_and_charges_template
-
-				# Trigger taxes calculation
-				new_sales_order.set_missing_lead_customer_details()
-			else:
+			if wc_server.use_actual_tax_type:
 				ordered_items_tax = item.get("total_tax")
 				if ordered_items_tax:
 					# Get tax details from tax lines
-					tax_lines = json.loads(wc_order.tax_lines)
 					if tax_lines:
 						tax_line = tax_lines[0]
-						tax_id = tax_line.get("rate_id")
-						tax_name = tax_line.get("rate_code")
 						tax_label = tax_line.get("label")
-						
-						# Try to find tax by WooCommerce ID or name first
-						tax_config = frappe.get_all(
-							"WooCommerce Taxes",
-							filters={
-								"parent": wc_server.name,
-								"woocommerce_tax_id": tax_id
-							},
-							fields=["account"]
+
+						# Find tax by WooCommerce ID, name or country, else use the default account
+						tax_account = tax_index.get_account(
+							tax_line.get("rate_id"), tax_line.get("rate_code"), billing_country
 						)
-						
-						if not tax_config:
-							tax_config = frappe.get_all(
-								"WooCommerce Taxes",
-								filters={
-									"parent": wc_server.name,
-									"woocommerce_tax_name": tax_name
-								},
-								fields=["account"]
-							)
-						
-						# If still not found, try by country
-						if not tax_config:
-							billing_data = json.loads(wc_order.billing)
-							country_code = billing_data.get("country", "")
-							
-							tax_config = frappe.get_all(
-								"WooCommerce Taxes",
-								filters={
-									"parent": wc_server.name,
-									"country": country_code
-								},
-								fields=["account"]
-							)
-						
-						# Use configured account or default
-						tax_account = tax_config[0].account if tax_config else wc_server.tax_account
 						add_tax_details(new_sales_order, ordered_items_tax, tax_label, tax_account)
 
-			# Handle shipping tax with correct tax account
-			if float(wc_order.shipping_tax) > 0:
-				tax_lines = json.loads(wc_order.tax_lines)
-				if tax_lines:
-					# Take first tax line as it contains all taxes
-					tax_line = tax_lines[0]
-					tax_id = tax_line.get("rate_id")
-					tax_name = tax_line.get("rate_code")
-					tax_label = tax_line.get("label")
-					
-					# Try to find tax by WooCommerce ID or name first
-					tax_config = frappe.get_all(
-						"WooCommerce Taxes",
-						filters={
-							"parent": wc_server.name,
-							"woocommerce_tax_id": tax_id
-						},
-						fields=["account"]
-					)
-					
-					if not tax_config:
-						tax_config = frappe.get_all(
-							"WooCommerce Taxes",
-							filters={
-								"parent": wc_server.name,
-								"woocommerce_tax_name": tax_name
-							},
-							fields=["account"]
-						)
-					
-					# If still not found, try by country
-					if not tax_config:
-						billing_data = json.loads(wc_order.billing)
-						country_code = billing_data.get("country", "")
-						
-						tax_config = frappe.get_all(
-							"WooCommerce Taxes",
-							filters={
-								"parent": wc_server.name,
-								"country": country_code
-							},
-							fields=["account"]
-						)
-					
-					# Use configured account or default for shipping tax
-					shipping_tax_account = tax_config[0].account if tax_config else wc_server.tax_account
-					add_tax_details(new_sales_order, float(tax_line.get("shipping_tax_total", 0)), f"Shipping {tax_label}", shipping_tax_account)
-				else:
-					add_tax_details(new_sales_order, float(wc_order.shipping_tax), "Shipping Tax", wc_server.tax_account)
+		# Orders without line items do not get taxes or shipping set here
+		if not new_sales_order.items:
+			return
 
-			# Add shipping cost (excluding tax) with f_n_f account
-			add_tax_details(
-				new_sales_order,
-				wc_order.shipping_total,
-				"Shipping Total",
-				wc_server.f_n_f_account,
-			)
+		if not wc_server.use_actual_tax_type:
+			new_sales_order.taxes_and_charges = wc_server.sales_taxes_and_charges_template
+
+			# Trigger taxes calculation, once for all items
+			new_sales_order.set_missing_lead_customer_details()
+
+		# Handle shipping tax with correct tax account
+		if float(wc_order.shipping_tax) > 0:
+			if tax_lines:
+				# Take first tax line as it contains all taxes
+				tax_line = tax_lines[0]
+				tax_label = tax_line.get("label")
+
+				# Use configured account or default for shipping tax
+				shipping_tax_account = tax_index.get_account(
+					tax_line.get("rate_id"), tax_line.get("rate_code"), billing_country
+				)
+				add_tax_details(new_sales_order, float(tax_line.get("shipping_tax_total", 0)), f"Shipping {tax_label}", shipping_tax_account)
+			else:
+				add_tax_details(new_sales_order, float(wc_order.shipping_tax), "Shipping Tax", wc_server.tax_account)
+
+		# Add shipping cost (excluding tax) with f_n_f account
+		add_tax_details(
+			new_sales_order,
+			wc_order.shipping_total,
+			"Shipping Total",
+			wc_server.f_n_f_account,
+		)
 
 	def create_or_link_customer_and_address(self, wc_order: WooCommerceOrder) -> str:
 		"""
@@ -836,8 +910,7 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 		else:
 			customer_identifier = customer_woo_com_email
 
-		# Check if customer exists using the identifier
-
+		# Check if customer exists using the (unique) identifier
 		existing_customer = frappe.get_value(
 			"Customer", {"woocommerce_identifier": customer_identifier}, "name"
 		)
@@ -852,20 +925,35 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 			# Edit Customer
 			customer = frappe.get_doc("Customer", existing_customer)
 
-		customer.customer_name = company_name if company_name else individual_name
-		customer.woocommerce_identifier = customer_identifier
+		customer_values = {
+			"customer_name": company_name if company_name else individual_name,
+			"woocommerce_identifier": customer_identifier,
+		}
 
 		# Check if vat_id exists in raw_billing_data and is a valid string
 		vat_id = raw_billing_data.get("vat_id")
 
 		if isinstance(vat_id, str) and vat_id.strip():
-			customer.tax_id = vat_id
+			customer_values["tax_id"] = vat_id
+
+		customer_dirty = customer.is_new()
+		for fieldname, value in customer_values.items():
+			if customer.get(fieldname) != value:
+				customer.set(fieldname, value)
+				customer_dirty = True
 
 		customer.flags.ignore_mandatory = True
 
 		try:
-			customer.save()
+			# Skip saving unchanged Customers
+			if customer_dirty:
+				customer.save()
 			self.customer = customer
+		except frappe.UniqueValidationError:
+			# The Customer has been created in the mean time by another sync job
+			self.customer = customer = frappe.get_doc(
+				"Customer", {"woocommerce_identifier": customer_identifier}
+			)
 		except Exception:
 			error_message = f"{frappe.get_traceback()}\n\nCustomer Data{str(customer.as_dict())}"
 			frappe.log_error("WooCommerce Error", error_message)
@@ -880,7 +968,15 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 		If the address(es) exist, update it, else create it
 		"""
 		addresses = get_addresses_linking_to(
-			"Customer", self.customer.name, fields=["name", "is_primary_address", "is_shipping_address"]
+			"Customer",
+			self.customer.name,
+			fields=[
+				"name",
+				"address_type",
+				"is_primary_address",
+				"is_shipping_address",
+				"custom_woocommerce_address_hash",
+			],
 		)
 
 		existing_billing_address = next(
@@ -914,7 +1010,12 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 			address = existing_billing_address or existing_shipping_address
 			if address:
 				self.update_address(
-					address.name, raw_billing_data, self.customer, is_primary_address=1, is_shipping_address=1
+					address.name,
+					raw_billing_data,
+					self.customer,
+					is_primary_address=1,
+					is_shipping_address=1,
+					existing_address=address,
 				)
 			else:
 				self.create_address(
@@ -929,6 +1030,7 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 					self.customer,
 					is_primary_address=1,
 					is_shipping_address=0,
+					existing_address=existing_billing_address,
 				)
 			else:
 				self.create_address(
@@ -943,67 +1045,517 @@ class SynchroniseSalesOrder(SynchroniseWooCommerce):
 					self.customer,
 					is_primary_address=0,
 					is_shipping_address=1,
+					existing_address=existing_shipping_address,
 				)
 			else:
 				self.create_address(
 					raw_shipping_data, self.customer, "Shipping", is_primary_address=0, is_shipping_address=1
 				)
 
+	def get_address_title(self, customer, address_type):
+		"""
+		Return the Address title, according to the WooCommerce Server's title convention
+		"""
+		title_convention = frappe.get_cached_doc(
+			"WooCommerce Server", self.woocommerce_order.woocommerce_server
+		).address_title_convention
+		return (
+			customer.customer_name
+			if title_convention == "Customer Name only"
+			else f"{customer.name}-{address_type}"
+		)
+
 	def create_address(
 		self, raw_data: Dict, customer, address_type, is_primary_address=0, is_shipping_address=0
 	):
-		title_convention = frappe.db.get_value(
-			"WooCommerce Server", self.woocommerce_order.woocommerce_server, "address_title_convention"
-		)
 		address = frappe.new_doc("Address")
 
 		address.address_type = address_type
 		address.address_line1 = raw_data.get("address_1", "Not Provided")
 		address.address_line2 = raw_data.get("address_2", "Not Provided")
 		address.city = raw_data.get("city", "Not Provided")
-		address.country = frappe.get_value("Country", {"code": raw_data.get("country", "IN").lower()})
+		address.country = get_country_name(raw_data.get("country", "IN"))
 		address.state = raw_data.get("state")
 		address.pincode = raw_data.get("postcode")
 		address.phone = raw_data.get("phone")
-		address.address_title = (
-			customer.customer_name
-			if title_convention == "Customer Name only"
-			else f"{customer.name}-{address.address_type}"
-		)
+		address.address_title = self.get_address_title(customer, address.address_type)
 		address.is_primary_address = is_primary_address
 		address.is_shipping_address = is_shipping_address
+		address.custom_woocommerce_address_hash = get_address_hash(
+			raw_data, address.address_title, is_primary_address, is_shipping_address
+		)
 		address.append("links", {"link_doctype": "Customer", "link_name": customer.name})
 
 		address.flags.ignore_mandatory = True
 		address.save()
 
 	def update_address(
-		self, address_name, raw_data: Dict, customer, is_primary_address=0, is_shipping_address=0
+		self,
+		address_name,
+		raw_data: Dict,
+		customer,
+		is_primary_address=0,
+		is_shipping_address=0,
+		existing_address=None,
 	):
-		title_convention = frappe.db.get_value(
-			"WooCommerce Server", self.woocommerce_order.woocommerce_server, "address_title_convention"
-		)
+		"""
+		Update the Address, unless it was last synchronised from the same WooCommerce address
+		"""
+		if existing_address and existing_address.address_type:
+			address_title = self.get_address_title(customer, existing_address.address_type)
+			address_hash = get_address_hash(
+				raw_data, address_title, is_primary_address, is_shipping_address
+			)
+			if existing_address.custom_woocommerce_address_hash == address_hash:
+				return
+
 		address = frappe.get_doc("Address", address_name)
 
 		address.address_line1 = raw_data.get("address_1", "Not Provided")
 		address.address_line2 = raw_data.get("address_2", "Not Provided")
 		address.city = raw_data.get("city", "Not Provided")
-		address.country = frappe.get_value("Country", {"code": raw_data.get("country", "IN").lower()})
+		address.country = get_country_name(raw_data.get("country", "IN"))
 		address.state = raw_data.get("state")
 		address.pincode = raw_data.get("postcode")
 		address.phone = raw_data.get("phone")
-		address.address_title = (
-			{customer.customer_name}
-			if title_convention == "Customer Name only"
-			else f"{customer.name}-{address.address_type}"
-		)
+		address.address_title = self.get_address_title(customer, address.address_type)
 		address.is_primary_address = is_primary_address
 		address.is_shipping_address = is_shipping_address
+		address.custom_woocommerce_address_hash = get_address_hash(
+			raw_data, address.address_title, is_primary_address, is_shipping_address
+		)
 
 		address.flags.ignore_mandatory = True
 		address.save()
 
 
+def get_sync_hash(date_modified) -> Optional[datetime]:
+	"""
+	Return the sync hash of a Sales Order, given a WooCommerce Order's modification date
+	"""
+	return get_datetime(date_modified) if date_modified else None
+
+
+def filter_unchanged_wc_orders(wc_orders: List[WooCommerceOrder]) -> List[WooCommerceOrder]:
+	"""
+	Drop WooCommerce Orders whose modification date matches the sync hash of their Sales Order,
+	checking each page of orders against ERPNext with one query per server
+	"""
+	wc_records_per_page_limit = 100
+	changed_wc_orders = []
+
+	for i in range(0, len(wc_orders), wc_records_per_page_limit):
+		page = wc_orders[i : i + wc_records_per_page_limit]
+
+		wc_orders_by_server = {}
+		for wc_order in page:
+			wc_orders_by_server.setdefault(wc_order.woocommerce_server, []).append(wc_order)
+
+		for woocommerce_server, server_wc_orders in wc_orders_by_server.items():
+			sales_orders = frappe.get_all(
+				"Sales Order",
+				filters={
+					"woocommerce_server": woocommerce_server,
+					"woocommerce_id": ["in", [cstr(wc_order.id) for wc_order in server_wc_orders]],
+				},
+				fields=["woocommerce_id", "custom_woocommerce_last_sync_hash"],
+			)
+			sync_hashes = {
+				cstr(sales_order.woocommerce_id): get_sync_hash(sales_order.custom_woocommerce_last_sync_hash)
+				for sales_order in sales_orders
+			}
+			changed_wc_orders.extend(
+				wc_order
+				for wc_order in server_wc_orders
+				if cstr(wc_order.id) not in sync_hashes
+				or sync_hashes[cstr(wc_order.id)] != get_sync_hash(wc_order.woocommerce_date_modified)
+			)
+
+	return changed_wc_orders
+
+
+def queue_woocommerce_order_status(sales_order_name: str, woocommerce_status: str):
+	"""
+	Set the WooCommerce Status of a Sales Order, and flag it to be pushed to WooCommerce in bulk
+	"""
+	frappe.db.set_value(
+		"Sales Order",
+		sales_order_name,
+		{"woocommerce_status": woocommerce_status, "custom_woocommerce_status_push_pending": 1},
+	)
+	if frappe.flags.in_test:
+		flush_woocommerce_order_statuses()
+	else:
+		frappe.enqueue(
+			"woocommerce_fusion.tasks.sync_sales_orders.flush_woocommerce_order_statuses",
+			queue="long",
+			job_id=ORDER_STATUS_FLUSH_JOB,
+			deduplicate=True,
+			enqueue_after_commit=True,
+		)
+
+
+def flush_woocommerce_order_statuses():
+	"""
+	Push the WooCommerce Status of flagged Sales Orders to WooCommerce through the orders/batch
+	endpoint, in groups of WC_BATCH_SIZE per server, committing after every group.
+
+	Also runs from the scheduler, to pick up Sales Orders that are still flagged
+	"""
+	pending_sales_orders = frappe.get_all(
+		"Sales Order",
+		filters={"custom_woocommerce_status_push_pending": 1},
+		fields=["name", "woocommerce_server", "woocommerce_id", "woocommerce_status"],
+		order_by="modified",
+	)
+	if not pending_sales_orders:
+		return
+
+	# Group the updates by server
+	sales_orders_by_server = {}
+	for sales_order in pending_sales_orders:
+		if sales_order.woocommerce_status not in WC_ORDER_STATUS_MAPPING:
+			frappe.log_error(
+				"WooCommerce Error",
+				f"WooCommerce Status {sales_order.woocommerce_status} of Sales Order {sales_order.name} "
+				"cannot be pushed to WooCommerce",
+			)
+			clear_woocommerce_status_push_pending([sales_order])
+			continue
+		sales_orders_by_server.setdefault(sales_order.woocommerce_server, []).append(sales_order)
+
+	wc_api_list = WooCommerceOrder._init_api()
+	for woocommerce_server, sales_orders in sales_orders_by_server.items():
+		wc_api = next(
+			(api for api in wc_api_list if api.woocommerce_server == woocommerce_server), None
+		)
+		if not wc_api:
+			# Leave updates for servers with sync disabled flagged
+			continue
+
+		for i in range(0, len(sales_orders), WC_BATCH_SIZE):
+			batch = sales_orders[i : i + WC_BATCH_SIZE]
+			updates = [
+				{
+					"id": int(sales_order.woocommerce_id),
+					"status": WC_ORDER_STATUS_MAPPING[sales_order.woocommerce_status],
+				}
+				for sales_order in batch
+			]
+			try:
+				response = wc_api.api.post("orders/batch", data={"update": updates})
+			except Exception:
+				frappe.log_error("WooCommerce Error", frappe.get_traceback())
+				continue
+			if response.status_code != 200:
+				frappe.log_error(
+					"WooCommerce Error",
+					f"orders/batch failed\nResponse Code: {response.status_code}\nResponse Text: {response.text}",
+				)
+				continue
+
+			for updated_order in response.json().get("update", []):
+				if "error" in updated_order:
+					frappe.log_error(
+						"WooCommerce Error",
+						f"Status update of WooCommerce Order #{updated_order.get('id')} failed\n{updated_order['error']}",
+					)
+
+			clear_woocommerce_status_push_pending(batch)
+			frappe.db.commit()
+
+
+def clear_woocommerce_status_push_pending(sales_orders: List[Dict]):
+	"""
+	Clear the push flag of Sales Orders with a single update, unless their WooCommerce Status
+	changed again since it was read
+	"""
+	so = frappe.qb.DocType("Sales Order")
+	(
+		frappe.qb.update(so)
+		.set(so.custom_woocommerce_status_push_pending, 0)
+		.where(
+			Criterion.any(
+				[
+					(so.name == sales_order.name)
+					& (so.woocommerce_status == sales_order.woocommerce_status)
+					for sales_order in sales_orders
+				]
+			)
+		)
+	).run()
+
+
+def update_sales_order_fields(sales_order: SalesOrder, changed_values: Dict):
+	"""
+	Update fields on a Sales Order with a direct column update, and record the change in a Version
+	"""
+	version = frappe.new_doc("Version")
+	version.ref_doctype = sales_order.doctype
+	version.docname = sales_order.name
+	version.data = frappe.as_json(
+		{
+			"added": [],
+			"changed": [
+				[fieldname, sales_order.get(fieldname), value] for fieldname, value in changed_values.items()
+			],
+			"removed": [],
+			"row_changed": [],
+		}
+	)
+
+	sales_order.flags.created_by_sync = True
+	sales_order.db_set(changed_values)
+
+	version.flags.ignore_links = True
+	version.insert(ignore_permissions=True)
+
+
+def get_woocommerce_ids_by_item_code(item_codes: List[str], woocommerce_server: str) -> Dict:
+	"""
+	Return a mapping of Item codes to their WooCommerce ID's on the given server, using one query
+	"""
+	if not item_codes:
+		return {}
+
+	item_woocommerce_servers = frappe.get_all(
+		"Item WooCommerce Server",
+		filters={"parent": ["in", list(set(item_codes))], "woocommerce_server": woocommerce_server},
+		fields=["parent", "woocommerce_id"],
+	)
+	woocommerce_ids_by_item_code = {}
+	for row in item_woocommerce_servers:
+		woocommerce_ids_by_item_code.setdefault(row.parent, row.woocommerce_id)
+	return woocommerce_ids_by_item_code
+
+
+def get_payment_account_mappings(wc_server) -> Dict:
+	"""
+	Parse the payment method to bank, G/L and fee account mappings of a WooCommerce Server
+	"""
+	return frappe._dict(
+		bank_accounts=json.loads(wc_server.payment_method_bank_account_mapping or "{}"),
+		gl_accounts=json.loads(wc_server.payment_method_gl_account_mapping or "{}"),
+		fee_accounts=json.loads(wc_server.get("payment_method_fee_account_mapping") or "{}"),
+	)
+
+
+def queue_payment_reconciliation(sales_order: SalesOrder, wc_order: WooCommerceOrder):
+	"""
+	Queue the creation of the Sales Invoice and Payment Entry of a submitted Sales Order, so that
+	order synchronisation does not wait on accounting documents
+	"""
+	wc_server = frappe.get_cached_doc("WooCommerce Server", sales_order.woocommerce_server)
+	if not wc_server.enable_payments_sync or not wc_order.payment_method:
+		return
+
+	if frappe.flags.in_test:
+		reconcile_payment(SynchroniseSalesOrder(), sales_order.name, wc_order, {})
+	else:
+		frappe.enqueue(
+			"woocommerce_fusion.tasks.sync_sales_orders.reconcile_pending_payments",
+			queue="long",
+			job_id=PAYMENT_RECONCILIATION_JOB,
+			deduplicate=True,
+			enqueue_after_commit=True,
+		)
+
+
+def reconcile_pending_payments(batch_size: int = PAYMENT_RECONCILIATION_BATCH_SIZE):
+	"""
+	Create the Sales Invoices and Payment Entries of recent submitted Sales Orders that have no
+	Payment Entry yet, committing once per batch.
+
+	The pending Sales Orders are selected from the database, so that none are lost if a job is
+	interrupted. Also runs from the scheduler, to pick up orders that were paid later
+	"""
+	woocommerce_servers = frappe.get_all(
+		"WooCommerce Server", filters={"enable_sync": 1, "enable_payments_sync": 1}, pluck="name"
+	)
+	if not woocommerce_servers:
+		return
+
+	pending_sales_orders = frappe.get_all(
+		"Sales Order",
+		filters={
+			"docstatus": 1,
+			"woocommerce_server": ["in", woocommerce_servers],
+			"woocommerce_id": ["is", "set"],
+			"woocommerce_payment_method": ["is", "set"],
+			"woocommerce_payment_entry": ["is", "not set"],
+			"custom_attempted_woocommerce_auto_payment_entry": 0,
+			"transaction_date": [">=", add_days(today(), -PAYMENT_RECONCILIATION_WINDOW_DAYS)],
+		},
+		fields=["name", "woocommerce_server", "woocommerce_id"],
+		order_by="creation",
+	)
+
+	sync = SynchroniseSalesOrder()
+	payment_account_mappings_by_server = {}
+
+	for i in range(0, len(pending_sales_orders), batch_size):
+		batch = pending_sales_orders[i : i + batch_size]
+
+		# Get the WooCommerce Orders of the batch with one request per server
+		wc_orders = {}
+		for woocommerce_server in {sales_order.woocommerce_server for sales_order in batch}:
+			woocommerce_ids = [
+				cstr(sales_order.woocommerce_id)
+				for sales_order in batch
+				if sales_order.woocommerce_server == woocommerce_server
+			]
+			for wc_order in get_wc_orders_by_id(woocommerce_server, woocommerce_ids):
+				wc_orders[(woocommerce_server, cstr(wc_order.id))] = wc_order
+
+		for sales_order in batch:
+			wc_order = wc_orders.get((sales_order.woocommerce_server, cstr(sales_order.woocommerce_id)))
+			if wc_order:
+				reconcile_payment(sync, sales_order.name, wc_order, payment_account_mappings_by_server)
+
+		frappe.db.commit()
+
+
+def reconcile_payment(
+	sync: "SynchroniseSalesOrder",
+	sales_order_name: str,
+	wc_order: WooCommerceOrder,
+	payment_account_mappings_by_server: Dict,
+):
+	"""
+	Create the Sales Invoice and Payment Entry of a submitted Sales Order once its WooCommerce
+	Order is paid, without committing
+	"""
+	# Lock the Sales Order, and skip it if it has been reconciled by another job
+	sales_order_state = frappe.db.get_value(
+		"Sales Order",
+		sales_order_name,
+		["docstatus", "woocommerce_payment_entry", "custom_attempted_woocommerce_auto_payment_entry"],
+		as_dict=True,
+		for_update=True,
+	)
+	if (
+		not sales_order_state
+		or sales_order_state.docstatus != 1
+		or sales_order_state.woocommerce_payment_entry
+		or sales_order_state.custom_attempted_woocommerce_auto_payment_entry
+	):
+		return
+
+	sales_order = frappe.get_doc("Sales Order", sales_order_name)
+	wc_server = frappe.get_cached_doc("WooCommerce Server", sales_order.woocommerce_server)
+
+	# Orders that are not paid yet, or whose Stripe charge is not captured yet, stay pending
+	if not (wc_server.ignore_date_paid or wc_order.date_paid):
+		return
+	if wc_order.payment_method == "stripe" and not is_stripe_charge_captured(wc_order):
+		return
+
+	# Orders without a valid amount will never get a Payment Entry, so don't retry them
+	if not sales_order.grand_total or sales_order.grand_total <= 0:
+		frappe.log_error(f"The order {sales_order.name} does not have a valid amount")
+		frappe.db.set_value(
+			"Sales Order",
+			sales_order_name,
+			"custom_attempted_woocommerce_auto_payment_entry",
+			1,
+			update_modified=False,
+		)
+		return
+
+	if sales_order.woocommerce_server not in payment_account_mappings_by_server:
+		payment_account_mappings_by_server[sales_order.woocommerce_server] = (
+			get_payment_account_mappings(wc_server)
+		)
+
+	# Other failures, e.g. a payment method that is not mapped yet, are logged and retried on the
+	# next run, until the Sales Order falls outside the reconciliation window
+	sync.create_and_link_payment_entry(
+		wc_order,
+		sales_order,
+		payment_account_mappings=payment_account_mappings_by_server[sales_order.woocommerce_server],
+		commit=False,
+	)
+
+
+def is_stripe_charge_captured(wc_order: WooCommerceOrder) -> bool:
+	"""
+	Return True if the Stripe charge of a WooCommerce Order has been captured
+	"""
+	meta_data_list = json.loads(wc_order.get("meta_data") or "[]")
+	return any(
+		meta.get("key") == "_stripe_charge_captured" and meta.get("value") == "yes"
+		for meta in meta_data_list
+	)
+
+
+def get_wc_orders_by_id(woocommerce_server: str, woocommerce_ids: List[str]) -> List[WooCommerceOrder]:
+	"""
+	Get WooCommerce Orders from a single server by their IDs, using one "include=" request per
+	page of IDs
+	"""
+	wc_records_per_page_limit = 100
+	wc_orders = []
+
+	for i in range(0, len(woocommerce_ids), wc_records_per_page_limit):
+		ids = [str(woocommerce_id) for woocommerce_id in woocommerce_ids[i : i + wc_records_per_page_limit]]
+		wc_orders.extend(
+			WooCommerceOrder.get_list_of_records(
+				{
+					"filters": [["WooCommerce Order", "id", "in", ids]],
+					"page_length": len(ids),
+					"servers": [woocommerce_server],
+					"as_doc": True,
+				}
+			)
+		)
+
+	return wc_orders
+
+
+def get_pages_of_wc_orders_modified_since(wc_api, params: Dict) -> Iterator[List[WooCommerceOrder]]:
+	"""
+	Yield pages of WooCommerce Orders from a server, including trashed orders, with one paged scan
+	per server where possible
+	"""
+	wc_settings = frappe.get_cached_doc("WooCommerce Integration Settings")
+	if wc_settings.minimum_creation_date:
+		params = {**params, "after": wc_settings.minimum_creation_date}
+
+	woocommerce_ids = set()
+	for status in get_wc_order_status_filters(wc_api):
+		for page in WooCommerceOrder.get_pages_of_records(
+			wc_api, {**params, "status": status}, keyset=True
+		):
+			wc_orders = [wc_order for wc_order in page if wc_order.id not in woocommerce_ids]
+			woocommerce_ids.update(wc_order.id for wc_order in wc_orders)
+			yield wc_orders
+
+
+def get_wc_order_status_filters(wc_api) -> List[str]:
+	"""
+	Return the "status" filters needed to list orders with any status, including trashed orders.
+
+	The "any" status excludes trashed orders, so where possible the order statuses registered on
+	the WooCommerce site are listed explicitly, together with "trash", to scan in a single pass
+	"""
+	cache_key = f"woocommerce_order_statuses|{wc_api.woocommerce_server}"
+	order_statuses = frappe.cache().get_value(cache_key)
+	if order_statuses is None:
+		order_statuses = []
+		try:
+			response = wc_api.api.get("reports/orders/totals")
+			if response.status_code == 200:
+				order_statuses = [status["slug"] for status in response.json()]
+		except Exception:
+			pass
+		frappe.cache().set_value(cache_key, order_statuses, expires_in_sec=86400)
+
+	if not order_statuses:
+		# Fall back to separate scans for all statuses and for trashed orders
+		return ["any", "trash"]
+	return [",".join([status for status in order_statuses if status != "trash"] + ["trash"])]
+
+
 def get_list_of_wc_orders(
 	date_time_from: Optional[datetime] = None,
 	sales_order: Optional[SalesOrder] = None,
@@ -1061,12 +1613,28 @@ def rename_address(address, customer):
 
 
 def create_contact(data, customer):
+	"""
+	Create a Contact for the Customer, or update the existing Contact with the same email and phone
+	"""
 	email = data.get("email", None)
 	phone = data.get("phone", None)
 
 	if not email and not phone:
 		return
 
+	existing_contact = get_contact_linking_to("Customer", customer.name, email, phone)
+	if existing_contact:
+		# Only update the Contact if its name changed
+		if existing_contact.first_name != data.get("first_name") or existing_contact.last_name != data.get(
+			"last_name"
+		):
+			contact = frappe.get_doc("Contact", existing_contact.name)
+			contact.first_name = data.get("first_name")
+			contact.last_name = data.get("last_name")
+			contact.flags.ignore_mandatory = True
+			contact.save()
+		return
+
 	contact = frappe.new_doc("Contact")
 	contact.first_name = data.get("first_name")
 	contact.last_name = data.get("last_name")
@@ -1085,6 +1653,27 @@ def create_contact(data, customer):
 	contact.save()
 
 
+def get_contact_linking_to(doctype, docname, email=None, phone=None):
+	"""Return the Contact linking to the given document with the given primary email and phone"""
+	contacts = frappe.get_all(
+		"Contact",
+		fields=["name", "first_name", "last_name", "email_id", "phone", "mobile_no"],
+		filters=[
+			["Dynamic Link", "link_doctype", "=", doctype],
+			["Dynamic Link", "link_name", "=", docname],
+		],
+	)
+	return next(
+		(
+			contact
+			for contact in contacts
+			if cstr(contact.email_id) == cstr(email)
+			and cstr(contact.phone or contact.mobile_no) == cstr(phone)
+		),
+		None,
+	)
+
+
 def add_tax_details(sales_order, price, desc, tax_account_head):
 	# Search for existing tax line with same account
 	existing_tax = next(
@@ -1115,6 +1704,15 @@ def add_tax_details(sales_order, price, desc, tax_account_head):
 		tax_row.base_total = tax_row.total
 
 
+def get_sales_order_db_write_budget(sales_order: SalesOrder) -> int:
+	"""
+	Return the maximum number of DB writes expected for inserting and submitting a Sales Order
+	"""
+	return SALES_ORDER_DB_WRITE_BUDGET + SALES_ORDER_DB_WRITE_BUDGET_PER_ROW * (
+		len(sales_order.items) + len(sales_order.taxes)
+	)
+
+
 def get_tax_inc_price_for_woocommerce_line_item(line_item: Dict):
 	"""
 	WooCommerce's Line Item "price" field will always show the tax excluding amount.
@@ -1147,6 +1745,46 @@ def create_placeholder_item(sales_order: SalesOrder):
 	return item
 
 
+ADDRESS_HASH_KEYS = (
+	"address_1",
+	"address_2",
+	"city",
+	"country",
+	"state",
+	"postcode",
+	"phone",
+)
+
+# Country names by lowercase country code, per site
+_country_name_by_code: Dict[str, Dict[str, str]] = {}
+
+
+def get_address_hash(raw_data: Dict, address_title, is_primary_address=0, is_shipping_address=0):
+	"""
+	Return a hash of the normalised WooCommerce address data that is synchronised to an Address
+	"""
+	normalised_data = {key: cstr(raw_data.get(key)).strip() for key in ADDRESS_HASH_KEYS}
+	normalised_data["country"] = normalised_data["country"].lower()
+	normalised_data["address_title"] = cstr(address_title)
+	normalised_data["is_primary_address"] = int(is_primary_address or 0)
+	normalised_data["is_shipping_address"] = int(is_shipping_address or 0)
+	return hashlib.sha256(json.dumps(normalised_data, sort_keys=True).encode("utf8")).hexdigest()
+
+
+def get_country_name(country_code: Optional[str]) -> Optional[str]:
+	"""
+	Return the name of the Country with the given code, from an in-memory map of all Countries
+	"""
+	country_names = _country_name_by_code.get(frappe.local.site)
+	if country_names is None:
+		country_names = {
+			cstr(country.code).lower(): country.name
+			for country in frappe.get_all("Country", fields=["name", "code"])
+		}
+		_country_name_by_code[frappe.local.site] = country_names
+	return country_names.get(cstr(country_code).lower())
+
+
 def get_addresses_linking_to(doctype, docname, fields=None):
 	"""Return a list of Addresses containing a link to the given document."""
 	return frappe.get_all(
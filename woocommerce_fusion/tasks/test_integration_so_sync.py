@@ -6,7 +6,9 @@ from erpnext.selling.doctype.sales_order.sales_order import update_status
 from erpnext.stock.doctype.item.test_item import create_item
 
 from woocommerce_fusion.tasks.sync_sales_orders import (
+	SynchroniseSalesOrder,
 	get_addresses_linking_to,
+	get_sales_order_db_write_budget,
 	get_tax_inc_price_for_woocommerce_line_item,
 	run_sales_order_sync,
 )
@@ -88,6 +90,36 @@ class TestIntegrationWooCommerceSync(TestIntegrationWooCommerce):
 		# Delete order in WooCommerce
 		self.delete_woocommerce_order(wc_order_id=wc_order_id)
 
+	def test_sync_create_new_sales_order_within_db_write_budget(self, mock_log_error):
+		"""
+		Test that creating a Sales Order for a typical WooCommerce order stays within the DB write
+		budget for inserting and submitting it
+		"""
+		# Create a new order in WooCommerce
+		wc_order_id, wc_order_name = self.post_woocommerce_order(
+			payment_method_title="Doge", item_price=10, item_qty=2
+		)
+
+		# Run synchronisation
+		woocommerce_order = frappe.get_doc({"doctype": "WooCommerce Order", "name": wc_order_name})
+		woocommerce_order.load_from_db()
+		sync = SynchroniseSalesOrder(woocommerce_order=woocommerce_order)
+		sync.run()
+
+		# Expect no errors logged
+		mock_log_error.assert_not_called()
+
+		# Expect the number of DB writes to be recorded, and within budget
+		sales_order_name = frappe.get_value("Sales Order", {"woocommerce_id": wc_order_id})
+		sales_order = frappe.get_doc("Sales Order", sales_order_name)
+		self.assertIsNotNone(sync.sales_order_db_writes)
+		self.assertLessEqual(
+			sync.sales_order_db_writes, get_sales_order_db_write_budget(sales_order)
+		)
+
+		# Delete order in WooCommerce
+		self.delete_woocommerce_order(wc_order_id=wc_order_id)
+
 	def test_sync_create_new_sales_order_in_usd_when_synchronising_with_woocommerce(
 		self, mock_log_error
 	):
@@ -1,11 +1,34 @@
+import json
+from copy import deepcopy
 from unittest.mock import MagicMock, Mock, call, patch
 
 import frappe
 from frappe.tests.utils import FrappeTestCase
 
-from woocommerce_fusion.tasks.sync_items import ERPNextItemToSync, SynchroniseItem
+from woocommerce_fusion.exceptions import SyncLockLostError
+from woocommerce_fusion.tasks.sync_items import (
+	ERPNextItemToSync,
+	SynchroniseItem,
+	WooCommerceProductImport,
+	create_woocommerce_products_in_batches,
+	filter_unchanged_wc_products,
+	get_item_fingerprint,
+	get_wc_product,
+	merge_item_attribute_values,
+	run_item_sync_from_hook,
+	sync_woocommerce_variations_in_batches,
+)
+from woocommerce_fusion.woocommerce.doctype.woocommerce_product.woocommerce_product import (
+	WooCommerceProduct,
+	WooCommerceProductAPI,
+)
+from woocommerce_fusion.woocommerce.doctype.woocommerce_server.woocommerce_server import (
+	WooCommerceItemField,
+	WooCommerceItemFieldMap,
+)
 from woocommerce_fusion.woocommerce.woocommerce_api import (
 	generate_woocommerce_record_name_from_domain_and_id,
+	woocommerce_identity_map,
 )
 
 
@@ -55,6 +78,74 @@ class TestWooCommerceSync(FrappeTestCase):
 		# Assert that the item need to be updated
 		mock_update_item.assert_called_once_with(wc_product, sync.item)
 
+	@patch.object(SynchroniseItem, "get_erpnext_item")
+	def test_sync_lock_is_keyed_by_item_from_either_side_of_the_link(
+		self, mock_get_erpnext_item, mock_set_sync_hash, mock_run_item_sync
+	):
+		"""
+		Test that a sync started from an Item that is not linked yet, and a sync started from the
+		WooCommerce Product that it is linked to, take the same lock
+		"""
+		woocommerce_server = "site1.example.com"
+
+		# Create dummy Item
+		item = frappe.get_doc({"doctype": "Item"})
+		item.name = "ITEM-0001"
+		row = item.append("woocommerce_servers")
+		row.woocommerce_server = woocommerce_server
+
+		# Sync started from the unlinked Item
+		sync = SynchroniseItem(servers=Mock())
+		sync.item = ERPNextItemToSync(item, 1)
+		item_sync_lock = sync.get_sync_lock()
+
+		# Sync started from the WooCommerce Product, once it is linked to the Item
+		row.woocommerce_id = 1
+		wc_product = frappe.get_doc({"doctype": "WooCommerce Product"})
+		wc_product.woocommerce_server = woocommerce_server
+		wc_product.woocommerce_id = 1
+		sync = SynchroniseItem(servers=Mock())
+		sync.woocommerce_product = wc_product
+
+		def get_erpnext_item():
+			sync.item = ERPNextItemToSync(item, 1)
+
+		mock_get_erpnext_item.side_effect = get_erpnext_item
+		product_sync_lock = sync.get_sync_lock()
+
+		self.assertEqual(
+			item_sync_lock.name, "woocommerce_sync_lock|items|site1.example.com|ITEM-0001"
+		)
+		self.assertEqual(product_sync_lock.name, item_sync_lock.name)
+
+	@patch.object(SynchroniseItem, "set_product_fields", return_value=False)
+	def test_update_woocommerce_product_checks_sync_lock_before_saving(
+		self, mock_set_product_fields, mock_set_sync_hash, mock_run_item_sync
+	):
+		"""
+		Test that the WooCommerce Product is not saved if the sync lock was taken over by another
+		worker
+		"""
+		sync = SynchroniseItem(servers=Mock())
+		sync.sync_lock = Mock()
+		sync.sync_lock.check_fencing_token.side_effect = SyncLockLostError
+
+		# Create dummy Item
+		item = frappe.get_doc({"doctype": "Item"})
+		item.name = "ITEM-0001"
+		item.item_name = "New Name"
+		row = item.append("woocommerce_servers")
+		row.woocommerce_id = 1
+		row.woocommerce_server = "site1.example.com"
+
+		wc_product = Mock()
+		wc_product.woocommerce_name = "Old Name"
+
+		with self.assertRaises(SyncLockLostError):
+			sync.update_woocommerce_product(wc_product, ERPNextItemToSync(item, 1))
+
+		wc_product.save.assert_not_called()
+
 	@patch("woocommerce_fusion.tasks.sync_items.frappe")
 	@patch.object(SynchroniseItem, "update_woocommerce_product")
 	def test_sync_items_while_passing_item_should_update_wc_product_if_item_is_newer(
@@ -379,3 +470,481 @@ class TestWooCommerceSync(FrappeTestCase):
 
 		self.assertEqual(wc_product_mock.type, "variable")
 		item_mock.item.save.assert_called_once()
+
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.get_all")
+	def test_filter_unchanged_wc_products_drops_products_matching_sync_hash(
+		self, mock_frappe_get_all, mock_set_sync_hash, mock_run_item_sync
+	):
+		# Arrange
+		wc_products = [
+			frappe._dict(
+				woocommerce_server="site1.example.com",
+				woocommerce_id=i,
+				woocommerce_date_modified=f"2024-01-0{i}T10:00:00",
+			)
+			for i in range(1, 4)
+		]
+		mock_frappe_get_all.return_value = [
+			frappe._dict(woocommerce_id="1", woocommerce_last_sync_hash="2024-01-01T10:00:00"),
+			frappe._dict(woocommerce_id="2", woocommerce_last_sync_hash="2023-12-31T10:00:00"),
+		]
+
+		# Act
+		changed_wc_products = filter_unchanged_wc_products(wc_products)
+
+		# Assert that only the unchanged product is dropped, using one query for the page
+		mock_frappe_get_all.assert_called_once()
+		self.assertEqual(changed_wc_products, wc_products[1:])
+
+
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.db.get_value")
+	@patch.object(WooCommerceProduct, "_init_api")
+	def test_get_wc_product_requests_variant_from_its_parent_directly(
+		self, mock_init_api, mock_frappe_db_get_value, mock_set_sync_hash, mock_run_item_sync
+	):
+		# Arrange
+		mock_api = Mock()
+		mock_api.get.return_value.status_code = 200
+		mock_api.get.return_value.json.return_value = {
+			"id": 12,
+			"parent_id": 5,
+			"name": "Shirt",
+			"attributes": [{"name": "Size", "option": "S"}, {"name": "Colour", "option": "Red"}],
+		}
+		mock_init_api.return_value = [
+			WooCommerceProductAPI(
+				api=mock_api,
+				woocommerce_server_url="https://site1.example.com",
+				woocommerce_server="site1.example.com",
+			)
+		]
+		mock_frappe_db_get_value.return_value = 5
+
+		item = frappe.get_doc({"doctype": "Item", "variant_of": "TEMPLATE-0001"})
+		item.append(
+			"woocommerce_servers", {"woocommerce_server": "site1.example.com", "woocommerce_id": 12}
+		)
+
+		# Act
+		with woocommerce_identity_map():
+			# The parent product was loaded earlier in the sync job
+			parent_name = generate_woocommerce_record_name_from_domain_and_id(
+				"site1.example.com", 5
+			)
+			WooCommerceProduct.add_record_to_identity_map(
+				{"name": parent_name, "woocommerce_name": "Shirt"}
+			)
+			wc_product = get_wc_product(
+				ERPNextItemToSync(item=item, item_woocommerce_server_idx=1)
+			)
+
+		# Assert that the variation is fetched with a single request to its parent's variations
+		mock_api.get.assert_called_once_with("products/5/variations/12")
+		self.assertEqual(wc_product.woocommerce_id, 12)
+		self.assertEqual(wc_product.type, "variation")
+
+		# Assert that the variation is named after its parent, like in the list of variations
+		self.assertEqual(wc_product.woocommerce_name, "Shirt - S, Red")
+		self.assertEqual(wc_product.title, "Shirt - S, Red")
+
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.enqueue")
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.cache")
+	@patch("woocommerce_fusion.tasks.sync_items.get_item_field_map")
+	def test_item_hook_only_triggers_sync_when_synchronised_fields_change(
+		self,
+		mock_get_item_field_map,
+		mock_frappe_cache,
+		mock_frappe_enqueue,
+		mock_set_sync_hash,
+		mock_run_item_sync,
+	):
+		# Arrange
+		mock_get_item_field_map.return_value = WooCommerceItemFieldMap(
+			fields=[WooCommerceItemField("description", woocommerce_fieldname="description")]
+		)
+		item = frappe.get_doc(
+			{"doctype": "Item", "item_name": "Shirt", "description": "Cotton", "safety_stock": 1}
+		)
+		item.name = "ITEM-0001"
+		item.append(
+			"woocommerce_servers",
+			{
+				"name": "row1",
+				"enabled": 1,
+				"woocommerce_server": "site1.example.com",
+				"woocommerce_id": 1,
+			},
+		)
+		item._doc_before_save = deepcopy(item)
+		mock_frappe_cache.return_value.hget.return_value = get_item_fingerprint(
+			item, "site1.example.com"
+		)
+
+		# Act and assert that a change to an unrelated field does not trigger a sync
+		item.safety_stock = 10
+		run_item_sync_from_hook(item, "on_update")
+		mock_frappe_enqueue.assert_not_called()
+
+		# Act and assert that a change to a mapped field triggers a sync
+		item.description = "Linen"
+		run_item_sync_from_hook(item, "on_update")
+		mock_frappe_enqueue.assert_called_once()
+
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.db.commit")
+	@patch("woocommerce_fusion.tasks.sync_items.link_item_woocommerce_servers")
+	@patch("woocommerce_fusion.tasks.sync_items.set_item_fingerprint")
+	@patch("woocommerce_fusion.tasks.sync_items.SyncLock")
+	@patch("woocommerce_fusion.tasks.sync_items.get_unlinked_item_woocommerce_servers")
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.get_all")
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.get_doc")
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.get_cached_doc")
+	@patch.object(SynchroniseItem, "build_woocommerce_product")
+	@patch.object(WooCommerceProduct, "_init_api")
+	def test_create_woocommerce_products_in_batches_of_100(
+		self,
+		mock_init_api,
+		mock_build_woocommerce_product,
+		mock_get_cached_doc,
+		mock_get_doc,
+		mock_get_all,
+		mock_get_unlinked_item_woocommerce_servers,
+		mock_sync_lock,
+		mock_set_item_fingerprint,
+		mock_link_item_woocommerce_servers,
+		mock_commit,
+		mock_set_sync_hash,
+		mock_run_item_sync,
+	):
+		# Arrange
+		mock_get_cached_doc.return_value = frappe._dict(
+			name="site1.example.com", enable_sync=1, enable_price_list_sync=0
+		)
+		mock_get_unlinked_item_woocommerce_servers.return_value = [
+			frappe._dict(name=f"ITEM-{i}-row", parent=f"ITEM-{i}", idx=1) for i in range(150)
+		]
+		mock_get_all.return_value = []
+		mock_get_doc.side_effect = lambda doctype, name: frappe._dict(
+			name=name, woocommerce_servers=[frappe._dict(name=f"{name}-row")]
+		)
+		mock_build_woocommerce_product.side_effect = lambda item, **kwargs: MagicMock(
+			deserialize_attributes_of_type_dict_or_list=lambda record: record,
+			to_dict=lambda: {"name": item.item.name},
+			before_db_insert=lambda record: record,
+		)
+
+		def mock_post(endpoint, data):
+			response = Mock()
+			response.status_code = 200
+			response.json.return_value = {
+				"create": [
+					{"id": 0, "error": {"code": "invalid"}}
+					if record["name"] == "ITEM-1"
+					else {"id": 1000 + int(record["name"][5:]), "date_modified": "2024-01-01"}
+					for record in data["create"]
+				]
+			}
+			return response
+
+		mock_api = Mock(post=Mock(side_effect=mock_post))
+		mock_init_api.return_value = [
+			WooCommerceProductAPI(
+				api=mock_api,
+				woocommerce_server_url="https://site1.example.com",
+				woocommerce_server="site1.example.com",
+			)
+		]
+
+		# Act
+		created = create_woocommerce_products_in_batches("site1.example.com")
+
+		# Assert that products were created with one request and one link update per batch of 100
+		self.assertEqual(mock_api.post.call_count, 2)
+		self.assertEqual(mock_api.post.call_args_list[0].args[0], "products/batch")
+		self.assertEqual(len(mock_api.post.call_args_list[0].kwargs["data"]["create"]), 100)
+		self.assertEqual(len(mock_api.post.call_args_list[1].kwargs["data"]["create"]), 50)
+		self.assertEqual(mock_link_item_woocommerce_servers.call_count, 2)
+		self.assertEqual(mock_commit.call_count, 2)
+
+		# Assert that the product that failed to be created is not linked
+		links = mock_link_item_woocommerce_servers.call_args_list[0].args[0]
+		self.assertEqual(links["ITEM-0-row"], (1000, "2024-01-01"))
+		self.assertNotIn("ITEM-1-row", links)
+		self.assertEqual(created, 149)
+
+	@patch("woocommerce_fusion.tasks.sync_items.get_item_field_map")
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.db.commit")
+	@patch("woocommerce_fusion.tasks.sync_items.link_item_woocommerce_servers")
+	@patch("woocommerce_fusion.tasks.sync_items.set_item_fingerprint")
+	@patch("woocommerce_fusion.tasks.sync_items.get_item_fingerprint")
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.cache")
+	@patch("woocommerce_fusion.tasks.sync_items.SyncLock")
+	@patch("woocommerce_fusion.tasks.sync_items.get_item_price_rates")
+	@patch("woocommerce_fusion.tasks.sync_items.get_variant_item_woocommerce_servers")
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.get_doc")
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.get_cached_doc")
+	@patch.object(SynchroniseItem, "init_wc_api")
+	@patch.object(SynchroniseItem, "run", autospec=True)
+	@patch.object(SynchroniseItem, "build_woocommerce_product")
+	@patch.object(WooCommerceProduct, "_init_api")
+	def test_sync_woocommerce_variations_in_batches_of_100(
+		self,
+		mock_init_api,
+		mock_build_woocommerce_product,
+		mock_run,
+		mock_init_wc_api,
+		mock_get_cached_doc,
+		mock_get_doc,
+		mock_get_variant_item_woocommerce_servers,
+		mock_get_item_price_rates,
+		mock_sync_lock,
+		mock_cache,
+		mock_get_item_fingerprint,
+		mock_set_item_fingerprint,
+		mock_link_item_woocommerce_servers,
+		mock_commit,
+		mock_get_item_field_map,
+		mock_set_sync_hash,
+		mock_run_item_sync,
+	):
+		"""
+		Test that the template is synchronised once, and that its unlinked and changed variants are
+		created and updated with one variations/batch request per 100 variants
+		"""
+		# Arrange
+		mock_get_cached_doc.return_value = frappe._dict(
+			name="site1.example.com", enable_sync=1, enable_price_list_sync=0
+		)
+		mock_get_doc.side_effect = lambda doctype, name: frappe._dict(
+			name=name,
+			woocommerce_servers=[
+				frappe._dict(
+					name=f"{name}-row", idx=1, woocommerce_server="site1.example.com", enabled=1
+				)
+			],
+		)
+		mock_run.side_effect = lambda sync: setattr(
+			sync, "woocommerce_product", frappe._dict(woocommerce_id=42)
+		)
+
+		# 120 unlinked variants, and 30 linked variants of which every second one changed
+		mock_get_variant_item_woocommerce_servers.return_value = [
+			frappe._dict(
+				name=f"ITEM-{i}-row",
+				parent=f"ITEM-{i}",
+				idx=1,
+				woocommerce_id=str(1000 + i) if i >= 120 else None,
+			)
+			for i in range(150)
+		]
+		mock_get_item_price_rates.return_value = {}
+		mock_get_item_field_map.return_value = WooCommerceItemFieldMap(fields=[])
+		mock_get_item_fingerprint.side_effect = lambda item, server: item.name
+		mock_cache.return_value.hget.side_effect = lambda key, field: (
+			field.split("|")[0] if int(field.split("|")[0][5:]) % 2 == 0 else "changed"
+		)
+		mock_build_woocommerce_product.side_effect = lambda item, **kwargs: MagicMock(
+			deserialize_attributes_of_type_dict_or_list=lambda record: record,
+			to_dict=lambda: {"name": item.item.name},
+			before_db_insert=lambda record: record,
+		)
+
+		def mock_post(endpoint, data):
+			response = Mock()
+			response.status_code = 200
+			response.json.return_value = {
+				action: [
+					{"id": record.get("id") or 2000, "date_modified": "2024-01-01"}
+					for record in data[action]
+				]
+				for action in ("create", "update")
+			}
+			return response
+
+		mock_api = Mock(post=Mock(side_effect=mock_post))
+		mock_init_api.return_value = [
+			WooCommerceProductAPI(
+				api=mock_api,
+				woocommerce_server_url="https://site1.example.com",
+				woocommerce_server="site1.example.com",
+			)
+		]
+
+		# Act
+		synchronised = sync_woocommerce_variations_in_batches("ITEM", "site1.example.com")
+
+		# Assert that the template was synchronised once
+		mock_run.assert_called_once()
+
+		# Assert that variations were created and updated with one request per batch of 100
+		self.assertEqual(mock_api.post.call_count, 2)
+		first_data = mock_api.post.call_args_list[0].kwargs["data"]
+		second_data = mock_api.post.call_args_list[1].kwargs["data"]
+		self.assertEqual(mock_api.post.call_args_list[0].args[0], "products/42/variations/batch")
+		self.assertEqual((len(first_data["create"]), len(first_data["update"])), (100, 0))
+		self.assertEqual((len(second_data["create"]), len(second_data["update"])), (20, 15))
+		self.assertEqual(second_data["update"][0], {"id": 1121, "name": "ITEM-121"})
+		self.assertEqual(mock_commit.call_count, 2)
+
+		# Assert that the updated variations are linked with their new sync hash
+		links = mock_link_item_woocommerce_servers.call_args_list[1].args[0]
+		self.assertEqual(links["ITEM-121-row"], (1121, "2024-01-01"))
+		self.assertNotIn("ITEM-122-row", links)
+		self.assertEqual(synchronised, 135)
+
+	@patch("woocommerce_fusion.tasks.sync_items.set_item_fingerprint")
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.db")
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.new_doc")
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.get_all")
+	@patch("woocommerce_fusion.tasks.sync_items.get_item_field_map")
+	@patch("woocommerce_fusion.tasks.sync_items.merge_item_attributes_of_wc_product")
+	def test_import_page_creates_variants_of_remembered_parent_and_links_items_in_bulk(
+		self,
+		mock_merge_item_attributes_of_wc_product,
+		mock_get_item_field_map,
+		mock_get_all,
+		mock_new_doc,
+		mock_db,
+		mock_set_item_fingerprint,
+		mock_set_sync_hash,
+		mock_run_item_sync,
+	):
+		"""
+		Test that a page of products is imported with one query for existing links and one insert
+		of "Item WooCommerce Server" rows, that linked products are skipped, and that variations
+		are created as variants of the Item of their parent imported on an earlier page
+		"""
+		# Arrange
+		mock_get_item_field_map.return_value = WooCommerceItemFieldMap(fields=[])
+		mock_get_all.return_value = [frappe._dict(woocommerce_id="3", parent="EXISTING")]
+
+		items = []
+
+		def mock_new_item(doctype):
+			item = MagicMock(woocommerce_servers=[], variant_of=None)
+			item.insert.side_effect = lambda: setattr(item, "name", item.item_code)
+			items.append(item)
+			return item
+
+		mock_new_doc.side_effect = mock_new_item
+		product_import = WooCommerceProductImport(
+			frappe._dict(
+				name="site1.example.com", name_by="Product ID", uom="Nos", item_group="Products"
+			)
+		)
+		attributes = json.dumps([{"name": "Size", "option": "S"}])
+		product_import.parent_item_codes["1"] = "1"
+		wc_products = [
+			frappe._dict(
+				woocommerce_id=woocommerce_id,
+				type=type,
+				parent_id=1 if type == "variation" else 0,
+				attributes=attributes if type == "variation" else "[]",
+				woocommerce_name=f"Product {woocommerce_id}",
+				woocommerce_date_modified="2024-01-01",
+			)
+			for woocommerce_id, type in [
+				(3, "simple"),
+				(4, "simple"),
+				(11, "variation"),
+				(12, "variation"),
+			]
+		]
+
+		# Act
+		product_import.import_page(wc_products)
+
+		# Assert that existing links were read with a single query, and linked products skipped
+		mock_get_all.assert_called_once()
+		self.assertEqual(mock_new_doc.call_count, 3)
+
+		# Assert that the variations are variants of the Item of their parent
+		self.assertEqual(mock_merge_item_attributes_of_wc_product.call_count, 2)
+		self.assertEqual([item.variant_of for item in items], [None, "1", "1"])
+
+		# Assert that all rows were inserted with a single query, with their sync hash
+		mock_db.bulk_insert.assert_called_once()
+		fields = mock_db.bulk_insert.call_args.args[1]
+		rows = [dict(zip(fields, values)) for values in mock_db.bulk_insert.call_args.args[2]]
+		self.assertEqual([row["parent"] for row in rows], ["4", "11", "12"])
+		self.assertEqual([row["woocommerce_id"] for row in rows], ["4", "11", "12"])
+		self.assertTrue(all(row["woocommerce_last_sync_hash"] == "2024-01-01" for row in rows))
+		self.assertEqual(product_import.created, 3)
+
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.get_doc")
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.get_cached_doc")
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.get_cached_value")
+	def test_merge_item_attribute_values_only_writes_new_values(
+		self,
+		mock_get_cached_value,
+		mock_get_cached_doc,
+		mock_get_doc,
+		mock_set_sync_hash,
+		mock_run_item_sync,
+	):
+		"""
+		Test that the values of an Item Attribute are read once, that a variation's single option
+		that is already known does not write the Item Attribute, and that a new option is added
+		without removing the existing values
+		"""
+		# Arrange
+		mock_get_cached_value.return_value = "2024-01-01 00:00:00"
+		mock_get_cached_doc.return_value = frappe._dict(
+			item_attribute_values=[
+				frappe._dict(attribute_value="S"),
+				frappe._dict(attribute_value="M"),
+			]
+		)
+		item_attribute = MagicMock(
+			item_attribute_values=mock_get_cached_doc.return_value.item_attribute_values
+		)
+		item_attribute.name = "Registry Size"
+		mock_get_doc.return_value = item_attribute
+
+		# Act and assert that known values are served from the registry without a write
+		merge_item_attribute_values("Registry Size", ["S"])
+		merge_item_attribute_values("Registry Size", ["M", "S"])
+		mock_get_cached_doc.assert_called_once()
+		mock_get_doc.assert_not_called()
+
+		# Act and assert that only the new value is appended, with a single save
+		merge_item_attribute_values("Registry Size", ["S", "L"])
+		item_attribute.append.assert_called_once_with("item_attribute_values")
+		self.assertEqual(item_attribute.append.return_value.attribute_value, "L")
+		item_attribute.save.assert_called_once()
+
+	@patch("woocommerce_fusion.wordpress.media.frappe.cache")
+	@patch("woocommerce_fusion.wordpress.media.get_img_id")
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.enqueue")
+	@patch("woocommerce_fusion.tasks.sync_items.frappe.get_cached_doc")
+	def test_check_wc_image_exists_searches_media_library_if_index_misses(
+		self,
+		mock_get_cached_doc,
+		mock_frappe_enqueue,
+		mock_get_img_id,
+		mock_cache,
+		mock_set_sync_hash,
+		mock_run_item_sync,
+	):
+		"""
+		Test that an image that is not in the media index (here: an evicted index) is searched in
+		the WordPress media library and added to the index, and that the index is rebuilt
+		"""
+		# Arrange
+		mock_get_cached_doc.return_value = frappe._dict(name="site1.example.com", enable_sync_wp=1)
+		mock_cache.return_value.hget.return_value = None
+		mock_get_img_id.return_value = {"id": 123}
+		sync = SynchroniseItem(woocommerce_product=frappe._dict(woocommerce_server=None))
+		sync.woocommerce_product.woocommerce_server = "site1.example.com"
+
+		# Act
+		media_id = sync.check_wc_image_exists("https://erp.example.com/files/shirt.jpg", "abc")
+
+		# Assert
+		self.assertEqual(media_id, 123)
+		mock_get_img_id.assert_called_once_with(
+			"shirt.jpg", server=mock_get_cached_doc.return_value
+		)
+		mock_cache.return_value.hset.assert_any_call(
+			"wordpress_media_index|site1.example.com", "hash|abc", 123
+		)
+		mock_frappe_enqueue.assert_called_once()
@@ -1,12 +1,33 @@
 import json
-from unittest.mock import Mock, call, patch
+from unittest.mock import MagicMock, Mock, call, patch
 
 import frappe
 from erpnext import get_default_company
 from frappe.tests.utils import FrappeTestCase
 
-from woocommerce_fusion.tasks.sync_sales_orders import SynchroniseSalesOrder
+from woocommerce_fusion.exceptions import SyncLockLostError, SyncLockTimeoutError
+from woocommerce_fusion.tasks.sync import (
+	SyncLock,
+	get_modified_after_params,
+	get_sync_lock_metrics,
+	set_sync_watermark,
+)
+from woocommerce_fusion.tasks.sync_sales_orders import (
+	SynchroniseSalesOrder,
+	create_contact,
+	filter_unchanged_wc_orders,
+	flush_woocommerce_order_statuses,
+	get_address_hash,
+	get_pages_of_wc_orders_modified_since,
+	reconcile_payment,
+	reconcile_pending_payments,
+	sync_woocommerce_orders_modified_since,
+)
+from woocommerce_fusion.woocommerce.doctype.woocommerce_order.woocommerce_order import (
+	WooCommerceOrder,
+)
 from woocommerce_fusion.woocommerce.woocommerce_api import (
+	WooCommerceAPI,
 	generate_woocommerce_record_name_from_domain_and_id,
 )
 
@@ -374,6 +395,581 @@ class TestWooCommerceSync(FrappeTestCase):
 
 		mock_create_address.assert_has_calls(expected_calls)
 
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.run_item_sync")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.get_wc_products_by_id")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.get_all")
+	def test_create_missing_items_only_fetches_unlinked_products(
+		self, mock_frappe_get_all, mock_get_wc_products_by_id, mock_run_item_sync, mock_get_wc_servers
+	):
+		# Initialise class
+		sync = SynchroniseSalesOrder()
+
+		# Arrange
+		line_items = [
+			{"product_id": 1, "variation_id": 0},
+			{"product_id": 2, "variation_id": 0},
+			{"product_id": 3, "variation_id": 4},
+			{"product_id": 0, "variation_id": 0},
+		]
+		mock_frappe_get_all.return_value = ["1"]
+		wc_product = frappe._dict(woocommerce_id=2)
+		mock_get_wc_products_by_id.return_value = [wc_product]
+
+		# Act
+		sync.create_missing_items(None, line_items, "site1.example.com")
+
+		# Assert that linked products are skipped and unlinked products are fetched in one request
+		mock_get_wc_products_by_id.assert_called_once_with("site1.example.com", ["2", "4"])
+		mock_run_item_sync.assert_has_calls(
+			[
+				call(woocommerce_product=wc_product),
+				call(
+					woocommerce_product_name=generate_woocommerce_record_name_from_domain_and_id(
+						"site1.example.com", "4"
+					)
+				),
+			]
+		)
+		self.assertEqual(mock_run_item_sync.call_count, 2)
+
+	def test_calculate_taxes_and_rounding_removes_zero_taxes_and_adds_rounding_difference(
+		self, mock_get_wc_servers
+	):
+		# Arrange
+		zero_tax = frappe._dict(tax_amount=0)
+		vat_tax = frappe._dict(tax_amount=1.3)
+		new_sales_order = MagicMock()
+		new_sales_order.taxes = [zero_tax, vat_tax]
+		new_sales_order.remove.side_effect = lambda tax: new_sales_order.taxes.remove(tax)
+		new_sales_order.grand_total = 9.99
+		wc_order = frappe._dict(total="10.00")
+		wc_server = frappe._dict(rounding_charge="Rounding - SC", cost_center="Main - SC")
+
+		# Act
+		SynchroniseSalesOrder.calculate_taxes_and_rounding(new_sales_order, wc_order, wc_server)
+
+		# Assert that the zero tax line is removed and a rounding line is added, without saving
+		self.assertEqual(new_sales_order.taxes, [vat_tax])
+		new_sales_order.append.assert_called_once()
+		rounding_tax = new_sales_order.append.call_args.args[1]
+		self.assertEqual(rounding_tax["account_head"], "Rounding - SC")
+		self.assertAlmostEqual(rounding_tax["tax_amount"], 0.01)
+		new_sales_order.insert.assert_not_called()
+		new_sales_order.save.assert_not_called()
+
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.log_error")
+	def test_record_db_writes_logs_error_when_over_budget(self, mock_log_error, mock_get_wc_servers):
+		sync = SynchroniseSalesOrder()
+		sales_order = frappe._dict(name="SO-0001", items=[frappe._dict()], taxes=[])
+
+		sync.record_db_writes(sales_order, 10)
+		self.assertEqual(sync.sales_order_db_writes, 10)
+		mock_log_error.assert_not_called()
+
+		sync.record_db_writes(sales_order, 1000)
+		self.assertEqual(sync.sales_order_db_writes, 1000)
+		mock_log_error.assert_called_once()
+
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.new_doc")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.get_doc")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.get_all")
+	def test_create_contact_does_not_duplicate_existing_contact(
+		self, mock_frappe_get_all, mock_frappe_get_doc, mock_frappe_new_doc, mock_get_wc_servers
+	):
+		# Arrange
+		customer = frappe._dict(name="Customer 1")
+		data = {"first_name": "John", "last_name": "Doe", "email": "john@example.com", "phone": "123"}
+		mock_frappe_get_all.return_value = [
+			frappe._dict(
+				name="Contact 1",
+				first_name="John",
+				last_name="Doe",
+				email_id="john@example.com",
+				phone="123",
+				mobile_no=None,
+			)
+		]
+
+		# Act
+		create_contact(data, customer)
+
+		# Assert that the unchanged Contact is neither re-created nor saved
+		mock_frappe_new_doc.assert_not_called()
+		mock_frappe_get_doc.assert_not_called()
+
+		# Act with a changed name
+		create_contact({**data, "last_name": "Smith"}, customer)
+
+		# Assert that the existing Contact is updated
+		mock_frappe_new_doc.assert_not_called()
+		mock_frappe_get_doc.assert_called_once_with("Contact", "Contact 1")
+		self.assertEqual(mock_frappe_get_doc.return_value.last_name, "Smith")
+		mock_frappe_get_doc.return_value.save.assert_called_once()
+
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.get_doc")
+	def test_update_address_skipped_when_address_hash_unchanged(
+		self, mock_frappe_get_doc, mock_get_wc_servers
+	):
+		# Initialise class
+		sync = SynchroniseSalesOrder(
+			woocommerce_order=frappe._dict(woocommerce_server="site1.example.com")
+		)
+		customer = frappe._dict(name="Test Customer", customer_name="Test Customer")
+		mock_get_wc_servers.return_value = frappe._dict(address_title_convention=None)
+
+		# Arrange
+		address = {"address_1": "Ring Lane", "city": "Shire", "country": "DE", "postcode": "12121"}
+		existing_address = frappe._dict(
+			name="Test Customer-Billing",
+			address_type="Billing",
+			custom_woocommerce_address_hash=get_address_hash(address, "Test Customer-Billing", 1, 1),
+		)
+
+		# Act
+		sync.update_address(
+			existing_address.name,
+			{**address, "country": "de", "city": " Shire "},
+			customer,
+			is_primary_address=1,
+			is_shipping_address=1,
+			existing_address=existing_address,
+		)
+
+		# Assert that an unchanged Address is not loaded nor saved
+		mock_frappe_get_doc.assert_not_called()
+
+		# Act with a changed address
+		sync.update_address(
+			existing_address.name,
+			{**address, "address_1": "Bag End"},
+			customer,
+			is_primary_address=1,
+			is_shipping_address=1,
+			existing_address=existing_address,
+		)
+
+		# Assert that the changed Address is saved
+		mock_frappe_get_doc.assert_called_once_with("Address", existing_address.name)
+		mock_frappe_get_doc.return_value.save.assert_called_once()
+
+	@patch.object(SynchroniseSalesOrder, "create_and_link_payment_entry")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.get_wc_orders_by_id")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.db.commit")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.db.set_value")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.db.get_value")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.get_doc")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.get_all")
+	def test_reconcile_pending_payments_commits_once_per_batch(
+		self,
+		mock_frappe_get_all,
+		mock_frappe_get_doc,
+		mock_frappe_db_get_value,
+		mock_frappe_db_set_value,
+		mock_frappe_db_commit,
+		mock_get_wc_orders_by_id,
+		mock_create_and_link_payment_entry,
+		mock_get_wc_servers,
+	):
+		# Arrange: 4 pending Sales Orders, of which one was reconciled by another job in the
+		# mean time, one is not paid yet, and one fails
+		mock_frappe_get_all.side_effect = [
+			["site1.example.com"],
+			[
+				frappe._dict(name=f"SO-000{i}", woocommerce_server="site1.example.com", woocommerce_id=i)
+				for i in range(1, 5)
+			],
+		]
+		mock_get_wc_orders_by_id.side_effect = lambda server, ids: [
+			frappe._dict(id=int(id), payment_method="PayPal", date_paid=None if id == "3" else "2024-01-01")
+			for id in ids
+		]
+		mock_frappe_db_get_value.side_effect = [
+			frappe._dict(docstatus=1, woocommerce_payment_entry=None),
+			frappe._dict(docstatus=1, woocommerce_payment_entry="PE-000001"),
+			frappe._dict(docstatus=1, woocommerce_payment_entry=None),
+			frappe._dict(docstatus=1, woocommerce_payment_entry=None),
+		]
+		mock_frappe_get_doc.side_effect = lambda doctype, name: frappe._dict(
+			name=name, woocommerce_server="site1.example.com", grand_total=100
+		)
+		mock_get_wc_servers.return_value = frappe._dict(
+			ignore_date_paid=0,
+			payment_method_bank_account_mapping=json.dumps({"PayPal": "Bank Account"}),
+			payment_method_gl_account_mapping=json.dumps({"PayPal": "GL Account"}),
+		)
+		mock_create_and_link_payment_entry.side_effect = [True, False]
+
+		# Act
+		reconcile_pending_payments(batch_size=2)
+
+		# Assert that the WooCommerce Orders are fetched, and changes committed, once per batch
+		self.assertEqual(mock_get_wc_orders_by_id.call_count, 2)
+		self.assertEqual(mock_frappe_db_commit.call_count, 2)
+
+		# Assert that reconciled and unpaid orders are skipped
+		self.assertEqual(
+			[call_args.args[1].name for call_args in mock_create_and_link_payment_entry.call_args_list],
+			["SO-0001", "SO-0004"],
+		)
+		for call_args in mock_create_and_link_payment_entry.call_args_list:
+			self.assertEqual(call_args.kwargs["payment_account_mappings"].gl_accounts["PayPal"], "GL Account")
+			self.assertFalse(call_args.kwargs["commit"])
+
+		# Assert that the failed order is not flagged, so that it is retried on the next run
+		mock_frappe_db_set_value.assert_not_called()
+
+	@patch.object(SynchroniseSalesOrder, "create_and_link_payment_entry")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.db.set_value")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.db.get_value")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.get_doc")
+	def test_reconcile_payment_retries_stripe_order_until_captured(
+		self,
+		mock_frappe_get_doc,
+		mock_frappe_db_get_value,
+		mock_frappe_db_set_value,
+		mock_create_and_link_payment_entry,
+		mock_get_wc_servers,
+	):
+		sync = SynchroniseSalesOrder()
+		mock_frappe_db_get_value.return_value = frappe._dict(
+			docstatus=1, woocommerce_payment_entry=None, custom_attempted_woocommerce_auto_payment_entry=0
+		)
+		mock_frappe_get_doc.return_value = frappe._dict(
+			name="SO-0001", woocommerce_server="site1.example.com", grand_total=100
+		)
+		mock_get_wc_servers.return_value = frappe._dict(
+			ignore_date_paid=0,
+			payment_method_bank_account_mapping=json.dumps({"stripe": "Bank Account"}),
+			payment_method_gl_account_mapping=json.dumps({"stripe": "GL Account"}),
+		)
+
+		def wc_order(charge_captured):
+			return frappe._dict(
+				id=1,
+				payment_method="stripe",
+				date_paid="2024-01-01",
+				meta_data=json.dumps([{"key": "_stripe_charge_captured", "value": charge_captured}]),
+			)
+
+		# Act: the Stripe charge is only authorised
+		reconcile_payment(sync, "SO-0001", wc_order("no"), {})
+
+		# Assert that the order stays pending, without being flagged as attempted
+		mock_create_and_link_payment_entry.assert_not_called()
+		mock_frappe_db_set_value.assert_not_called()
+
+		# Act: the Stripe charge has been captured by the next run
+		reconcile_payment(sync, "SO-0001", wc_order("yes"), {})
+
+		# Assert that the Payment Entry is created
+		mock_create_and_link_payment_entry.assert_called_once()
+		self.assertEqual(mock_create_and_link_payment_entry.call_args.args[1].name, "SO-0001")
+		mock_frappe_db_set_value.assert_not_called()
+
+	@patch.object(WooCommerceOrder, "_init_api")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.clear_woocommerce_status_push_pending")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.log_error")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.db.commit")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.get_all")
+	def test_flush_woocommerce_order_statuses_pushes_batches_of_100(
+		self,
+		mock_frappe_get_all,
+		mock_frappe_db_commit,
+		mock_frappe_log_error,
+		mock_clear_woocommerce_status_push_pending,
+		mock_init_api,
+		mock_get_wc_servers,
+	):
+		# Arrange: 150 flagged Sales Orders, and one with a status that has no WooCommerce mapping
+		mock_frappe_get_all.return_value = [
+			frappe._dict(
+				name=f"SO-{i}",
+				woocommerce_server="site1.example.com",
+				woocommerce_id=i,
+				woocommerce_status="Shipped",
+			)
+			for i in range(1, 151)
+		] + [
+			frappe._dict(
+				name="SO-151",
+				woocommerce_server="site1.example.com",
+				woocommerce_id=151,
+				woocommerce_status="Unknown",
+			)
+		]
+		mock_api = MagicMock()
+		mock_api.post.return_value.status_code = 200
+		mock_init_api.return_value = [
+			WooCommerceAPI(
+				api=mock_api,
+				woocommerce_server_url="https://site1.example.com",
+				woocommerce_server="site1.example.com",
+			)
+		]
+
+		# Act
+		flush_woocommerce_order_statuses()
+
+		# Assert that the statuses are pushed with one request and one commit per 100 orders
+		self.assertEqual(mock_api.post.call_count, 2)
+		first_batch = mock_api.post.call_args_list[0].kwargs["data"]["update"]
+		second_batch = mock_api.post.call_args_list[1].kwargs["data"]["update"]
+		self.assertEqual(len(first_batch), 100)
+		self.assertEqual(len(second_batch), 50)
+		self.assertEqual(first_batch[0], {"id": 1, "status": "completed"})
+		self.assertEqual(mock_frappe_db_commit.call_count, 2)
+
+		# Assert that the unmapped status is logged and unflagged, without aborting the flush
+		mock_frappe_log_error.assert_called_once()
+		self.assertEqual(
+			mock_clear_woocommerce_status_push_pending.call_args_list[0].args[0][0].name, "SO-151"
+		)
+		self.assertEqual(mock_clear_woocommerce_status_push_pending.call_count, 3)
+
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.get_all")
+	def test_update_woocommerce_order_fetches_item_woocommerce_ids_in_one_query(
+		self, mock_frappe_get_all, mock_get_wc_servers
+	):
+		# Arrange
+		sales_order = frappe._dict(
+			woocommerce_status="Shipped",
+			items=[frappe._dict(item_code=f"ITEM-{i}", qty=1, rate=10) for i in range(1, 4)],
+		)
+		line_items = [
+			{"id": 10 + i, "product_id": i, "quantity": 1, "subtotal": "10", "subtotal_tax": "0"}
+			for i in range(1, 4)
+		]
+		wc_order = frappe._dict(
+			woocommerce_server="site1.example.com",
+			status="processing",
+			line_items=json.dumps(line_items),
+			save=Mock(),
+		)
+		mock_frappe_get_all.return_value = [
+			frappe._dict(parent=f"ITEM-{i}", woocommerce_id=str(i)) for i in range(1, 4)
+		]
+		mock_get_wc_servers.return_value = frappe._dict(sync_so_items_to_wc=1)
+
+		# Act
+		SynchroniseSalesOrder.update_woocommerce_order(wc_order, sales_order)
+
+		# Assert that the WooCommerce ID's are fetched once, and only the status is updated
+		mock_frappe_get_all.assert_called_once()
+		self.assertEqual([so_item.woocommerce_id for so_item in sales_order.items], ["1", "2", "3"])
+		self.assertEqual(wc_order.status, "completed")
+		self.assertEqual(json.loads(wc_order.line_items), line_items)
+		wc_order.save.assert_called_once()
+
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.new_doc")
+	def test_update_sales_order_uses_fast_path_for_status_changes(
+		self, mock_frappe_new_doc, mock_get_wc_servers
+	):
+		# Initialise class
+		sync = SynchroniseSalesOrder()
+
+		# Arrange
+		sales_order = MagicMock()
+		sales_order.docstatus = 1
+		sales_order.woocommerce_status = "Processing"
+		sales_order.woocommerce_payment_method = "PayPal"
+		sales_order.woocommerce_payment_entry = "PE-000001"
+		wc_order = frappe._dict(
+			status="completed", payment_method="paypal", payment_method_title="PayPal"
+		)
+
+		# Act
+		sync.update_sales_order(wc_order, sales_order)
+
+		# Assert that the status is updated directly, with a Version record, and without a save
+		sales_order.db_set.assert_called_once_with({"woocommerce_status": "Shipped"})
+		sales_order.save.assert_not_called()
+		mock_frappe_new_doc.assert_called_once_with("Version")
+		mock_frappe_new_doc.return_value.insert.assert_called_once()
+
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.get_all")
+	def test_filter_unchanged_wc_orders_drops_orders_matching_sync_hash(
+		self, mock_frappe_get_all, mock_get_wc_servers
+	):
+		# Arrange
+		wc_orders = [
+			frappe._dict(
+				woocommerce_server="site1.example.com",
+				id=i,
+				woocommerce_date_modified=f"2024-01-0{i}T10:00:00",
+			)
+			for i in range(1, 4)
+		]
+		mock_frappe_get_all.return_value = [
+			frappe._dict(woocommerce_id="1", custom_woocommerce_last_sync_hash="2024-01-01 10:00:00"),
+			frappe._dict(woocommerce_id="2", custom_woocommerce_last_sync_hash="2023-12-31 10:00:00"),
+		]
+
+		# Act
+		changed_wc_orders = filter_unchanged_wc_orders(wc_orders)
+
+		# Assert that only the unchanged order is dropped, using one query for the page
+		mock_frappe_get_all.assert_called_once()
+		self.assertEqual(changed_wc_orders, wc_orders[1:])
+
+	def test_sync_lock_is_exclusive_per_order(self, mock_get_wc_servers):
+		contended_before = get_sync_lock_metrics()["contended"]
+
+		with SyncLock("orders", "site1.example.com", 1) as sync_lock:
+			# A lock for another order can be acquired
+			with SyncLock("orders", "site1.example.com", 2):
+				pass
+
+			# A lock for the same order times out
+			with self.assertRaises(SyncLockTimeoutError):
+				with SyncLock("orders", "site1.example.com", 1, blocking_timeout=0.1):
+					pass
+
+			sync_lock.check_fencing_token()
+
+		self.assertEqual(get_sync_lock_metrics()["contended"], contended_before + 1)
+
+	def test_sync_lock_fencing_token_detects_expired_lock(self, mock_get_wc_servers):
+		with SyncLock("orders", "site1.example.com", 3, timeout=1) as sync_lock:
+			# Simulate the lock expiring and being acquired by another worker
+			sync_lock.lock.do_release(sync_lock.lock.local.token)
+			with SyncLock("orders", "site1.example.com", 3):
+				pass
+
+			with self.assertRaises(SyncLockLostError):
+				sync_lock.check_fencing_token()
+
+	@patch.object(WooCommerceOrder, "get_pages_of_records")
+	@patch.object(WooCommerceOrder, "_init_api")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.cache")
+	def test_order_scan_includes_trashed_orders_in_a_single_pass(
+		self, mock_frappe_cache, mock_init_api, mock_get_pages_of_records, mock_get_wc_servers
+	):
+		# Arrange
+		mock_get_wc_servers.return_value = frappe._dict(minimum_creation_date=None)
+		mock_frappe_cache.return_value.get_value.return_value = None
+		mock_api = MagicMock()
+		mock_api.get.return_value.status_code = 200
+		mock_api.get.return_value.json.return_value = [{"slug": "processing"}, {"slug": "completed"}]
+		mock_init_api.return_value = [
+			WooCommerceAPI(
+				api=mock_api,
+				woocommerce_server_url="https://site1.example.com",
+				woocommerce_server="site1.example.com",
+			)
+		]
+		mock_get_pages_of_records.return_value = iter(
+			[[frappe._dict(id=1), frappe._dict(id=2)], [frappe._dict(id=2), frappe._dict(id=3)]]
+		)
+
+		# Act
+		pages = list(
+			get_pages_of_wc_orders_modified_since(
+				mock_init_api.return_value[0], {"modified_after": "2024-01-01"}
+			)
+		)
+
+		# Assert that trashed orders are requested in the same scan, and that orders are deduplicated
+		mock_get_pages_of_records.assert_called_once()
+		self.assertEqual(
+			mock_get_pages_of_records.call_args.args[1],
+			{"modified_after": "2024-01-01", "status": "processing,completed,trash"},
+		)
+		self.assertEqual([[wc_order.id for wc_order in page] for page in pages], [[1, 2], [3]])
+
+	@patch.object(WooCommerceOrder, "_init_api")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.db.commit")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.frappe.get_doc")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.set_sync_watermark")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.run_sales_order_sync")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.filter_unchanged_wc_orders")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.get_pages_of_wc_orders_modified_since")
+	@patch("woocommerce_fusion.tasks.sync_sales_orders.get_modified_after_params")
+	def test_order_scan_watermark_stops_at_first_page_with_failed_order(
+		self,
+		mock_get_modified_after_params,
+		mock_get_pages_of_wc_orders_modified_since,
+		mock_filter_unchanged_wc_orders,
+		mock_run_sales_order_sync,
+		mock_set_sync_watermark,
+		mock_frappe_get_doc,
+		mock_frappe_db_commit,
+		mock_init_api,
+		mock_get_wc_servers,
+	):
+		# Arrange: 3 pages of orders, of which an order on the second page fails
+		mock_init_api.return_value = [
+			WooCommerceAPI(
+				api=MagicMock(),
+				woocommerce_server_url="https://site1.example.com",
+				woocommerce_server="site1.example.com",
+			)
+		]
+		mock_get_modified_after_params.return_value = {"modified_after": "2024-01-01"}
+		pages = [[frappe._dict(id=1)], [frappe._dict(id=2)], [frappe._dict(id=3)]]
+		mock_get_pages_of_wc_orders_modified_since.return_value = iter(pages)
+		mock_filter_unchanged_wc_orders.side_effect = lambda wc_orders: wc_orders
+
+		def run_sales_order_sync(woocommerce_order):
+			if woocommerce_order.id == 2:
+				raise ValueError("Sync failed")
+
+		mock_run_sales_order_sync.side_effect = run_sales_order_sync
+
+		# Act
+		sync_woocommerce_orders_modified_since()
+
+		# Assert that every order is synchronised before the watermark is moved
+		self.assertEqual(
+			[
+				call_args.kwargs["woocommerce_order"].id
+				for call_args in mock_run_sales_order_sync.call_args_list
+			],
+			[1, 2, 3],
+		)
+		for call_args in mock_run_sales_order_sync.call_args_list:
+			self.assertNotIn("enqueue", call_args.kwargs)
+
+		# Assert that the watermark is only moved past the pages before the failed order
+		mock_set_sync_watermark.assert_called_once_with(
+			"site1.example.com", "last_order_sync_watermark", pages[0]
+		)
+		self.assertEqual(mock_frappe_db_commit.call_count, 3)
+
+	@patch("woocommerce_fusion.tasks.sync.frappe.db.set_value")
+	@patch("woocommerce_fusion.tasks.sync.frappe.db.get_value")
+	def test_order_scan_watermark_moves_forward_per_server(
+		self, mock_frappe_db_get_value, mock_frappe_db_set_value, mock_get_wc_servers
+	):
+		# Arrange
+		mock_frappe_db_get_value.return_value = "2024-01-01 10:00:00"
+		wc_orders = [
+			frappe._dict(woocommerce_date_modified_gmt="2024-01-02T08:00:00"),
+			frappe._dict(woocommerce_date_modified_gmt="2024-01-03T09:30:00"),
+		]
+
+		# Act
+		params = get_modified_after_params(
+			"site1.example.com", "last_order_sync_watermark", default_date_time_from="2023-01-01"
+		)
+		set_sync_watermark("site1.example.com", "last_order_sync_watermark", wc_orders)
+
+		# Assert that the scan continues from the watermark, and that it is moved to the latest order
+		self.assertEqual(params["modified_after"], "2024-01-01T10:00:00")
+		self.assertTrue(params["dates_are_gmt"])
+		self.assertEqual(params["orderby"], "modified")
+		mock_frappe_db_set_value.assert_called_once()
+		self.assertEqual(
+			mock_frappe_db_set_value.call_args.args[:3],
+			("WooCommerce Server", "site1.example.com", "last_order_sync_watermark"),
+		)
+		self.assertEqual(str(mock_frappe_db_set_value.call_args.args[3]), "2024-01-03 09:30:00")
+
+		# Assert that an explicit date takes precedence over the watermark
+		params = get_modified_after_params(
+			"site1.example.com", "last_order_sync_watermark", date_time_from="2023-06-01"
+		)
+		self.assertEqual(params["modified_after"], "2023-06-01")
+
 
 def create_bank_account(
 	bank_name=default_bank, account_name="_Test Bank", company=default_company
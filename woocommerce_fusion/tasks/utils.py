@@ -13,31 +13,32 @@ class APIWithRequestLogging(API):
 		result = None
 		try:
 			result = super()._API__request(method, endpoint, data, params, **kwargs)
-			if not frappe.flags.in_test:
-				frappe.enqueue(
-					"woocommerce_fusion.tasks.utils.log_woocommerce_request",
-					url=self.url,
-					endpoint=endpoint,
-					request_method=method,
-					params=params,
-					data=data,
-					res=result,
-					traceback="".join(traceback.format_stack(limit=8)),
-				)
 			return result
-		except Exception as e:
-			if not frappe.flags.in_test:
-				frappe.enqueue(
-					"woocommerce_fusion.tasks.utils.log_woocommerce_request",
-					url=self.url,
-					endpoint=endpoint,
-					request_method=method,
-					params=params,
-					data=data,
-					res=result,
-					traceback="".join(traceback.format_stack(limit=8)),
-				)
-			raise e
+		finally:
+			self.log_request(method, endpoint, data, params, result)
+
+	def get_without_logging(self, endpoint, params=None, **kwargs):
+		"""
+		Make a GET request without creating a 'WooCommerce Request Log'.
+
+		Frappe's request-local state is not available in worker threads, so requests that are made
+		concurrently use this method and are logged with log_request from the calling thread
+		"""
+		return super()._API__request("GET", endpoint, None, params, **kwargs)
+
+	def log_request(self, method, endpoint, data, params=None, result=None):
+		"""Enqueue the creation of a 'WooCommerce Request Log'"""
+		if not frappe.flags.in_test:
+			frappe.enqueue(
+				"woocommerce_fusion.tasks.utils.log_woocommerce_request",
+				url=self.url,
+				endpoint=endpoint,
+				request_method=method,
+				params=params,
+				data=data,
+				res=result,
+				traceback="".join(traceback.format_stack(limit=8)),
+			)
 
 
 def log_woocommerce_request(
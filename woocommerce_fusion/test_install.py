@@ -0,0 +1,47 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from woocommerce_fusion.install import (
+	WOOCOMMERCE_LINKAGE_INDEXES,
+	add_woocommerce_linkage_indexes,
+)
+
+
+class TestInstall(FrappeTestCase):
+	def test_add_woocommerce_linkage_indexes(self):
+		"""
+		Test that the WooCommerce linkage indexes are added to Sales Order and Item WooCommerce
+		Server, and that adding them again is a no-op
+		"""
+		add_woocommerce_linkage_indexes()
+		add_woocommerce_linkage_indexes()
+
+		for doctype, _fields, index_name in WOOCOMMERCE_LINKAGE_INDEXES:
+			self.assertTrue(frappe.db.has_index(f"tab{doctype}", index_name))
+
+	def test_woocommerce_linkage_lookups_can_use_index(self):
+		"""
+		Test that the query plan of a lookup by WooCommerce server and ID considers the linkage
+		index, e.g. for Sales Order:
+
+		EXPLAIN SELECT name FROM `tabSales Order`
+		WHERE woocommerce_server = ... AND woocommerce_id = ...
+
+		type: ref, possible_keys: woocommerce_server_woocommerce_id_index, ref: const,const
+		"""
+		if frappe.db.db_type != "mariadb":
+			self.skipTest("Query plan assertions are written for MariaDB")
+
+		add_woocommerce_linkage_indexes()
+
+		for doctype, _fields, index_name in WOOCOMMERCE_LINKAGE_INDEXES:
+			query_plan = frappe.db.sql(
+				f"""
+				EXPLAIN SELECT name
+				FROM `tab{doctype}`
+				WHERE woocommerce_server = %s AND woocommerce_id = %s
+				""",
+				("site1.example.com", "1"),
+				as_dict=True,
+			)
+			self.assertIn(index_name, query_plan[0].possible_keys or "")
@@ -18,6 +18,7 @@ from woocommerce_fusion.woocommerce.doctype.woocommerce_order.woocommerce_order
 from woocommerce_fusion.woocommerce.woocommerce_api import (
 	generate_woocommerce_record_name_from_domain_and_id,
 	get_domain_and_id_from_woocommerce_record_name,
+	woocommerce_identity_map,
 )
 
 
@@ -156,6 +157,135 @@ class TestWooCommerceOrder(FrappeTestCase):
 					param.expected_order_counts,
 				)
 
+	def test_get_pages_of_records_in_keyset_mode_advances_by_modified_date_and_id(self, mock_init_api):
+		"""
+		Test that a keyset scan requests every page from the last seen modification date, excluding
+		the orders that were already returned for that date, instead of using page numbers
+		"""
+
+		def wc_order(id, date_modified_gmt):
+			order = deepcopy(dummy_wc_order)
+			order.update({"id": id, "date_modified_gmt": date_modified_gmt})
+			return order
+
+		responses = [
+			[wc_order(5, "2024-01-01T10:00:00"), wc_order(3, "2024-01-01T10:00:00")],
+			[wc_order(3, "2024-01-01T10:00:00"), wc_order(8, "2024-01-01T10:00:01")],
+			[wc_order(7, "2024-01-01T10:00:02")],
+		]
+		requested_params = []
+
+		def mock_get(endpoint, params):
+			requested_params.append(dict(params))
+			response = Mock()
+			response.status_code = 200
+			response.json.return_value = responses[len(requested_params) - 1]
+			return response
+
+		wc_api = WooCommerceOrderAPI(
+			api=Mock(get=Mock(side_effect=mock_get)),
+			woocommerce_server_url="http://site1.example.com",
+			woocommerce_server="site1.example.com",
+			wc_plugin_advanced_shipment_tracking=0,
+		)
+
+		pages = list(
+			WooCommerceOrder.get_pages_of_records(
+				wc_api,
+				{"modified_after": "2024-01-01T10:00:00", "dates_are_gmt": True},
+				page_length=2,
+				keyset=True,
+			)
+		)
+
+		# Verify that orders are returned once each, in order of modification date and id
+		self.assertEqual([[order.id for order in page] for page in pages], [[3, 5], [8], [7]])
+
+		# Verify that every page is requested from the last seen modification date, with an id tie-breaker
+		self.assertEqual(
+			[(params["modified_after"], params.get("exclude")) for params in requested_params],
+			[
+				("2024-01-01T09:59:59", None),
+				("2024-01-01T09:59:59", "3,5"),
+				("2024-01-01T10:00:00", "8"),
+			],
+		)
+		for params in requested_params:
+			self.assertEqual(params["page"], 1)
+			self.assertEqual((params["orderby"], params["order"]), ("modified", "asc"))
+
+	@patch("woocommerce_fusion.woocommerce.woocommerce_api.KEYSET_MAX_EXCLUDE", 2)
+	def test_get_pages_of_records_in_keyset_mode_pages_by_offset_past_the_exclude_limit(
+		self, mock_init_api
+	):
+		"""
+		Test that a keyset scan stops growing "exclude" once too many orders share a modification
+		date, and pages through the rest of that second by offset instead
+		"""
+
+		def wc_order(id, date_modified_gmt):
+			order = deepcopy(dummy_wc_order)
+			order.update({"id": id, "date_modified_gmt": date_modified_gmt})
+			return order
+
+		responses = [
+			[wc_order(id, "2024-01-01T10:00:00") for id in (1, 2, 3)],
+			[wc_order(id, "2024-01-01T10:00:00") for id in (1, 2, 3)],
+			[wc_order(id, "2024-01-01T10:00:00") for id in (4, 5, 6)],
+			[wc_order(7, "2024-01-01T10:00:00")],
+			[wc_order(9, "2024-01-01T10:00:01")],
+		]
+		requested_params = []
+
+		def mock_get(endpoint, params):
+			requested_params.append(dict(params))
+			response = Mock()
+			response.status_code = 200
+			response.json.return_value = responses[len(requested_params) - 1]
+			return response
+
+		wc_api = WooCommerceOrderAPI(
+			api=Mock(get=Mock(side_effect=mock_get)),
+			woocommerce_server_url="http://site1.example.com",
+			woocommerce_server="site1.example.com",
+			wc_plugin_advanced_shipment_tracking=0,
+		)
+
+		pages = list(
+			WooCommerceOrder.get_pages_of_records(
+				wc_api,
+				{"modified_after": "2024-01-01T10:00:00", "dates_are_gmt": True},
+				page_length=3,
+				keyset=True,
+			)
+		)
+
+		# Verify that orders are returned once each
+		self.assertEqual(
+			[[order.id for order in page] for page in pages], [[1, 2, 3], [4, 5, 6], [7], [9]]
+		)
+
+		# Verify that the boundary second is paged by offset, then the scan continues after it
+		self.assertEqual(
+			[
+				(
+					params["modified_after"],
+					params.get("modified_before"),
+					params["orderby"],
+					params["page"],
+					params.get("exclude"),
+				)
+				for params in requested_params
+			],
+			[
+				("2024-01-01T09:59:59", None, "modified", 1, None),
+				("2024-01-01T09:59:59", "2024-01-01T10:00:01", "id", 1, None),
+				("2024-01-01T09:59:59", "2024-01-01T10:00:01", "id", 2, None),
+				("2024-01-01T09:59:59", "2024-01-01T10:00:01", "id", 3, None),
+				("2024-01-01T10:00:00", None, "modified", 1, None),
+			],
+		)
+
 	def test_load_from_db_initialises_doctype_with_all_values(self, mock_init_api):
 		"""
 		Test that load_from_db returns an Order
@@ -235,6 +365,58 @@ class TestWooCommerceOrder(FrappeTestCase):
 		# Verify that the orders endpoint is called
 		self.assertEqual(mock_api_list[0].api.get.call_args.args[0], f"orders/{order_id}")
 
+	@patch.object(WooCommerceOrder, "get_additional_order_attributes", side_effect=lambda x: x)
+	@patch.object(WooCommerceOrder, "call_super_init")
+	@patch.object(WooCommerceOrder, "__init__", return_value=None)
+	def test_load_from_db_is_served_from_identity_map_within_a_sync_job(
+		self, mock_init, mock_call_super_init, mock_get_additional_order_attributes, mock_init_api
+	):
+		"""
+		Test that reloading an Order within an identity map block does not request it again, unless
+		the kept copy was dropped
+		"""
+		woocommerce_server_url = "http://site1.example.com"
+		order_name = "site1.example.com" + WC_ORDER_DELIMITER + "1"
+		mock_api_list = [
+			WooCommerceOrderAPI(
+				api=Mock(),
+				woocommerce_server_url=woocommerce_server_url,
+				woocommerce_server="site1.example.com",
+				wc_plugin_advanced_shipment_tracking=0,
+			)
+		]
+		mock_init_api.return_value = mock_api_list
+		mock_api_list[0].api.get.return_value.json.side_effect = lambda: deepcopy(dummy_wc_order)
+
+		def load_order():
+			woocommerce_order = WooCommerceOrder()
+			woocommerce_order.doctype = "WooCommerce Order"
+			woocommerce_order.name = order_name
+			woocommerce_order.wc_api_list = None
+			woocommerce_order.load_from_db()
+			return woocommerce_order
+
+		with woocommerce_identity_map():
+			load_order()
+			load_order()
+
+			# Check that the Order was requested once, and loaded from memory the second time
+			mock_api_list[0].api.get.assert_called_once()
+			self.assertEqual(mock_call_super_init.call_count, 2)
+			self.assertEqual(
+				mock_call_super_init.call_args_list[0].args[0],
+				mock_call_super_init.call_args_list[1].args[0],
+			)
+
+			# Check that the Order is requested again once it is dropped, e.g. after a write
+			WooCommerceOrder.remove_record_from_identity_map(order_name)
+			load_order()
+			self.assertEqual(mock_api_list[0].api.get.call_count, 2)
+
+		# Check that Orders are always requested outside of a sync job
+		load_order()
+		self.assertEqual(mock_api_list[0].api.get.call_count, 3)
+
 	def test_db_insert_makes_post_call(self, mock_init_api):
 		"""
 		Test that db_insert makes a POST call to the WooCommerce API
@@ -1,9 +1,115 @@
 # Copyright (c) 2024, Dirk van der Laarse and Contributors
 # See license.txt
 
-# import frappe
+import json
+from unittest.mock import Mock, patch
+
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from woocommerce_fusion.woocommerce.doctype.woocommerce_product.woocommerce_product import (
+	WooCommerceProduct,
+	WooCommerceProductAPI,
+)
+
 
+@patch.object(WooCommerceProduct, "_init_api")
 class TestWooCommerceProduct(FrappeTestCase):
-	pass
+	def test_get_variations_fetches_variations_of_each_product_concurrently(self, mock_init_api):
+		"""
+		Test that the variations of all variable products are fetched with one request per product,
+		and returned in the order of the products, each named after its own parent
+		"""
+
+		def mock_get_without_logging(endpoint, params=None):
+			parent_id = int(endpoint.split("/")[1])
+			response = Mock()
+			response.status_code = 200
+			response.json.return_value = [
+				{
+					"id": parent_id * 10 + i,
+					"parent_id": parent_id,
+					"attributes": [{"name": "Size", "option": size}],
+				}
+				for i, size in enumerate(["S", "M"])
+			]
+			return response
+
+		mock_init_api.return_value = [
+			WooCommerceProductAPI(
+				api=Mock(get_without_logging=Mock(side_effect=mock_get_without_logging)),
+				woocommerce_server_url="https://site1.example.com",
+				woocommerce_server="site1.example.com",
+			)
+		]
+		products = [
+			frappe._dict(id=1, type="variable", woocommerce_name="Shirt"),
+			frappe._dict(id=2, type="simple", woocommerce_name="Cap"),
+			frappe._dict(id=3, type="variable", woocommerce_name="Socks"),
+		]
+		for product in products:
+			product.woocommerce_server = "site1.example.com"
+		args = {}
+
+		variations = WooCommerceProduct.get_variations(products, args)
+
+		# Verify that one request was made per variable product
+		api = mock_init_api.return_value[0].api
+		self.assertEqual(
+			sorted(call.args[0] for call in api.get_without_logging.call_args_list),
+			["products/1/variations", "products/3/variations"],
+		)
+
+		# Verify that variations are returned in order, named after their own parent
+		self.assertEqual([variation["id"] for variation in variations], [10, 11, 30, 31])
+		self.assertEqual(
+			[variation["title"] for variation in variations],
+			["Shirt - S", "Shirt - M", "Socks - S", "Socks - M"],
+		)
+		self.assertEqual(
+			json.loads(variations[0]["attributes"]), [{"name": "Size", "option": "S"}]
+		)
+
+		# Verify that the caller's args were not changed
+		self.assertEqual(args, {})
+
+	def test_get_variations_pages_through_all_variations_if_requested(self, mock_init_api):
+		"""
+		Test that all pages of variations are fetched for a product with more than 100 variations
+		"""
+
+		def mock_get_without_logging(endpoint, params=None):
+			number_of_variations = 100 if params["page"] == 1 else 20
+			response = Mock()
+			response.status_code = 200
+			response.json.return_value = [
+				{
+					"id": params["page"] * 1000 + i,
+					"parent_id": 1,
+					"attributes": [{"name": "Size", "option": str(i)}],
+				}
+				for i in range(number_of_variations)
+			]
+			return response
+
+		mock_init_api.return_value = [
+			WooCommerceProductAPI(
+				api=Mock(get_without_logging=Mock(side_effect=mock_get_without_logging)),
+				woocommerce_server_url="https://site1.example.com",
+				woocommerce_server="site1.example.com",
+			)
+		]
+		products = [
+			frappe._dict(
+				id=1, type="variable", woocommerce_name="Shirt", woocommerce_server="site1.example.com"
+			)
+		]
+
+		variations = WooCommerceProduct.get_variations(products, {}, all_pages=True)
+
+		# Verify that pages are requested until a page is not full
+		api = mock_init_api.return_value[0].api
+		self.assertEqual(
+			[call.kwargs["params"]["page"] for call in api.get_without_logging.call_args_list], [1, 2]
+		)
+		self.assertEqual(len(variations), 120)
@@ -3,9 +3,17 @@
 
 import json
 from dataclasses import dataclass
-from typing import Dict
+from typing import Dict, List
 
-from woocommerce_fusion.woocommerce.woocommerce_api import WooCommerceAPI, WooCommerceResource
+import frappe
+
+from woocommerce_fusion.woocommerce.woocommerce_api import (
+	WooCommerceAPI,
+	WooCommerceResource,
+	get_concurrently,
+)
+
+WC_RECORDS_PER_PAGE_LIMIT = 100
 
 
 @dataclass
@@ -32,18 +40,76 @@ class WooCommerceProduct(WooCommerceResource):
 		products = WooCommerceProduct.get_list_of_records(args)
 
 		# Extend the list with product variants
+		products.extend(WooCommerceProduct.get_variations(products, args))
+
+		return products
+
+	@staticmethod
+	def get_variations(products: List, args: Dict, all_pages: bool = False) -> List:
+		"""
+		Return the variations of the variable products in the given list of products.
+
+		The variations of all products are requested concurrently, each from its product's server,
+		and returned in the order of the products. Only the first page of each product's
+		variations is returned, unless all_pages is set
+		"""
 		products_with_variants = [
-			(product.get("id"), product.get("woocommerce_name"))
-			for product in products
-			if product.get("type") == "variable"
+			product for product in products if product.get("type") == "variable"
+		]
+		if not products_with_variants:
+			return []
+
+		wc_api_list = WooCommerceProduct._init_api()
+		per_page = min(
+			int(args.get("page_length") or WC_RECORDS_PER_PAGE_LIMIT), WC_RECORDS_PER_PAGE_LIMIT
+		)
+		requests = [
+			(
+				next(
+					api
+					for api in wc_api_list
+					if product.get("woocommerce_server") in api.woocommerce_server_url
+				),
+				f"products/{product.get('id')}/variations",
+			)
+			for product in products_with_variants
 		]
-		for id, woocommerce_name in products_with_variants:
-			args["endpoint"] = f"products/{id}/variations"
-			args["metadata"] = {"parent_woocommerce_name": woocommerce_name}
-			variants = WooCommerceProduct.get_list_of_records(args)
-			products.extend(variants)
 
-		return products
+		# Request the next page of every product whose last page was full, until none are left
+		results_by_product = [[] for _product in products_with_variants]
+		pending = list(range(len(products_with_variants)))
+		page = 1
+		while pending:
+			page_results = get_concurrently(
+				[(*requests[i], {"per_page": per_page, "page": page}) for i in pending]
+			)
+			for i, results in zip(pending, page_results):
+				results_by_product[i].extend(results)
+			pending = [
+				i
+				for i, results in zip(pending, page_results)
+				if all_pages and len(results) == per_page
+			]
+			page += 1
+
+		variations = []
+		for (wc_api, endpoint), product, results in zip(
+			requests, products_with_variants, results_by_product
+		):
+			for variation in results:
+				# Isolate the args of each variation, as they are updated while it is loaded
+				variation_args = {
+					**args,
+					"endpoint": endpoint,
+					"metadata": {"parent_woocommerce_name": product.get("woocommerce_name")},
+				}
+				WooCommerceProduct.pre_init_document(
+					record=variation, woocommerce_server_url=wc_api.woocommerce_server_url
+				)
+				WooCommerceProduct.during_get_list_of_records(variation, variation_args)
+				variations.append(frappe.get_doc(variation) if args.get("as_doc") else variation)
+
+		return variations
 
 	def after_load_from_db(self, product: Dict):
 		product.pop("name")
@@ -1,9 +1,112 @@
 # Copyright (c) 2023, Dirk van der Laarse and Contributors
 # See license.txt
 
-# import frappe
+from unittest.mock import patch
+
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from woocommerce_fusion.woocommerce.doctype.woocommerce_server.woocommerce_server import (
+	WooCommerceItemFieldMap,
+	WooCommerceTaxIndex,
+	clear_tax_index_cache,
+	get_tax_index,
+)
+
+
+def get_dummy_wc_server(number_of_taxes=3):
+	return frappe._dict(
+		name="site1.example.com",
+		tax_account="Default Tax Account",
+		woocommerce_taxes=[
+			frappe._dict(
+				woocommerce_tax_id=i,
+				woocommerce_tax_name=f"TAX-{i}",
+				country=f"C{i}",
+				account=f"Tax Account {i}",
+			)
+			for i in range(1, number_of_taxes + 1)
+		],
+	)
+
 
 class TestWooCommerceServer(FrappeTestCase):
-	pass
+	def test_tax_index_resolves_accounts_in_order_of_precedence(self):
+		tax_index = WooCommerceTaxIndex.from_server(get_dummy_wc_server())
+
+		# Search by rate ID first, then by rate code, then by country
+		self.assertEqual(tax_index.get_account(2, "TAX-3", "C1"), "Tax Account 2")
+		self.assertEqual(tax_index.get_account("2"), "Tax Account 2")
+		self.assertEqual(tax_index.get_account(99, "TAX-3", "C1"), "Tax Account 3")
+		self.assertEqual(tax_index.get_account(99, "UNKNOWN", "C1"), "Tax Account 1")
+
+		# Fall back to the default tax account
+		self.assertEqual(tax_index.get_account(99, "UNKNOWN"), "Default Tax Account")
+		self.assertEqual(tax_index.get_account(), "Default Tax Account")
+
+	@patch.object(WooCommerceTaxIndex, "from_server", wraps=WooCommerceTaxIndex.from_server)
+	@patch(
+		"woocommerce_fusion.woocommerce.doctype.woocommerce_server.woocommerce_server.frappe.get_cached_doc"
+	)
+	def test_tax_index_is_built_once_per_order(self, mock_get_cached_doc, mock_from_server):
+		"""
+		Test that the tax lookups of an order with 100 line items, against a server with 500 taxes,
+		build the tax index once and then only hit the cached index
+		"""
+		number_of_line_items = 100
+		wc_server = get_dummy_wc_server(number_of_taxes=500)
+		wc_server.modified = "2024-01-01 10:00:00"
+		mock_get_cached_doc.return_value = wc_server
+		clear_tax_index_cache(wc_server.name)
+
+		for i in range(number_of_line_items):
+			# Worst case, where all three lookups are done for every line item
+			account = get_tax_index(wc_server.name).get_account(1000 + i, f"UNKNOWN-{i}", "C500")
+			self.assertEqual(account, "Tax Account 500")
+
+		# Verify that the server is read from the document cache, and the index is built once
+		self.assertEqual(mock_get_cached_doc.call_count, number_of_line_items)
+		mock_from_server.assert_called_once_with(wc_server)
+
+		# Verify that the index is rebuilt once the server has been modified
+		wc_server.modified = "2024-01-01 10:00:01"
+		get_tax_index(wc_server.name)
+		get_tax_index(wc_server.name)
+		self.assertEqual(mock_from_server.call_count, 2)
+
+		clear_tax_index_cache(wc_server.name)
+
+	def test_item_field_map_projects_values_in_both_directions(self):
+		item_field_map = WooCommerceItemFieldMap.from_server(
+			frappe._dict(
+				item_field_map=[
+					frappe._dict(
+						erpnext_field_name="shelf_life_in_days | Shelf Life In Days",
+						woocommerce_field_name="shelf_life",
+					),
+					frappe._dict(
+						erpnext_field_name="description | Description",
+						woocommerce_field_name="description",
+					),
+				]
+			)
+		)
+
+		# Field names and types are resolved once
+		self.assertEqual(
+			[(map.item_fieldname, map.fieldtype) for map in item_field_map.fields],
+			[("shelf_life_in_days", "Int"), ("description", "Text Editor")],
+		)
+
+		# WooCommerce => ERPNext values are cast to the type of the Item field
+		wc_product = frappe._dict(shelf_life="30", description="Cotton")
+		self.assertEqual(
+			item_field_map.get_item_values(wc_product),
+			{"shelf_life_in_days": 30, "description": "Cotton"},
+		)
+
+		# ERPNext => WooCommerce only reports a change if a value differs
+		item = frappe._dict(shelf_life_in_days=30, description="Cotton")
+		self.assertTrue(item_field_map.set_product_values(wc_product, item))
+		self.assertEqual(wc_product.shelf_life, 30)
+		self.assertFalse(item_field_map.set_product_values(wc_product, item))
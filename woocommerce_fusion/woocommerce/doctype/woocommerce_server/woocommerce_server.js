@@ -255,6 +255,36 @@ frappe.ui.form.on('WooCommerce Server', {
 				freeze_message: __('Testing WordPress Connection...'),
 			});
 		});
+
+		// Add action to create WooCommerce Products for all Items that are not linked to one yet
+		if (frm.doc.enable_sync && !frm.is_new()) {
+			frm.page.add_action_item(__('Push Catalogue to WooCommerce'), function() {
+				frappe.call({
+					method: 'woocommerce_fusion.tasks.sync_items.push_catalogue_to_woocommerce',
+					args: { woocommerce_server: frm.doc.name },
+					callback: function() {
+						frappe.show_alert({
+							message: __('Catalogue push to WooCommerce queued'),
+							indicator: 'blue'
+						});
+					}
+				});
+			});
+
+			// Add action to create Items for all WooCommerce Products that are not linked yet
+			frm.page.add_action_item(__('Import Products from WooCommerce'), function() {
+				frappe.call({
+					method: 'woocommerce_fusion.tasks.sync_items.import_products_from_woocommerce',
+					args: { woocommerce_server: frm.doc.name },
+					callback: function() {
+						frappe.show_alert({
+							message: __('Product import from WooCommerce queued'),
+							indicator: 'blue'
+						});
+					}
+				});
+			});
+		}
 	},
 
 	setup_shipping_methods: function(frm) {
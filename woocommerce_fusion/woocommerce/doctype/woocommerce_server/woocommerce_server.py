@@ -1,12 +1,15 @@
 # Copyright (c) 2023, Dirk van der Laarse and contributors
 # For license information, please see license.txt
 
-from typing import List, Dict
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Tuple
 from urllib.parse import urlparse
 
 import frappe
 from frappe import _
 from frappe.model.document import Document
+from frappe.utils import cint, cstr
+from frappe.utils.data import cast
 from frappe.utils.caching import redis_cache
 from woocommerce import API
 
@@ -17,6 +20,152 @@ from woocommerce_fusion.woocommerce.woocommerce_api import parse_domain_from_url
 from woocommerce_fusion.wordpress import WordpressAPI
 from woocommerce_fusion.tasks.utils import APIWithRequestLogging
 
+# In-process cache of tax indexes, keyed by WooCommerce Server name and modified timestamp
+_tax_index_cache: Dict[Tuple[str, str], "WooCommerceTaxIndex"] = {}
+
+# In-process cache of item field maps, keyed by WooCommerce Server name and modified timestamp
+_item_field_map_cache: Dict[Tuple[str, str], "WooCommerceItemFieldMap"] = {}
+
+
+@dataclass
+class WooCommerceTaxIndex:
+	"""
+	In-memory index of a WooCommerce Server's "WooCommerce Taxes" table, used to resolve the
+	tax account for a WooCommerce tax line
+	"""
+
+	default_account: Optional[str] = None
+	accounts_by_tax_id: Dict[int, str] = field(default_factory=dict)
+	accounts_by_tax_name: Dict[str, str] = field(default_factory=dict)
+	accounts_by_country: Dict[str, str] = field(default_factory=dict)
+
+	@classmethod
+	def from_server(cls, wc_server: "WooCommerceServer") -> "WooCommerceTaxIndex":
+		tax_index = cls(default_account=wc_server.tax_account)
+		for tax in wc_server.woocommerce_taxes or []:
+			if not tax.account:
+				continue
+			# The first matching row wins, in the order of the table
+			tax_index.accounts_by_tax_id.setdefault(cint(tax.woocommerce_tax_id), tax.account)
+			if tax.woocommerce_tax_name:
+				tax_index.accounts_by_tax_name.setdefault(tax.woocommerce_tax_name, tax.account)
+			if tax.country:
+				tax_index.accounts_by_country.setdefault(tax.country, tax.account)
+		return tax_index
+
+	def get_account(self, rate_id=None, rate_code=None, country=None) -> Optional[str]:
+		"""
+		Return the tax account for a WooCommerce tax line. Search by WooCommerce tax rate ID first,
+		then by tax rate code, then by country (if given), else return the server's default tax account
+		"""
+		if rate_id is not None and (account := self.accounts_by_tax_id.get(cint(rate_id))):
+			return account
+		if rate_code and (account := self.accounts_by_tax_name.get(cstr(rate_code))):
+			return account
+		if country and (account := self.accounts_by_country.get(country)):
+			return account
+		return self.default_account
+
+
+def get_tax_index(woocommerce_server: str) -> WooCommerceTaxIndex:
+	"""
+	Return the tax index for a WooCommerce Server. The index is built once and reused until
+	the WooCommerce Server is saved again
+	"""
+	wc_server = frappe.get_cached_doc("WooCommerce Server", woocommerce_server)
+	cache_key = (wc_server.name, cstr(wc_server.modified))
+	if cache_key not in _tax_index_cache:
+		clear_tax_index_cache(wc_server.name)
+		_tax_index_cache[cache_key] = WooCommerceTaxIndex.from_server(wc_server)
+	return _tax_index_cache[cache_key]
+
+
+def clear_tax_index_cache(woocommerce_server: str):
+	for cache_key in [key for key in _tax_index_cache if key[0] == woocommerce_server]:
+		_tax_index_cache.pop(cache_key)
+
+
+@dataclass
+class WooCommerceItemField:
+	"""A row of a WooCommerce Server's "Fields Mapping" table, with the Item field resolved"""
+
+	item_fieldname: str
+	woocommerce_fieldname: str
+	fieldtype: Optional[str] = None
+
+
+@dataclass
+class WooCommerceItemFieldMap:
+	"""
+	Compiled "Fields Mapping" table (item_field_map) of a WooCommerce Server, with the Item field
+	names and field types resolved once, used to project field values between Items and
+	WooCommerce Products
+	"""
+
+	fields: List[WooCommerceItemField] = field(default_factory=list)
+
+	@classmethod
+	def from_server(cls, wc_server: "WooCommerceServer") -> "WooCommerceItemFieldMap":
+		item_meta = frappe.get_meta("Item")
+		item_field_map = cls()
+		for row in wc_server.item_field_map or []:
+			item_fieldname = row.erpnext_field_name.split(" | ")[0]
+			docfield = item_meta.get_field(item_fieldname)
+			item_field_map.fields.append(
+				WooCommerceItemField(
+					item_fieldname=item_fieldname,
+					woocommerce_fieldname=row.woocommerce_field_name,
+					fieldtype=docfield.fieldtype if docfield else None,
+				)
+			)
+		return item_field_map
+
+	def get_item_values(self, wc_product) -> Dict:
+		"""
+		Return the values of the mapped Item fields from a WooCommerce Product, cast to the type
+		of each Item field
+		"""
+		item_values = {}
+		for map in self.fields:
+			value = wc_product.get(map.woocommerce_fieldname)
+			if map.fieldtype and value is not None:
+				value = cast(map.fieldtype, value)
+			item_values[map.item_fieldname] = value
+		return item_values
+
+	def set_product_values(self, wc_product, item) -> bool:
+		"""
+		Set the mapped fields of a WooCommerce Product from an Item.
+
+		Returns True if the WooCommerce Product has been modified
+		"""
+		wc_product_dirty = False
+		for map in self.fields:
+			item_value = item.get(map.item_fieldname)
+			if item_value != wc_product.get(map.woocommerce_fieldname):
+				setattr(wc_product, map.woocommerce_fieldname, item_value)
+				wc_product_dirty = True
+		return wc_product_dirty
+
+
+def get_item_field_map(woocommerce_server: str) -> WooCommerceItemFieldMap:
+	"""
+	Return the compiled item field map for a WooCommerce Server. The map is compiled once and
+	reused until the WooCommerce Server is saved again
+	"""
+	wc_server = frappe.get_cached_doc("WooCommerce Server", woocommerce_server)
+	cache_key = (wc_server.name, cstr(wc_server.modified))
+	if cache_key not in _item_field_map_cache:
+		clear_item_field_map_cache(wc_server.name)
+		_item_field_map_cache[cache_key] = WooCommerceItemFieldMap.from_server(wc_server)
+	return _item_field_map_cache[cache_key]
+
+
+def clear_item_field_map_cache(woocommerce_server: str):
+	for cache_key in [key for key in _item_field_map_cache if key[0] == woocommerce_server]:
+		_item_field_map_cache.pop(cache_key)
+
+
 class WooCommerceServer(Document):
 	def autoname(self):
 		"""
@@ -43,6 +192,10 @@ class WooCommerceServer(Document):
 		if self.enable_shipping_methods_sync and self.shipping_rule_map:
 			self.update_shipping_method_ids()
 
+	def on_update(self):
+		clear_tax_index_cache(self.name)
+		clear_item_field_map_cache(self.name)
+
 	def validate_so_status_map(self):
 		"""
 		Validate Sales Order Status Map to have unique mappings
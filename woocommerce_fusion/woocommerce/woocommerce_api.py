@@ -1,17 +1,24 @@
 import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from copy import deepcopy
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple, Union
+from datetime import timedelta
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 from urllib.parse import urlparse
 
 import frappe
 from frappe import _
 from frappe.model.document import Document
-from frappe.utils import flt
+from frappe.utils import flt, get_datetime
 
 from woocommerce_fusion.exceptions import SyncDisabledError
 from woocommerce_fusion.tasks.utils import APIWithRequestLogging
 
 WC_RESOURCE_DELIMITER = "~"
+WC_MAX_CONCURRENT_REQUESTS = 8
+# Most records excluded by id in a keyset request, before paging by offset within their second
+KEYSET_MAX_EXCLUDE = 100
 
 
 @dataclass
@@ -71,6 +78,12 @@ class WooCommerceResource(Document):
 		"""
 		Returns a single WooCommerce Record (Form view)
 		"""
+		# Serve the record from the identity map if it was already loaded in this sync job
+		if record := self.get_record_from_identity_map(self.name):
+			record = self.after_load_from_db(record)
+			self.call_super_init(record)
+			return
+
 		# Verify that the WC API has been initialised
 		if not self.wc_api_list:
 			self.init_api()
@@ -100,10 +113,45 @@ class WooCommerceResource(Document):
 		record = self.pre_init_document(
 			record, woocommerce_server_url=self.current_wc_api.woocommerce_server_url
 		)
+		self.add_record_to_identity_map(record)
 		record = self.after_load_from_db(record)
 
 		self.call_super_init(record)
 
+	@classmethod
+	def add_record_to_identity_map(cls, record: Dict):
+		"""
+		Keep a copy of a WooCommerce Record in the identity map of the current sync job, if any,
+		unless a copy with a newer modification date is already kept
+		"""
+		identity_map = getattr(frappe.local, "woocommerce_identity_map", None)
+		if identity_map is None:
+			return
+
+		key = (cls.doctype, record["name"])
+		if (kept_record := identity_map.get(key)) and kept_record.get("woocommerce_date_modified"):
+			if get_datetime(kept_record["woocommerce_date_modified"]) > get_datetime(
+				record.get("woocommerce_date_modified")
+			):
+				return
+		identity_map[key] = deepcopy(record)
+
+	@classmethod
+	def get_record_from_identity_map(cls, name: str) -> Optional[Dict]:
+		"""
+		Return a copy of a WooCommerce Record from the identity map of the current sync job, if any
+		"""
+		identity_map = getattr(frappe.local, "woocommerce_identity_map", None)
+		if identity_map and (record := identity_map.get((cls.doctype, name))):
+			return deepcopy(record)
+		return None
+
+	@classmethod
+	def remove_record_from_identity_map(cls, name: str):
+		identity_map = getattr(frappe.local, "woocommerce_identity_map", None)
+		if identity_map:
+			identity_map.pop((cls.doctype, name), None)
+
 	def call_super_init(self, record: Dict):
 		super(Document, self).__init__(record)
 
@@ -222,6 +270,155 @@ class WooCommerceResource(Document):
 			else:
 				return all_results
 
+	@classmethod
+	def get_pages_of_records(
+		cls,
+		wc_api: WooCommerceAPI,
+		params: Dict,
+		page_length: int = 100,
+		endpoint: Optional[str] = None,
+		args: Optional[Dict] = None,
+		keyset: bool = False,
+	) -> Iterator[List["WooCommerceResource"]]:
+		"""
+		Yield pages of WooCommerce Records from a single WooCommerce server, as documents.
+
+		Unlike get_list_of_records, this pages through one server directly, without first
+		probing every server for its record count.
+
+		With keyset=True, records are scanned in ascending order of GMT modification date and
+		id, and each page is requested with "modified_after" set to the last record of the
+		previous page instead of an offset, so that every page costs the same however deep the
+		scan is, and so that records modified during the scan are not skipped. A GMT
+		"modified_after" is inclusive in this mode. Records already seen at that date are excluded
+		by id, up to KEYSET_MAX_EXCLUDE of them; past that, the rest of that second is paged through
+		by offset instead
+		"""
+		params = {**params, "per_page": page_length, "page": 1}
+		args = args or {}
+		if keyset:
+			params.update({"orderby": "modified", "order": "asc"})
+			keyset_boundary = None
+			if params.get("modified_after") and params.get("dates_are_gmt"):
+				keyset_boundary = get_datetime(params["modified_after"]).replace(microsecond=0)
+			keyset_ids = set()
+			# Offset page within the boundary second, once too many records share it to exclude them
+			boundary_page = None
+			boundary_exhausted = False
+			modified_before = params.get("modified_before")
+
+		while True:
+			if keyset and keyset_boundary:
+				params.update({"dates_are_gmt": True, "orderby": "modified", "page": 1})
+				params.pop("exclude", None)
+				if modified_before:
+					params["modified_before"] = modified_before
+				else:
+					params.pop("modified_before", None)
+
+				if boundary_page:
+					# Page through the boundary second by offset, in a stable order of id
+					params.update(
+						{
+							"modified_after": (keyset_boundary - timedelta(seconds=1)).isoformat(),
+							"modified_before": (keyset_boundary + timedelta(seconds=1)).isoformat(),
+							"orderby": "id",
+							"page": boundary_page,
+						}
+					)
+				elif boundary_exhausted:
+					# Every record at the boundary has been seen, so continue strictly after it
+					params["modified_after"] = keyset_boundary.isoformat()
+				else:
+					# WooCommerce compares modification dates to the second, and "modified_after"
+					# is exclusive, so ask for the second before the boundary and exclude the records
+					# that were already seen at the boundary (the id tie-breaker)
+					params["modified_after"] = (keyset_boundary - timedelta(seconds=1)).isoformat()
+					if keyset_ids:
+						params["exclude"] = ",".join(str(id) for id in sorted(keyset_ids))
+
+			try:
+				response = wc_api.api.get(endpoint or cls.resource, params=params)
+			except Exception as err:
+				log_and_raise_error(err, error_text="get_pages_of_records failed")
+			if response.status_code != 200:
+				log_and_raise_error(error_text="get_pages_of_records failed", response=response)
+
+			results = response.json()
+			number_of_results = len(results)
+			if keyset:
+				results = [record for record in results if record["id"] not in keyset_ids]
+				results.sort(key=get_keyset_of_record)
+				for record in results:
+					record_modified = get_keyset_of_record(record)[0]
+					if keyset_boundary is None or record_modified > keyset_boundary:
+						keyset_boundary = record_modified
+						keyset_ids = set()
+						boundary_exhausted = False
+					if record_modified == keyset_boundary:
+						keyset_ids.add(record["id"])
+
+			for record in results:
+				cls.pre_init_document(record=record, woocommerce_server_url=wc_api.woocommerce_server_url)
+				cls.during_get_list_of_records(record, args)
+			if results:
+				yield [frappe.get_doc(record) for record in results]
+
+			if keyset and boundary_page:
+				if number_of_results < page_length:
+					boundary_page = None
+					boundary_exhausted = True
+					keyset_ids = set()
+				else:
+					boundary_page += 1
+				continue
+			if number_of_results < page_length or not results:
+				break
+			if keyset and len(keyset_ids) > KEYSET_MAX_EXCLUDE:
+				boundary_page = 1
+			if not keyset:
+				params["page"] += 1
+
+	@classmethod
+	def get_record(
+		cls,
+		woocommerce_server: str,
+		record_id: Union[int, str],
+		parent_id: Optional[Union[int, str]] = None,
+		args: Optional[Dict] = None,
+	) -> Optional["WooCommerceResource"]:
+		"""
+		Return a single WooCommerce Record from a server as a document, or None if it does not exist.
+
+		The record is requested directly with "{resource}/{id}", or with
+		"{resource}/{parent_id}/{child_resource}/{id}" if a parent is given
+		"""
+		wc_api = next(
+			(api for api in cls._init_api() if api.woocommerce_server == woocommerce_server), None
+		)
+		if not wc_api:
+			return None
+
+		endpoint = (
+			f"{cls.resource}/{parent_id}/{cls.child_resource}/{record_id}"
+			if parent_id and cls.child_resource
+			else f"{cls.resource}/{record_id}"
+		)
+		try:
+			response = wc_api.api.get(endpoint)
+		except Exception as err:
+			log_and_raise_error(err, error_text="get_record failed")
+		if response.status_code == 404:
+			return None
+		if response.status_code != 200:
+			log_and_raise_error(error_text="get_record failed", response=response)
+
+		record = response.json()
+		cls.pre_init_document(record=record, woocommerce_server_url=wc_api.woocommerce_server_url)
+		cls.during_get_list_of_records(record, args or {})
+		cls.add_record_to_identity_map(record)
+		return frappe.get_doc(record)
+
 	@classmethod
 	def during_get_list_of_records(cls, record: Document, args):
 		return record
@@ -344,6 +541,7 @@ class WooCommerceResource(Document):
 			log_and_raise_error(error_text="db_update failed", response=response)
 
 		self.woocommerce_date_modified = response.json()["date_modified"]
+		self.remove_record_from_identity_map(self.name)
 		self.after_db_update()
 
 	@classmethod
@@ -692,6 +890,63 @@ def get_wc_parameters_from_filters(filters):
 	return params
 
 
+@contextmanager
+def woocommerce_identity_map():
+	"""
+	Keep the WooCommerce Records that are loaded within this block in memory, keyed by doctype and
+	name (server and id), so that reloading a record does not request it from WooCommerce again.
+
+	A kept record is only replaced by a copy with a newer modification date, and is dropped when
+	the record is written to WooCommerce. Nested blocks share the identity map of the outer block
+	"""
+	outer_identity_map = getattr(frappe.local, "woocommerce_identity_map", None)
+	if outer_identity_map is None:
+		frappe.local.woocommerce_identity_map = {}
+	try:
+		yield frappe.local.woocommerce_identity_map
+	finally:
+		frappe.local.woocommerce_identity_map = outer_identity_map
+
+
+def get_concurrently(requests: List[Tuple[WooCommerceAPI, str, Dict]]) -> List[List[Dict]]:
+	"""
+	Make GET requests for a list of (WooCommerce API, endpoint, params) concurrently, with at most
+	WC_MAX_CONCURRENT_REQUESTS in flight, and return the parsed responses in the same order.
+
+	Only the HTTP requests are made in worker threads. Responses are logged and checked in the
+	calling thread, where Frappe's request-local state is available
+	"""
+
+	def get(request):
+		wc_api, endpoint, params = request
+		try:
+			return wc_api.api.get_without_logging(endpoint, params=params), None
+		except Exception as err:
+			return None, err
+
+	max_workers = min(WC_MAX_CONCURRENT_REQUESTS, len(requests) or 1)
+	with ThreadPoolExecutor(max_workers=max_workers) as executor:
+		responses = list(executor.map(get, requests))
+
+	results = []
+	for (wc_api, endpoint, params), (response, err) in zip(requests, responses):
+		wc_api.api.log_request("GET", endpoint, None, params, response)
+		if err:
+			log_and_raise_error(err, error_text="get_concurrently failed")
+		if response.status_code != 200:
+			log_and_raise_error(error_text="get_concurrently failed", response=response)
+		results.append(response.json())
+
+	return results
+
+
+def get_keyset_of_record(record: Dict) -> Tuple:
+	"""
+	Return the (GMT modification date, id) key of a WooCommerce API record, for keyset pagination
+	"""
+	return (get_datetime(record.get("date_modified_gmt")).replace(microsecond=0), record["id"])
+
+
 def log_and_raise_error(exception=None, error_text=None, response=None):
 	"""
 	Create an "Error Log" and raise error
@@ -1,6 +1,11 @@
 import frappe
+from frappe.utils import add_to_date, get_datetime
 from woocommerce_fusion.wordpress import WordpressAPI
 
+# Redis hash per WooCommerce Server, mapping file names and content hashes to media IDs
+WP_MEDIA_INDEX = "wordpress_media_index"
+WP_MEDIA_PAGE_LENGTH = 100
+
 class WordpressMedia(WordpressAPI):
 	def __init__(self, server=None, version="wp-json/wp/v2", *args, **kwargs):
 		super(WordpressMedia, self).__init__(server=server, version=version, *args, **kwargs)
@@ -56,4 +61,147 @@ def delete_image(media_id, server=None):
 		WordPress API response
 	"""
 	wp_api = WordpressMedia(server=server)
-	return wp_api.delete_img(media_id)
\ No newline at end of file
+	response = wp_api.delete_img(media_id)
+	remove_media_from_index(wp_api.server.name, media_id)
+	return response
+
+def get_media_index_key(server_name):
+	return f"{WP_MEDIA_INDEX}|{server_name}"
+
+def get_media_id(server_name, filename=None, content_hash=None):
+	"""
+	Look up a media ID in the local index of a WordPress media library, without a request
+	Args:
+		server_name: Name of the WooCommerce server
+		filename: File name of the image
+		content_hash: Content hash of the image's ERPNext File
+	Returns:
+		Media ID if found, None otherwise
+	"""
+	key = get_media_index_key(server_name)
+	media_id = frappe.cache().hget(key, f"hash|{content_hash}") if content_hash else None
+	if not media_id and filename:
+		media_id = frappe.cache().hget(key, f"file|{filename}")
+	return media_id
+
+def is_media_index_built(server_name):
+	"""
+	Check if the local index of a WordPress media library has been built, as it can be evicted
+	from or cleared with the cache
+	"""
+	return frappe.cache().hget(get_media_index_key(server_name), "modified_after") is not None
+
+def add_media_to_index(server_name, media_id, filename=None, content_hash=None, index_key=None):
+	"""
+	Add a media to the local index of a WordPress media library
+	Args:
+		server_name: Name of the WooCommerce server
+		media_id: ID of the media
+		filename: File name of the media
+		content_hash: Content hash of the ERPNext File that the media was created from
+		index_key: Key of the index to add to, if not the index of the server
+	"""
+	key = index_key or get_media_index_key(server_name)
+	fields = [f"file|{filename}"] if filename else []
+	if content_hash:
+		fields.append(f"hash|{content_hash}")
+	for field in fields:
+		frappe.cache().hset(key, field, media_id)
+
+	# Remember the fields of each media, so that they can be removed with the media
+	media_fields = frappe.cache().hget(key, f"media|{media_id}") or []
+	frappe.cache().hset(key, f"media|{media_id}", sorted(set(media_fields + fields)))
+
+def remove_media_from_index(server_name, media_id):
+	"""
+	Remove a deleted media from the local index of a WordPress media library
+	Args:
+		server_name: Name of the WooCommerce server
+		media_id: ID of the media
+	"""
+	key = get_media_index_key(server_name)
+	for field in frappe.cache().hget(key, f"media|{media_id}") or []:
+		if frappe.cache().hget(key, field) == media_id:
+			frappe.cache().hdel(key, field)
+	frappe.cache().hdel(key, f"media|{media_id}")
+
+def refresh_media_index(server, rebuild=False):
+	"""
+	Add the media modified since the last refresh to the local index of a WordPress media
+	library, with one request per page of media
+	Args:
+		server: WooCommerce server instance
+		rebuild: Drop the index and index the whole media library
+	Returns:
+		Number of media indexed
+	"""
+	key = get_media_index_key(server.name)
+	# Rebuild under a temporary key, so that the index stays in use until the rebuild is done
+	build_key = f"{key}|rebuild" if rebuild else key
+	if rebuild:
+		frappe.cache().delete_value(build_key)
+
+	wp_api = WordpressMedia(server=server)
+	params = {
+		"per_page": WP_MEDIA_PAGE_LENGTH,
+		"orderby": "modified",
+		"order": "asc",
+		"_fields": "id,source_url,modified_gmt",
+	}
+	modified_after = frappe.cache().hget(build_key, "modified_after")
+	if modified_after:
+		# "modified_after" is exclusive, so step back a second to include media modified in the
+		# same second as the last indexed media
+		params["modified_after"] = add_to_date(
+			get_datetime(modified_after), seconds=-1
+		).isoformat() + "+00:00"
+
+	indexed = 0
+	page = 1
+	total_pages = 1
+	while page <= total_pages:
+		response = wp_api.get_list({**params, "page": page})
+		total_pages = int(response.headers.get("X-WP-TotalPages") or 1)
+		for media in response.json():
+			filename = media["source_url"].split("/")[-1]
+			add_media_to_index(server.name, media["id"], filename=filename, index_key=build_key)
+			# Large images are stored scaled, under a file name with a "-scaled" suffix
+			if "-scaled." in filename:
+				add_media_to_index(
+					server.name,
+					media["id"],
+					filename=filename.replace("-scaled.", "."),
+					index_key=build_key,
+				)
+			if media.get("modified_gmt") and media["modified_gmt"] > (modified_after or ""):
+				modified_after = media["modified_gmt"]
+			indexed += 1
+
+		# An empty marker means that the index is built, but the media library is empty
+		frappe.cache().hset(build_key, "modified_after", modified_after or "")
+		page += 1
+
+	if rebuild:
+		frappe.cache().rename(frappe.cache().make_key(build_key), frappe.cache().make_key(key))
+
+	return indexed
+
+def refresh_media_indexes(rebuild=False):
+	"""
+	Refresh the local media library index of every WooCommerce server that syncs with WordPress
+	Args:
+		rebuild: Drop each index and index the whole media library
+	"""
+	for server_name in frappe.get_all(
+		"WooCommerce Server", filters={"enable_sync": 1, "enable_sync_wp": 1}, pluck="name"
+	):
+		try:
+			refresh_media_index(frappe.get_cached_doc("WooCommerce Server", server_name), rebuild=rebuild)
+		except Exception:
+			frappe.log_error("WordPress Media Index Error", frappe.get_traceback())
+
+def rebuild_media_indexes():
+	"""
+	Rebuild the local media library index of every WooCommerce server, dropping deleted media
+	"""
+	refresh_media_indexes(rebuild=True)
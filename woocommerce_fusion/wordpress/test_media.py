@@ -2,7 +2,15 @@ import unittest
 import frappe
 import json
 from unittest.mock import Mock, patch
-from woocommerce_fusion.wordpress.media import WordpressMedia, get_img_id, create_image, delete_image
+from woocommerce_fusion.wordpress.media import (
+    WordpressMedia,
+    get_img_id,
+    create_image,
+    delete_image,
+    get_media_id,
+    refresh_media_index,
+    remove_media_from_index,
+)
 
 class TestWordpressMedia(unittest.TestCase):
     @classmethod
@@ -74,6 +82,43 @@ class TestWordpressMedia(unittest.TestCase):
         self.assertEqual(result.status_code, 200)
         mock_delete.assert_called_with("media/789", params={"force": True})
 
+    @patch('woocommerce_fusion.wordpress.media.WordpressMedia.get')
+    def test_refresh_media_index(self, mock_get):
+        # Mock response for a single page of media
+        mock_response = Mock()
+        mock_response.headers = {"X-WP-TotalPages": "1"}
+        mock_response.json.return_value = [
+            {
+                "id": 123,
+                "source_url": "https://test.example.com/uploads/image-scaled.jpg",
+                "modified_gmt": "2024-01-02T00:00:00",
+            },
+            {
+                "id": 124,
+                "source_url": "https://test.example.com/uploads/other.png",
+                "modified_gmt": "2024-01-01T00:00:00",
+            },
+        ]
+        mock_get.return_value = mock_response
+
+        # Test that media are found by file name without a request
+        result = refresh_media_index(self.server, rebuild=True)
+        self.assertEqual(result, 2)
+        self.assertEqual(get_media_id(self.server.name, filename="image-scaled.jpg"), 123)
+        self.assertEqual(get_media_id(self.server.name, filename="image.jpg"), 123)
+        self.assertEqual(get_media_id(self.server.name, filename="other.png"), 124)
+        self.assertIsNone(get_media_id(self.server.name, filename="nonexistent.jpg"))
+
+        # Test that the next refresh only requests media modified since the last refresh
+        refresh_media_index(self.server)
+        self.assertEqual(
+            mock_get.call_args.kwargs["params"]["modified_after"], "2024-01-01T23:59:59+00:00"
+        )
+
+        # Test that removed media are dropped from the index
+        remove_media_from_index(self.server.name, 123)
+        self.assertIsNone(get_media_id(self.server.name, filename="image.jpg"))
+
     def tearDown(self):
         pass
 